@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Wall-clock time to apply one state to N bulbs sequentially vs. concurrently with lifx_async,
+against a local mock server with simulated API latency.
+
+Usage: python -m benchmarks.async_fanout [--bulbs N] [--latency SECONDS]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+
+def main(bulbs=10, latency=0.1):
+    use_stub_config(lifx={'concurrency': str(bulbs)})
+    from luminary.api import lifx, lifx_async
+
+    server = start_stub_server(latency=latency)
+    lifx.get_client().base_url = f"http://127.0.0.1:{server.server_port}"
+    selectors = [f"id:bulb{i}" for i in range(bulbs)]
+
+    start = time.perf_counter()
+    for selector in selectors:
+        lifx.turn_on(brightness=0.5, selector=selector)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asyncio.run(lifx_async.turn_on(selectors, brightness=0.5))
+    concurrent = time.perf_counter() - start
+
+    print(f"{bulbs} bulbs, {latency * 1000:.0f} ms latency")
+    print(f"sequential  {sequential * 1000:8.1f} ms")
+    print(f"concurrent  {concurrent * 1000:8.1f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bulbs', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.1)
+    args = parser.parse_args()
+    main(args.bulbs, args.latency)
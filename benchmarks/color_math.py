@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Cost of computing intermediate colors client-side: HSBK construction and encode per color in a Python loop,
+as code built on HSBK does today, vs. color_math blending whole arrays with NumPy.
+
+Usage: python -m benchmarks.color_math [--steps N] [--zones N] [--frames N]
+"""
+import argparse
+import timeit
+
+from benchmarks.stubs import use_stub_config
+
+
+def python_fade(start, end, steps):
+    """
+    Reference loop: one HSBK per intermediate color, same blending rules as color_math.
+    """
+    from luminary.api.lifx import HSBK
+
+    colors = []
+    for i in range(steps):
+        t = i / (steps - 1)
+        arc = (end.hue - start.hue + 180) % 360 - 180
+        start_mired, end_mired = 1e6 / start.kelvin, 1e6 / end.kelvin
+        colors.append(HSBK({
+            'hue': (start.hue + t * arc) % 360,
+            'saturation': start.saturation + t * (end.saturation - start.saturation),
+            'brightness': start.brightness + t * (end.brightness - start.brightness),
+            'kelvin': int(round(1e6 / (start_mired + t * (end_mired - start_mired)))),
+        }))
+    return colors
+
+
+def best(func, repeat=5):
+    """
+    :return: Best time of one call in microseconds.
+    """
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def main(steps=200, zones=82, frames=60):
+    use_stub_config()
+    from luminary.api.lifx import HSBK
+    from luminary.util import color_math
+
+    start = HSBK({'hue': 20, 'saturation': 1.0, 'brightness': 0.2, 'kelvin': 2700})
+    end = HSBK({'hue': 300, 'saturation': 0.4, 'brightness': 1.0, 'kelvin': 6500})
+    start_array, end_array = color_math.to_array([start, end])
+
+    print('single color')
+    print(f"  HSBK(dict)                  {best(lambda: HSBK({'hue': 120.0, 'saturation': 1.0})) * 1000:8.1f} ns")
+    print(f"  HSBK(str)                   {best(lambda: HSBK('hue:120 saturation:1.0')) * 1000:8.1f} ns")
+    print(f"  HSBK.encode                 {best(start.encode) * 1000:8.1f} ns")
+
+    print(f"fade of {steps} colors")
+    print(f"  python loop of HSBK         {best(lambda: python_fade(start, end, steps)):8.1f} us")
+    print(f"    + encode                  {best(lambda: [c.encode() for c in python_fade(start, end, steps)]):8.1f} us")
+    print(f"  color_math.fade             {best(lambda: color_math.fade(start_array, end_array, steps)):8.1f} us")
+    print(f"    + encode                  "
+          f"{best(lambda: color_math.encode(color_math.fade(start_array, end_array, steps))):8.1f} us")
+
+    print(f"{frames} frames of a {zones} zone gradient fading between two palettes")
+    palette = color_math.gradient(color_math.to_array([f"{name} brightness:1 kelvin:3500"
+                                                       for name in ('red', 'orange', 'yellow')]), zones)
+    target = color_math.gradient(color_math.to_array([f"{name} brightness:0.5 kelvin:9000"
+                                                      for name in ('blue', 'purple', 'cyan')]), zones)
+    palette_hsbk, target_hsbk = color_math.to_hsbk(palette), color_math.to_hsbk(target)
+    print(f"  python loop of HSBK         "
+          f"{best(lambda: [python_fade(a, b, frames) for a, b in zip(palette_hsbk, target_hsbk)], repeat=3):8.1f} us")
+    print(f"  color_math.fade             {best(lambda: color_math.fade(palette, target, frames)):8.1f} us")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--zones', type=int, default=82)
+    parser.add_argument('--frames', type=int, default=60)
+    args = parser.parse_args()
+    main(args.steps, args.zones, args.frames)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Light commands through an outage of a local stand-in for the LIFX API, sent directly vs. through the command queue:
+how long callers like the light switch's sensor loop wait per command, how many commands make it once the API is
+back, what the queue collapsed and let expire, and commands left queued by a crashed process being replayed by the
+next one.
+
+Usage: python -m benchmarks.command_queue [--latency SECONDS] [--outage SECONDS] [--commands N]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+SELECTOR = 'id:stub'
+
+
+class Offline:
+    """
+    Transport of a machine whose network is gone.
+    """
+    def __getattr__(self, method):
+        def fail(*args):
+            raise ConnectionError('Network is unreachable')
+        return fail
+
+
+def commands(transport, count):
+    """
+    A burst like a few minutes of fiddling with the light: brightness changes and a final toggle.
+
+    :return: List of seconds each call took and number of calls that raised.
+    """
+    times, failed = [], 0
+    for i in range(count):
+        start = time.perf_counter()
+        try:
+            if i < count - 1:
+                transport.set_state(SELECTOR, {'brightness': round((i + 1) / count, 3), 'duration': 0.5})
+            else:
+                transport.toggle_power(SELECTOR)
+        except Exception:
+            failed += 1
+        times.append(time.perf_counter() - start)
+    return times, failed
+
+
+def main(latency=0.02, outage=2.0, count=20):
+    server = start_stub_server(latency=latency, body=[{'id': 'stub', 'power': 'on', 'brightness': 1.0}])
+    use_stub_config()
+    from luminary.api import command_queue
+    from luminary.api.http_client import HttpClient
+    from luminary.api.transport import CloudTransport
+
+    def cloud():
+        return CloudTransport(HttpClient(f"http://127.0.0.1:{server.server_port}", retries=0))
+
+    direct = cloud()
+    for name, outage_for in (('healthy', 0.0), ('outage', outage)):
+        queued = command_queue.QueuedTransport(cloud(), command_queue.CommandLog(f"{name}.log"),
+                                               action_expiry=outage / 2, backoff=0.1, max_backoff=0.5,
+                                               drain_timeout=0)
+        for label, transport in (('direct', direct), ('queued', queued)):
+            server.outage = outage_for > 0
+            before = server.requests - server.failures
+            start = time.monotonic()
+            times, failed = commands(transport, count)
+            time.sleep(max(0.0, outage_for - (time.monotonic() - start)))
+            server.outage = False
+            if transport is queued:
+                queued.drain(10)
+            delivered = server.requests - server.failures - before
+            print(f"{name:<8}{label:<7} call {statistics.median(times) * 1000:7.3f} ms median, "
+                  f"{failed:2d}/{count} raised, {delivered:2d} requests delivered")
+        print(f"        queue: {queued.sent} sent, {queued.retries} retries, {queued.expired} expired, "
+              f"{queued.dropped} dropped")
+        assert queued.dropped == 0 and queued.pending() == 0
+        if outage_for:
+            # retried until the API was back, with the set_states merged and the toggle expired meanwhile
+            assert queued.retries > 0 and queued.sent <= 2 and queued.expired == 1
+            assert server.calls[-1][2]['brightness'] == round((count - 1) / count, 3), server.calls[-1]
+
+    log = command_queue.CommandLog('crash.log')
+    crashed = command_queue.QueuedTransport(Offline(), log, backoff=60, drain_timeout=0)
+    commands(crashed, count)
+    queued_before = crashed.pending()
+    crashed.toggle_power(SELECTOR)
+    assert crashed.pending() == queued_before - 1, 'a second toggle should cancel the queued one'
+    crashed.toggle_power(SELECTOR)
+    while crashed.unlogged or crashed.writing:
+        time.sleep(0.01)
+    before = server.requests
+    replayed = command_queue.QueuedTransport(cloud(), log, drain_timeout=0)
+    pending = replayed.pending()
+    replayed.drain(10)
+    print(f"crash: {pending} commands replayed from the log by the next process, "
+          f"{server.requests - before} requests sent, {len(log.load())} left in the log")
+    assert pending > 0 and server.requests - before == pending and not log.load()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--outage', type=float, default=2.0)
+    parser.add_argument('--commands', type=int, default=20)
+    args = parser.parse_args()
+    main(args.latency, args.outage, args.commands)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Trigger-to-done latency of a cold script vs. commands dispatched to the resident daemon, against a local mock of
+the LIFX API: a fresh `python -c` turning the light on, `python -m luminary.ctl` from a shell, and a call over
+the socket from an already running process.
+
+Usage: python -m benchmarks.daemon_latency [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_runs(call, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(runs=10):
+    server = start_stub_server()
+    config_dir = use_stub_config(lifx={'api_url': f"http://127.0.0.1:{server.server_port}"})
+    from luminary import ctl
+
+    path = f"{config_dir}/luminary.sock"
+    daemon = subprocess.Popen([sys.executable, '-m', 'luminary.daemon', '--socket', path], cwd=ROOT,
+                              stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                ctl.call('ping', path=path)
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        cases = {
+            'cold script': lambda: subprocess.run(
+                [sys.executable, '-c', 'from luminary.api import lifx; lifx.turn_on(brightness=0.5)'],
+                cwd=ROOT, check=True),
+            'ctl command': lambda: subprocess.run(
+                [sys.executable, '-m', 'luminary.ctl', 'turn_on', 'brightness=0.5'],
+                cwd=ROOT, check=True, env={**os.environ, 'LUMINARY_CONFIG_DIR': config_dir}),
+            'socket call': lambda: ctl.call('turn_on', {'brightness': 0.5}, path=path),
+        }
+        for name, call in cases.items():
+            before = server.requests
+            timings = time_runs(call, runs)
+            assert server.requests - before == runs, f"{name} didn't reach the mock API"
+            print(f"{name:<12} median {statistics.median(timings) * 1000:8.2f} ms  "
+                  f"mean {statistics.mean(timings) * 1000:8.2f} ms")
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    main(args.runs)
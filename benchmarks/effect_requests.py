@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Requests sent by blink_power and the wakeup weather report with and without the effect optimizer,
+counted by a local mock of the LIFX API.
+
+Usage: python -m benchmarks.effect_requests [--blinks N]
+"""
+import argparse
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+
+def no_sleep(seconds):
+    pass
+
+
+def main(blinks=5):
+    use_stub_config()
+    from luminary import wakeup
+    from luminary.api import lifx
+    from luminary.util import effect_optimizer, timeline
+
+    server = start_stub_server(body=[{'id': 'stub', 'power': 'on', 'brightness': 1.0}])
+    lifx.get_client().base_url = f"http://127.0.0.1:{server.server_port}"
+    report = {'temperature': 72, 'precipitation_chance': 40, 'thunderstorms': True, 'snow': False, 'cloud_level': 2}
+    # name: (routine, requests plain, requests optimized)
+    routines = {
+        f"blink_power(cycles={blinks})": (timeline.Timeline(timeline.blink(blinks)), 2 * blinks, 1),
+        'report_weather': (wakeup.weather_timeline(report), 11, 9),
+    }
+
+    for name, (routine, expected_plain, expected_optimized) in routines.items():
+        before = server.requests
+        timeline.run(routine, sleep=no_sleep)
+        plain = server.requests - before
+
+        optimized, saved = effect_optimizer.optimize(routine)
+        before = server.requests
+        timeline.run(optimized, sleep=no_sleep)
+        print(f"{name:<22} {plain:3d} requests -> {server.requests - before:3d} optimized ({saved} saved)")
+        assert (plain, server.requests - before) == (expected_plain, expected_optimized), name
+        assert saved == expected_plain - expected_optimized, name
+
+    # blink_power itself only pulses once the mirror knows the light is on, and never reads the status to find out
+    before = server.requests
+    lifx.blink_power(blinks, period=0.001)
+    assert server.requests - before == 2 * blinks, 'blink_power with an unknown power state'
+    lifx.get_status()
+    before = server.requests
+    lifx.blink_power(blinks, period=0.001)
+    assert server.requests - before == 1, 'blink_power with the light known to be on'
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blinks', type=int, default=5)
+    args = parser.parse_args()
+    main(args.blinks)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Frame streaming to a local stand-in multizone strip and tile chain over the LAN protocol: messages and bytes per
+frame with and without diffing against the last frame, the most frames per second the encoder manages, and how
+steadily the governor holds its target rate.
+
+Usage: python -m benchmarks.frame_streaming [--frames N] [--fps FPS]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.stubs import StubBulb, use_stub_config
+
+STRIP_ZONES = 82
+TILES = 5
+
+
+def animations(zones, frames, seed=0):
+    """
+    :return: Dict of name to list of frames of shape (zones, 4).
+    """
+    rng = np.random.default_rng(seed)
+    dark = np.zeros((zones, 4))
+    dark[:, 3] = 3500
+
+    dot = []
+    for i in range(frames):
+        frame = dark.copy()
+        frame[i % zones] = (200.0, 1.0, 1.0, 3500)
+        dot.append(frame)
+
+    rainbow = []
+    for i in range(frames):
+        frame = dark.copy()
+        frame[:, 0] = (np.arange(zones) * 360 / zones + i * 6) % 360
+        frame[:, 1:3] = 1.0
+        rainbow.append(frame)
+
+    sparkle = []
+    frame = dark.copy()
+    for _ in range(frames):
+        frame = frame.copy()
+        frame[rng.integers(0, zones, 3), 2] = rng.uniform(0.2, 1.0, 3)
+        sparkle.append(frame)
+
+    return {'moving dot': dot, 'rainbow scroll': rainbow, 'sparkle': sparkle, 'static': [dark] * frames}
+
+
+def run(stream, bulb, frames, full):
+    before_bytes = bulb.bytes_received
+    stream.frames = stream.messages = stream.bytes = 0
+    stream.reset()
+    start = time.perf_counter()
+    for frame in frames:
+        if full:
+            stream.reset()
+        stream.send(frame)
+    elapsed = time.perf_counter() - start
+
+    deadline = time.monotonic() + 1
+    while bulb.bytes_received - before_bytes < stream.bytes and time.monotonic() < deadline:
+        time.sleep(0.001)
+    expected = [tuple(zone) for zone in stream.last.tolist()]
+    assert bulb.zones == expected, 'stand-in device shows a different frame'
+    return stream.messages / len(frames), stream.bytes / len(frames), len(frames) / elapsed
+
+
+def main(frames=300, fps=20.0):
+    use_stub_config()
+    from luminary.api import lifx_frames, lifx_lan
+
+    devices = {
+        f"strip ({STRIP_ZONES} zones)": (StubBulb(zones=STRIP_ZONES), lifx_frames.LanZoneSender, STRIP_ZONES),
+        f"tiles ({TILES} x 64)": (StubBulb(zones=TILES * lifx_lan.TILE_ZONES), lifx_frames.LanTileSender,
+                                  TILES * lifx_lan.TILE_ZONES),
+    }
+    for device, (bulb, sender, zones) in devices.items():
+        light = lifx_lan.LanLight('127.0.0.1', bulb.mac, port=bulb.port)
+        stream = lifx_frames.FrameStream(sender(light), lifx_frames.FrameGovernor(fps, None))
+        print(device)
+        for name, animation in animations(zones, frames).items():
+            full_messages, full_bytes, _ = run(stream, bulb, animation, full=True)
+            messages, size, max_fps = run(stream, bulb, animation, full=False)
+            print(f"  {name:<15} full frames {full_messages:4.1f} msg {full_bytes:6.0f} B  "
+                  f"diffed {messages:4.1f} msg {size:6.0f} B   encoder max {max_fps:7.0f} fps")
+        light.close()
+        bulb.close()
+
+    bulb = StubBulb(zones=STRIP_ZONES)
+    light = lifx_lan.LanLight('127.0.0.1', bulb.mac, port=bulb.port)
+    stream = lifx_frames.FrameStream(lifx_frames.LanZoneSender(light), lifx_frames.FrameGovernor(fps))
+    animation = animations(STRIP_ZONES, int(fps * 3))['rainbow scroll']
+    start = time.perf_counter()
+    stream.play(animation)
+    elapsed = time.perf_counter() - start
+    print(f"governed rainbow scroll: {stream.frames} frames in {elapsed:.2f} s = {stream.frames / elapsed:.1f} fps "
+          f"(target {fps:g}), {stream.messages / elapsed:.1f} msg/s, {stream.skipped} skipped")
+    light.close()
+    bulb.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=20.0)
+    args = parser.parse_args()
+    main(args.frames, args.fps)
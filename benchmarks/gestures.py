@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Classifies a synthetic, seeded sensor trace containing each gesture plus echo noise, and measures the per-reading
+cost of the filter and classifier. The same seed always gives the same trace and the same gestures.
+
+Usage: python -m benchmarks.gestures [--rate HZ] [--repeat N] [--seed N]
+"""
+import argparse
+import random
+import time
+
+from luminary.util.gestures import GestureClassifier
+
+# (time, gesture) the classifier finds in the default trace, rate 20 and seed 0
+EXPECTED = [(2.75, 'hover'), (6.1, 'approach'), (9.6, 'double_wave')]
+
+
+def trace(rate=20, seed=0):
+    """
+    :return: List of (time, distance) readings: idle, hover, idle, slow approach, idle, double wave, idle.
+             About 2% of readings are missed echoes and 3% are stray spikes.
+    """
+    rng = random.Random(seed)
+    segments = [
+        (2.0, lambda t: 80),
+        (1.0, lambda t: 3),  # hover
+        (2.0, lambda t: 80),
+        (1.5, lambda t: 35 - 15 * t / 1.5),  # slow approach from 35 to 20 cm
+        (2.0, lambda t: 80),
+        (0.3, lambda t: 3),  # wave
+        (0.3, lambda t: 80),
+        (0.3, lambda t: 3),  # wave
+        (2.0, lambda t: 80),
+    ]
+    readings = []
+    now = 0.0
+    for length, distance in segments:
+        for i in range(int(length * rate)):
+            t = i / rate
+            value = distance(t) + rng.gauss(0, 0.3)
+            noise = rng.random()
+            if noise < 0.02:
+                value = None
+            elif noise < 0.05:
+                value = rng.uniform(2, 200)
+            readings.append((now + t, value))
+        now += length
+    return readings
+
+
+def classify(readings):
+    classifier = GestureClassifier()
+    found = []
+    for reading_time, distance in readings:
+        gesture = classifier.update(reading_time, distance)
+        if gesture is not None:
+            found.append((round(reading_time, 2), gesture))
+    return found
+
+
+def main(rate=20, repeat=200, seed=0):
+    readings = trace(rate, seed)
+    found = classify(readings)
+    print(f"gestures: {found}")
+    assert [gesture for _, gesture in found] == [gesture for _, gesture in EXPECTED], found
+    if (rate, seed) == (20, 0):
+        assert found == EXPECTED, found
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        classify(readings)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / (repeat * len(readings)) * 1e6:.2f} us per reading")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    main(args.rate, args.repeat, args.seed)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Ingesting weather.gov's hourly forecast: json.loads of the whole document and picking the fields out of it vs.
+the streaming parser going straight to columns, on a synthetic week of hourly periods shaped like the real
+document. Compares parse time, peak memory during the parse and the memory the result holds on to, then the cost
+of planning a day of ambient light from the columns in one pass vs. looking up each hour in Python.
+
+Usage: python -m benchmarks.hourly_forecast [--hours N] [--runs N]
+"""
+import argparse
+import datetime
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.stubs import use_stub_config
+
+FORECASTS = ('Sunny', 'Mostly Sunny', 'Partly Cloudy', 'Mostly Cloudy', 'Clear', 'Mostly Clear',
+             'Chance Rain Showers', 'Rain Showers Likely', 'Chance Showers And Thunderstorms')
+
+
+def forecast_document(hours=156, seed=0):
+    """
+    :return: forecastHourly JSON document as bytes.
+    """
+    rng = random.Random(seed)
+    zone = datetime.timezone(datetime.timedelta(hours=-5))
+    start = datetime.datetime.now(zone).replace(minute=0, second=0, microsecond=0)
+    periods = []
+    for number in range(hours):
+        at = start + datetime.timedelta(hours=number)
+        daytime = 6 <= at.hour < 18
+        chance = rng.choice([0, 0, 0, 10, 20, 40, 60, 80])
+        forecast = rng.choice(FORECASTS[:4] if daytime else FORECASTS[4:6]) if chance < 30 else \
+            rng.choice(FORECASTS[6:])
+        periods.append({
+            'number': number + 1,
+            'name': '',
+            'startTime': at.isoformat(),
+            'endTime': (at + datetime.timedelta(hours=1)).isoformat(),
+            'isDaytime': daytime,
+            'temperature': rng.randint(40, 100),
+            'temperatureUnit': 'F',
+            'temperatureTrend': None,
+            'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': chance},
+            'dewpoint': {'unitCode': 'wmoUnit:degC', 'value': rng.uniform(-5, 25)},
+            'relativeHumidity': {'unitCode': 'wmoUnit:percent', 'value': rng.randint(20, 100)},
+            'windSpeed': f"{rng.randint(0, 25)} mph",
+            'windDirection': rng.choice(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']),
+            'icon': f"https://api.weather.gov/icons/land/{'day' if daytime else 'night'}/rain_showers,{chance}"
+                    f"?size=small",
+            'shortForecast': forecast,
+            'detailedForecast': '',
+        })
+    document = {
+        '@context': ['https://geojson.org/geojson-ld/geojson-context.jsonld', {'@version': '1.1'}],
+        'type': 'Feature',
+        'geometry': {'type': 'Polygon', 'coordinates': [[[-97.1, 39.7], [-97.1, 39.8], [-97.0, 39.8]]]},
+        'properties': {
+            'units': 'us',
+            'forecastGenerator': 'HourlyForecastGenerator',
+            'generatedAt': start.isoformat(),
+            'updateTime': start.isoformat(),
+            'validTimes': f"{start.isoformat()}/P7DT13H",
+            'elevation': {'unitCode': 'wmoUnit:m', 'value': 441.96},
+            'periods': periods,
+        },
+    }
+    return json.dumps(document, indent=4).encode()
+
+
+def chunks(body, size):
+    return (body[i:i + size] for i in range(0, len(body), size))
+
+
+def with_loads(body):
+    """
+    The json.loads way: whole document first, then the fields of each period.
+    """
+    from luminary.api import weather
+    from luminary.util import weather_rules
+
+    rules = weather_rules.get_rules()
+    periods = json.loads(body)['properties']['periods']
+    return [(datetime.datetime.fromisoformat(period['startTime']).timestamp(), weather.get_temperature(period),
+             period['probabilityOfPrecipitation']['value'], 25 * rules.cloud_level(period['shortForecast']),
+             period['isDaytime']) for period in periods], periods
+
+
+def measure(func, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, current, result
+
+
+def per_hour_schedule(forecast, rules, start, hours):
+    """
+    ambient_schedule as a plain Python loop over the hours.
+    """
+    night = rules.night_brightness
+    threshold = rules.ambient_precipitation_chance
+    duration = rules.ambient_duration
+    changes, last = [], None
+    for at, temperature, chance, sky_cover, daytime in zip(
+            forecast.start.tolist(), forecast.temperature.tolist(), forecast.precipitation_chance.tolist(),
+            forecast.sky_cover.tolist(), forecast.is_daytime.tolist()):
+        if at + 3600 <= start or at >= start + hours * 3600:
+            continue
+        chance = 0.0 if chance != chance else chance
+        color = rules.precipitation_chance(chance) if chance >= threshold else rules.temperature(temperature)
+        brightness = round(rules.ambient_brightness(sky_cover) * (1.0 if daytime else night), 3)
+        if (color, brightness) != last:
+            changes.append((max(at, start), {'color': color, 'brightness': brightness, 'duration': duration}))
+            last = color, brightness
+    return changes
+
+
+def main(hours=156, runs=20):
+    use_stub_config()
+    from luminary import ambient
+    from luminary.api import hourly_forecast
+    from luminary.util import weather_rules
+
+    rules = weather_rules.get_rules()
+    body = forecast_document(hours)
+    print(f"{hours} hourly periods, {len(body) / 1024:.0f} KB document")
+
+    loads_time, loads_peak, loads_kept, _ = measure(lambda: with_loads(body), runs)
+    stream_time, stream_peak, stream_kept, forecast = measure(
+        lambda: hourly_forecast.parse(chunks(body, hourly_forecast.CHUNK_SIZE), rules), runs)
+    print(f"json.loads + fields: {loads_time * 1000:6.2f} ms, peak {loads_peak / 1024:6.0f} KB, "
+          f"document held {loads_kept / 1024:5.0f} KB")
+    print(f"streaming columns:   {stream_time * 1000:6.2f} ms, peak {stream_peak / 1024:6.0f} KB, "
+          f"columns held {forecast.nbytes / 1024:5.1f} KB")
+
+    start = forecast.start[0] + 1800
+    for span in (24, hours):
+        vectorized = ambient.ambient_schedule(forecast, rules, start, span)
+        assert vectorized == per_hour_schedule(forecast, rules, start, span), 'schedules differ'
+        for name, func in (('per hour loop', per_hour_schedule), ('vectorized', ambient.ambient_schedule)):
+            elapsed, _, _, _ = measure(lambda: func(forecast, rules, start, span), runs)
+            print(f"{span:3d} hour schedule, {name:<13} {elapsed * 1e6:7.1f} us ({len(vectorized)} changes)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=int, default=156)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    main(args.hours, args.runs)
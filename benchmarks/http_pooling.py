@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Per-call latency of bare requests calls vs. the pooled HttpClient against a local stub server.
+
+Usage: python -m benchmarks.http_pooling [--calls N] [--handshake-delay SECONDS]
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.stubs import start_stub_server
+from luminary.api.http_client import HttpClient
+
+
+def time_calls(call, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings, server, connections_before):
+    print(f"{name:<8} mean {statistics.mean(timings) * 1000:7.2f} ms  "
+          f"median {statistics.median(timings) * 1000:7.2f} ms  "
+          f"connections {server.connections - connections_before}")
+
+
+def main(calls=200, handshake_delay=0.0):
+    server = start_stub_server(handshake_delay=handshake_delay)
+    url = f"http://127.0.0.1:{server.server_port}"
+    payload = {"power": "on", "duration": 1.0}
+
+    before = server.connections
+    bare = time_calls(lambda: requests.put(f"{url}/lights/id:stub/state", json=payload), calls)
+    report('bare', bare, server, before)
+
+    client = HttpClient(url)
+    before = server.connections
+    pooled = time_calls(lambda: client.put('lights/id:stub/state', payload), calls)
+    report('pooled', pooled, server, before)
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--handshake-delay', type=float, default=0.0,
+                        help='Seconds added to every new connection to mimic a TLS handshake.')
+    args = parser.parse_args()
+    main(args.calls, args.handshake_delay)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Round-trip latency of the LAN and cloud transports against a local stand-in bulb and mock cloud API.
+Cloud latency is the local stub's plus --cloud-latency, to stand in for the trip to api.lifx.com.
+
+Usage: python -m benchmarks.lan_latency [--calls N] [--cloud-latency SECONDS]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.stubs import StubBulb, start_stub_server, use_stub_config
+
+
+def time_calls(call, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(calls=200, cloud_latency=0.0):
+    use_stub_config()
+    from luminary.api import lifx_lan
+    from luminary.api.http_client import HttpClient
+    from luminary.api.transport import CloudTransport, LanTransport
+
+    bulb = StubBulb()
+    server = start_stub_server(latency=cloud_latency, body=[{'id': bulb.mac, 'power': 'on'}])
+
+    lights = lifx_lan.discover(timeout=0.2, broadcast='127.0.0.1', port=bulb.port)
+    assert bulb.mac in lights, 'stand-in bulb was not discovered'
+    transports = {
+        'lan': LanTransport(lights, fetch_color=None),
+        'cloud': CloudTransport(HttpClient(f"http://127.0.0.1:{server.server_port}")),
+    }
+
+    selector = f"id:{bulb.mac}"
+    payload = {'power': 'on', 'color': 'hue:120 saturation:1.0 brightness:0.5 kelvin:3500', 'duration': 0}
+    for name, transport in transports.items():
+        for call_name, call in (('get_status', lambda: transport.get_status(selector)),
+                                ('set_state', lambda: transport.set_state(selector, payload))):
+            timings = time_calls(call, calls)
+            print(f"{name:<6} {call_name:<11} mean {statistics.mean(timings) * 1000:7.3f} ms  "
+                  f"median {statistics.median(timings) * 1000:7.3f} ms")
+
+    # the last LAN set_state's SetColor and SetPower reached the bulb and read back unchanged
+    assert bulb.hsbk == list(lifx_lan.to_hsbk(120, 1.0, 0.5, 3500)), bulb.hsbk
+    assert bulb.power == 65535
+    status = transports['lan'].get_status(selector)
+    assert status['power'] == 'on' and status['color'] == {'hue': 120.0, 'saturation': 1.0, 'kelvin': 3500}, status
+    assert round(status['brightness'], 3) == 0.5, status
+
+    bulb.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--cloud-latency', type=float, default=0.0,
+                        help='Seconds added to every mock cloud response.')
+    args = parser.parse_args()
+    main(args.calls, args.cloud_latency)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+What instrumentation costs: recording into a histogram and the disabled check on their own, then requests to a
+local stub server through HttpClient with metrics off and on. Ends with the log summary and a scrape of the
+Prometheus endpoint, to show what they report.
+
+Usage: python -m benchmarks.metrics_overhead [--requests N]
+"""
+import argparse
+import statistics
+import time
+import timeit
+import urllib.request
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+
+def per_request(client, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get('lights/id:d073d5000001')
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(count=2000):
+    server = start_stub_server(body=[{'id': 'd073d5000001', 'power': 'on'}])
+    use_stub_config(metrics={'enabled': 'on', 'port': '0', 'log_interval': '0'})
+    from luminary.api.http_client import HttpClient
+    from luminary.util import metrics
+
+    number = 200000
+    histogram = metrics.histogram('benchmark_seconds')
+    check = timeit.timeit('metrics.enabled', globals={'metrics': metrics}, number=number) / number
+    record = timeit.timeit('histogram.record(0.0123)', globals={'histogram': histogram}, number=number) / number
+    lookup = timeit.timeit("metrics.observe('benchmark_seconds', 0.0123, endpoint='x')", globals={'metrics': metrics},
+                           number=number) / number
+    print(f"disabled check {check * 1e9:6.0f} ns, record {record * 1e9:6.0f} ns, "
+          f"lookup + record {lookup * 1e9:6.0f} ns")
+
+    client = HttpClient(f"http://127.0.0.1:{server.server_port}", retries=0)
+    per_request(client, 100)  # connect and warm up
+    off = per_request(client, count)
+    metrics.start()
+    on = per_request(client, count)
+    print(f"request median: metrics off {off * 1e6:6.1f} us, on {on * 1e6:6.1f} us "
+          f"({(on - off) * 1e6:+.1f} us)")
+
+    for line in metrics.summary():
+        print(line)
+    endpoint = metrics.serve(0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{endpoint.server_port}/metrics") as response:
+        scraped = response.read().decode().splitlines()
+    request_lines = [line for line in scraped if line.startswith('http_request_seconds')]
+    print(f"scraped {len(scraped)} lines, e.g.:")
+    for line in request_lines[-4:]:
+        print(f"  {line}")
+    assert any(line.startswith('http_request_seconds_count') and line.endswith(f" {count}") for line in scraped)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    main(args.requests)
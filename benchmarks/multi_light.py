@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Commands aimed at several lights against a local stand-in for the LIFX API: one request per light vs. compiled to a
+combined selector (a group, a location or comma-joined ids) or one set states request when the lights get different
+states. Counts requests the stub received for each; tests/test_set_states.py checks what the compiled ones take.
+
+Usage: python -m benchmarks.multi_light [--latency SECONDS]
+"""
+import argparse
+import configparser
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+ROOMS = {'Living': 4, 'Office': 3, 'Bedroom': 3}
+
+WARM = {'color': 'kelvin:2700', 'brightness': 0.6, 'duration': 1.0}
+OFF = {'power': 'off', 'duration': 1.0}
+DIM = {'color': 'kelvin:2200', 'brightness': 0.2, 'duration': 1.0}
+
+
+def write_lights(config_dir):
+    """
+    Writes a lights.ini of ROOMS' lights, all in location Home.
+
+    :return: Dict of room to its light names.
+    """
+    config = configparser.ConfigParser()
+    rooms, number = {}, 0
+    for room, count in ROOMS.items():
+        for _ in range(count):
+            number += 1
+            name = f"{room.lower()}{len(rooms.get(room, [])) + 1}"
+            config[name] = {'id': f"d073d5{number:06x}", 'group': room, 'location': 'Home'}
+            rooms.setdefault(room, []).append(name)
+    with open(f"{config_dir}/lights.ini", 'w') as f:
+        config.write(f)
+    return rooms
+
+
+def main(latency=0.05):
+    server = start_stub_server(latency=latency)
+    config_dir = use_stub_config(lifx={'api_url': f"http://127.0.0.1:{server.server_port}", 'rate_limit': '0'})
+    rooms = write_lights(config_dir)
+    from luminary.api import lifx
+
+    everything = [name for names in rooms.values() for name in names]
+    scenes = {
+        'living room warm': {name: WARM for name in rooms['Living']},
+        'whole house warm': {name: WARM for name in everything},
+        'one light per room': {names[0]: WARM for names in rooms.values()},
+        'evening': {**{name: WARM for name in rooms['Living']}, **{name: OFF for name in rooms['Office']},
+                    **{name: DIM for name in rooms['Bedroom']}},
+    }
+
+    lifx.set_state(WARM, 'id:d073d5000001')  # connect and warm up outside the timings
+    for scene, states in scenes.items():
+        for label, apply in (('per light', per_light), ('compiled', lifx.set_states)):
+            del server.calls[:]
+            start = time.perf_counter()
+            apply(states)
+            elapsed = time.perf_counter() - start
+            calls = list(server.calls)
+            sent = ', '.join(f"{method} {path}" for method, path, _ in calls) if label == 'compiled' else ''
+            print(f"{scene:<20}{label:<11}{len(calls):3d} requests {elapsed * 1000:7.1f} ms  {sent}")
+
+
+def per_light(states):
+    from luminary.api import lifx
+
+    for name, payload in states.items():
+        lifx.set_state(payload, name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.latency)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Simulated-clock harness for the rate limit governor and set_state coalescing.
+Replays a burst of API calls against a simulated LIFX rate limit window, so minutes of traffic run instantly.
+Then a few seconds of real traffic from several threads through HttpClient, against a local stand-in API with a
+scaled down rate limit, resending what it answers with a 429.
+
+Usage: python -m benchmarks.ratelimit_sim [--calls N] [--limit N]
+"""
+import argparse
+import concurrent.futures
+
+from benchmarks.stubs import start_stub_server
+from luminary.api.http_client import HttpClient
+from luminary.api.ratelimit import RateLimiter
+from luminary.api.transport import CoalescingTransport
+
+
+class SimulatedClock:
+    def __init__(self, start=1_600_000_000.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+class SimulatedApi:
+    def __init__(self, clock, limit=120, period=60.0, latency=0.05):
+        """
+        Fixed window rate limit like api.lifx.com: `limit` requests per window, 429 after that until reset.
+        """
+        self.clock = clock
+        self.limit = limit
+        self.period = period
+        self.latency = latency
+        self.window_start = None
+        self.used = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def handle(self):
+        self.clock.sleep(self.latency)
+        now = self.clock.time()
+        if self.window_start is None or now >= self.window_start + self.period:
+            self.window_start, self.used = now, 0
+        self.requests += 1
+        self.used += 1
+
+        status = 200
+        if self.used > self.limit:
+            status = 429
+            self.rejected += 1
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(max(0, self.limit - self.used)),
+            'X-RateLimit-Reset': str(self.window_start + self.period),
+        }
+        return status, headers
+
+
+def run_burst(calls, limit, governed):
+    clock = SimulatedClock()
+    api = SimulatedApi(clock, limit=limit)
+    limiter = RateLimiter(limit, clock=clock.time, sleep=clock.sleep) if governed else None
+    start = clock.time()
+
+    for _ in range(calls):
+        if limiter is None:
+            api.handle()
+            continue
+        while True:
+            limiter.acquire()
+            status, headers = api.handle()
+            limiter.update(headers, status)
+            if status != 429:
+                break
+    return api, clock.time() - start
+
+
+def run_waiters(waiters, limit):
+    """
+    :return: Seconds each of waiters callers lining up at once waits, once the server said its window is used up.
+    """
+    clock = SimulatedClock()
+    limiter = RateLimiter(limit, clock=clock.time, sleep=clock.sleep)
+    limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(clock.time() + 30)})
+    return [limiter.reserve() for _ in range(waiters)]
+
+
+def run_http(threads=4, requests=20, limit=5, period=1.0):
+    """
+    :return: Status codes HttpClient returned and the stand-in API.
+    """
+    server = start_stub_server(body=[], rate_limit=limit, rate_period=period)
+    # the client starts out assuming api.lifx.com's limit and learns the real one from the first answers
+    client = HttpClient(f"http://127.0.0.1:{server.server_port}", retries=0, rate_limiter=RateLimiter(period=period))
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        statuses = list(executor.map(lambda _: client.get('lights/all').status_code, range(requests)))
+    server.shutdown()
+    return statuses, server
+
+
+class ManualTimer:
+    timers = []
+
+    def __init__(self, interval, function, args=()):
+        self.function, self.args, self.cancelled = function, args, False
+
+    def start(self):
+        ManualTimer.timers.append(self)
+
+    def cancel(self):
+        self.cancelled = True
+
+    @classmethod
+    def fire_all(cls):
+        while cls.timers:
+            timer = cls.timers.pop(0)
+            if not timer.cancelled:
+                timer.function(*timer.args)
+
+
+class CountingTransport:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def set_state(self, selector, payload):
+        self.sent.append((selector, payload))
+        if self.fail and len(self.sent) > 1:
+            raise OSError('network is unreachable')
+
+
+def run_coalescing(calls, fail=False):
+    """
+    :return: Payloads sent and selectors reported failed for calls rapid set_states, the later ones failing if fail.
+    """
+    counting = CountingTransport(fail)
+    failed = []
+    transport = CoalescingTransport(counting, window=0.2, timer=ManualTimer, on_error=failed.append)
+    for i in range(calls):
+        transport.set_state('id:stub', {'power': 'on', 'brightness': (i + 1) / calls, 'duration': 1.0})
+    ManualTimer.fire_all()
+    return counting.sent, failed
+
+
+def main(calls=300, limit=120):
+    for governed in (False, True):
+        api, elapsed = run_burst(calls, limit, governed)
+        print(f"{'governed' if governed else 'ungoverned':<11} {calls} calls: {api.requests} requests, "
+              f"{api.rejected} rejected with 429, {elapsed:.1f} simulated s")
+        if governed:
+            assert api.rejected == 0 and api.requests == calls, 'governor let requests run into the rate limit'
+        elif calls > limit:
+            assert api.rejected == calls - limit
+
+    waits = run_waiters(10, limit)
+    assert all(wait >= 30 for wait in waits), f"callers waiting on a used up window went early: {waits}"
+
+    threads = 4
+    statuses, server = run_http(threads)
+    print(f"http        {len(statuses)} calls from {threads} threads: {server.requests} requests, "
+          f"{server.rate_limited} answered with 429 and resent")
+    assert statuses.count(200) == len(statuses), statuses
+    # only the first window, before any answer told the client the real limit, runs into it
+    assert server.rate_limited <= threads, server.rate_limited
+
+    sent, _ = run_coalescing(10)
+    print(f"coalescing  10 rapid turn_on(brightness=...) calls: {len(sent)} request(s), final payload {sent[-1][1]}")
+    # the first goes out right away, the rest merge into one when the window closes
+    assert [payload['brightness'] for _, payload in sent] == [0.1, 1.0], sent
+
+    sent, failed = run_coalescing(10, fail=True)
+    assert len(sent) == 2 and failed == ['id:stub'], 'failed coalesced set_state was not reported'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--limit', type=int, default=120)
+    args = parser.parse_args()
+    main(args.calls, args.limit)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Depth sensor sampling in the light switch's own process vs. in the sampler process, idle and while the light
+switch's process is busy: threads doing pure Python work hold the GIL, and toggles block on a slow stand-in for
+the LIFX API. Reports readings taken against the target rate, how far the intervals between them stray from the
+sample period, and the error of the distances read, as the fake sensor always sees DISTANCE cm.
+
+Usage: python -m benchmarks.sampler_jitter [--rate HZ] [--seconds N] [--threads N]
+"""
+import argparse
+import concurrent.futures
+import json
+import statistics
+import threading
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+DISTANCE = 100.0  # fake_gpio.distance, the same in the sampler process
+
+
+def busy(stop):
+    """
+    Pure Python work holding the GIL, like parsing a forecast or planning effects.
+    """
+    document = {'periods': [{'number': i, 'temperature': i % 100, 'name': f"Hour {i}"} for i in range(200)]}
+    while not stop.is_set():
+        json.loads(json.dumps(document))
+
+
+def toggles(stop):
+    from luminary.api import lifx
+
+    while not stop.is_set():
+        lifx.toggle_power()
+
+
+def collect(readings, seconds):
+    collected = []
+    deadline = time.monotonic() + seconds
+    for reading in readings:
+        collected.append(reading)
+        if reading.time >= deadline:
+            break
+    return collected
+
+
+def report(label, readings, rate, seconds):
+    period = 1 / rate
+    deviations = sorted(abs(b.time - a.time - period) * 1000 for a, b in zip(readings, readings[1:]))
+    errors = sorted(abs(reading.distance - DISTANCE) for reading in readings if reading.distance is not None)
+    missed = sum(reading.distance is None for reading in readings)
+
+    def p99(values):
+        return values[int(len(values) * 0.99)] if values else float('nan')
+
+    print(f"{label:<18} {len(readings):4d}/{round(rate * seconds):4d} readings, {missed:3d} missed | interval "
+          f"off by p50 {statistics.median(deviations):5.2f} p99 {p99(deviations):6.2f} max {deviations[-1]:6.2f} ms | "
+          f"distance error p50 {statistics.median(errors):5.2f} p99 {p99(errors):6.2f} max {errors[-1]:6.2f} cm")
+
+
+def main(rate=50.0, seconds=5.0, threads=2):
+    server = start_stub_server(latency=0.3, body=[{'id': 'stub', 'power': 'on', 'brightness': 1.0}])
+    use_stub_config(lifx={'api_url': f"http://127.0.0.1:{server.server_port}", 'rate_limit': '0'},
+                    **{'raspberry-pi': {'gpio': 'fake', 'uds_trig': '23', 'uds_echo': '24'}})
+    from luminary.api import sensor_sampler, ultrasonic_depth_sensor as uds
+
+    uds.setup_pins(settle=0)
+    for load in ('idle', 'busy'):
+        stop = threading.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads + 1)
+        if load == 'busy':
+            for _ in range(threads):
+                executor.submit(busy, stop)
+            executor.submit(toggles, stop)
+        time.sleep(0.2)
+        report(f"thread, {load}", collect(uds.distances(rate), seconds), rate, seconds)
+
+        # only sampling while it's measured, so the two never compete for a core
+        process, ring = sensor_sampler.start(rate)
+        readings = ring.readings()
+        next(readings)  # wait for the sampler process to be up
+        report(f"process, {load}", collect(readings, seconds), rate, seconds)
+        print(f"{'':<18} {ring.dropped} readings dropped from the ring")
+        sensor_sampler.stop(process, ring)
+
+        stop.set()
+        executor.shutdown()
+    print(f"toggles sent: {server.requests}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=50.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=2)
+    args = parser.parse_args()
+    main(args.rate, args.seconds, args.threads)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Activating a local scene snapshot against a local stand-in for the LIFX API: sending every light its saved state
+vs. only the lights that differ from it, as more of the lights are already in place. Counts requests and lights
+written for each (tests/test_scenes.py checks the diff's), then the size and load time of scene files vs. the same
+states kept as JSON.
+
+Usage: python -m benchmarks.scenes [--lights N] [--runs N]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+
+def statuses(count, seed=0):
+    """
+    :return: List of count random light statuses like the list lights API returns.
+    """
+    rng = random.Random(seed)
+    return [{'id': f"d073d5{number:06x}", 'label': f"Light {number}", 'connected': True,
+             'power': rng.choice(['on', 'on', 'off']), 'brightness': round(rng.random(), 4),
+             'color': {'hue': round(rng.uniform(0, 360), 2), 'saturation': round(rng.random(), 4),
+                       'kelvin': rng.choice([2500, 2700, 3500, 5000])}}
+            for number in range(1, count + 1)]
+
+
+def drift(saved, changed, seed=1):
+    """
+    :return: Copy of saved statuses with `changed` of the lights at a different brightness or power.
+    """
+    rng = random.Random(seed)
+    current = json.loads(json.dumps(saved))
+    for status in rng.sample(current, changed):
+        if status['power'] == 'on' and rng.random() < 0.5:
+            status['brightness'] = round((status['brightness'] + 0.5) % 1.0, 4)
+        else:
+            status['power'] = 'off' if status['power'] == 'on' else 'on'
+    return current
+
+
+def full_activation(scene):
+    """
+    Every light of the scene sent its saved state, whatever it's in now.
+    """
+    from luminary.api import lifx
+
+    lifx.set_states(scene.changes([]), defaults={'duration': 1.0})
+
+
+def lights_written(calls):
+    count = 0
+    for method, path, body in calls:
+        if method != 'PUT':
+            continue
+        selectors = [state['selector'] for state in body['states']] if path == '/lights/states' else \
+            [path.split('/')[2]]
+        count += sum(len(selector.split(',')) for selector in selectors)
+    return count
+
+
+def main(count=10, runs=200):
+    server = start_stub_server()
+    use_stub_config(lifx={'api_url': f"http://127.0.0.1:{server.server_port}", 'rate_limit': '0',
+                          'state_max_age': '0'})
+    from luminary.api import scenes
+
+    saved = statuses(count)
+    server.body = saved
+    ids = [f"id:{status['id']}" for status in saved]
+    scenes.snapshot('benchmark', ids)
+    print(f"{count} lights saved")
+
+    for changed in (0, 1, count // 5, count):
+        for label, activate in (('full', lambda: full_activation(scenes.load_scene('benchmark'))),
+                                ('diff', lambda: scenes.activate_snapshot('benchmark'))):
+            server.body = drift(saved, changed)
+            del server.calls[:]
+            activate()
+            calls = list(server.calls)
+            reads = sum(method == 'GET' for method, _, _ in calls)
+            print(f"{changed:3d} lights differ, {label}: {len(calls)} requests ({reads} reads), "
+                  f"{lights_written(calls):3d} lights written")
+
+    for size in (count, 1000):
+        big = scenes.Scene.from_statuses(statuses(size))
+        scenes.save_scene('big', big)
+        with open(scenes.scene_path('big'), 'rb') as f:
+            data = f.read()
+        text = json.dumps(statuses(size))
+        assert scenes.Scene.decode(data).states == big.states
+        for label, load, stored in (('scene file', lambda: scenes.load_scene('big'), len(data)),
+                                    ('JSON', lambda: json.loads(text), len(text))):
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                load()
+                times.append(time.perf_counter() - start)
+            print(f"{size:5d} lights, {label:<10} {stored / 1024:7.1f} KB, "
+                  f"load {statistics.median(times) * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lights', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+    main(args.lights, args.runs)
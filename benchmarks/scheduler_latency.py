@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+How close to their trigger time scheduled jobs get their work done, against a local mock of the LIFX API that
+charges a handshake for every new connection, as a real TLS connection to api.lifx.com does.
+Between firings the connection is dropped, as an idle keep-alive connection would be by the time of the next
+day's wakeup. Compares jobs without a warm-up to jobs whose warm-up reopens the connection ahead of time.
+
+Usage: python -m benchmarks.scheduler_latency [--runs N] [--interval SECONDS] [--handshake SECONDS]
+"""
+import argparse
+import datetime
+import statistics
+import threading
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+
+class Every:
+    def __init__(self, seconds, first):
+        """
+        Trigger firing every given seconds from first on, recording each time it hands out.
+        """
+        self.interval = datetime.timedelta(seconds=seconds)
+        self.first = first
+        self.times = []
+
+    def next(self, after):
+        moment = self.first
+        while moment <= after:
+            moment += self.interval
+        self.times.append(moment)
+        return moment
+
+
+def measure(runs, interval, warm):
+    from luminary import daemon
+    from luminary.api import lifx
+    from luminary.util import scheduler
+
+    schedule = scheduler.Scheduler()
+    trigger = Every(interval, datetime.datetime.now() + datetime.timedelta(seconds=interval))
+    wakeups, done = [], []
+    finished = threading.Event()
+
+    def job():
+        fired = trigger.times[len(wakeups)]
+        wakeups.append((datetime.datetime.now() - fired).total_seconds())
+        lifx.turn_on(brightness=0.5)
+        done.append((datetime.datetime.now() - fired).total_seconds())
+        lifx.get_client().session.close()  # the next firing finds the connection gone
+        if len(done) == runs:
+            finished.set()
+
+    warm_up = (lambda: daemon.warm_up('turn_on')) if warm else None
+    schedule.add(scheduler.Job('job', trigger, job, warm_up, lead=interval / 2))
+    schedule.start()
+    finished.wait()
+    schedule.stop()
+    return wakeups, done
+
+
+def main(runs=10, interval=0.5, handshake=0.15):
+    server = start_stub_server(handshake_delay=handshake, body=[{'id': 'stub', 'power': 'off', 'brightness': 1.0}])
+    use_stub_config(lifx={'api_url': f"http://127.0.0.1:{server.server_port}", 'state_max_age': '0'})
+
+    for name, warm in (('no warm-up', False), ('warm-up', True)):
+        wakeups, done = measure(runs, interval, warm)
+        print(f"{name:<11} woke {statistics.median(wakeups) * 1000:6.2f} ms late, "
+              f"request done {statistics.median(done) * 1000:7.2f} ms after trigger (median of {runs})")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--handshake', type=float, default=0.15)
+    args = parser.parse_args()
+    main(args.runs, args.interval, args.handshake)
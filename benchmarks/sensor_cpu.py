@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+CPU use and accuracy of busy-wait polling (the old detect loop, minus its 2 s sleep) vs. edge-interrupt sensing,
+on the fake GPIO backend. The fake sensor runs in a thread of the same process, so busy-waiting also starves it of
+the GIL and its error here is worse than on a real sensor; the CPU figures are what matter.
+
+Usage: python -m benchmarks.sensor_cpu [--samples N] [--distance CM]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.stubs import use_stub_config
+
+
+def busy_wait_measure(GPIO, trig, echo):
+    GPIO.output(trig, True)
+    time.sleep(0.00001)
+    GPIO.output(trig, False)
+
+    pulse_start = pulse_end = time.time()
+    while GPIO.input(echo) == 0:
+        pulse_start = time.time()
+    while GPIO.input(echo) == 1:
+        pulse_end = time.time()
+    return (pulse_end - pulse_start) * 17150
+
+
+def run(name, measure, samples, distance):
+    errors = []
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(samples):
+        reading = measure()
+        errors.append(abs(reading - distance) if reading is not None else float('nan'))
+        time.sleep(0.06)  # HC-SR04 needs ~60 ms between pings
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    print(f"{name:<10} cpu {cpu / wall * 100:5.1f}% of a core  "
+          f"mean error {statistics.mean(errors):5.2f} cm over {samples} samples")
+
+
+def main(samples=50, distance=30.0):
+    use_stub_config(**{'raspberry-pi': {'gpio': 'fake'}})
+    from luminary.api import fake_gpio
+    from luminary.api import ultrasonic_depth_sensor as uds
+
+    fake_gpio.distance = distance
+    uds.setup_pins(settle=0)
+
+    run('busy-wait', lambda: busy_wait_measure(fake_gpio, *uds.pins()), samples, distance)
+    run('interrupt', uds.measure, samples, distance)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--distance', type=float, default=30.0)
+    args = parser.parse_args()
+    main(args.samples, args.distance)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Import time of every entry point, measured with `python -X importtime` in a fresh interpreter against an empty
+config dir, so heavy imports or config reads creeping back into import time show up.
+Lists each entry point's slowest imports, and exits with 1 if any entry point takes longer than --max-ms.
+
+Usage: python -m benchmarks.startup_time [--runs N] [--top N] [--max-ms MS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = (
+    'luminary.ctl',
+    'luminary.wakeup',
+    'luminary.light_switch',
+    'luminary.daemon',
+    'luminary.api.lifx',
+    'luminary.api.weather',
+)
+
+
+def import_times(module, config_dir):
+    """
+    :return: Dict of module name to cumulative import time in ms.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=ROOT,
+                            env={**os.environ, 'LUMINARY_CONFIG_DIR': config_dir},
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == 'site':
+            times.clear()  # interpreter startup, before our import
+            continue
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main(runs=5, top=5, max_ms=None):
+    config_dir = tempfile.mkdtemp(prefix='luminary-')
+    slow = False
+    for module in ENTRY_POINTS:
+        runs_times = [import_times(module, config_dir) for _ in range(runs)]
+        total = statistics.median(times[module] for times in runs_times)
+        slow |= max_ms is not None and total > max_ms
+        print(f"{module:<24} {total:7.1f} ms")
+
+        heaviest = sorted((name for name in runs_times[0] if name != module and not name.startswith('luminary')),
+                          key=lambda name: -runs_times[0][name])[:top]
+        for name in heaviest:
+            print(f"    {name:<30} {runs_times[0][name]:7.1f} ms")
+    return 1 if slow else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='Slowest third-party/stdlib imports to list per entry point.')
+    parser.add_argument('--max-ms', type=float, help='Fail if any entry point imports slower than this.')
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.top, args.max_ms))
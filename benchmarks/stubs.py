@@ -0,0 +1,216 @@
+import configparser
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request with a small JSON body over HTTP/1.1 keep-alive.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Like any real server; otherwise split header/body writes stall on delayed ACKs.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+        # Stand in for the TCP + TLS handshake a real api.lifx.com connection pays.
+        time.sleep(self.server.handshake_delay)
+
+    def respond(self):
+        length = int(self.headers.get('Content-Length', 0))
+        sent = self.rfile.read(length) if length else b''
+        server = self.server
+        server.requests += 1
+        server.calls.append((self.command, self.path, json.loads(sent) if sent else None))
+        time.sleep(server.latency)
+
+        status, headers = 200, {}
+        if server.outage or server.rng.random() < server.failure_rate:
+            server.failures += 1
+            status = 503
+        elif server.rate_limit:
+            with server.lock:
+                now = time.time()
+                if now >= server.window_reset:
+                    server.window_reset, server.window_used = now + server.rate_period, 0
+                server.window_used += 1
+                remaining = server.rate_limit - server.window_used
+            headers = {'X-RateLimit-Limit': server.rate_limit, 'X-RateLimit-Remaining': max(0, remaining),
+                       'X-RateLimit-Reset': server.window_reset}
+            if remaining < 0:
+                server.rate_limited += 1
+                status = 429
+        self.reply(status, self.route(), headers)
+
+    def route(self):
+        """
+        :return: Body of the longest route prefixing the request path, else the server's body.
+        """
+        matches = [prefix for prefix in self.server.routes if self.path.startswith(prefix)]
+        return self.server.routes[max(matches, key=len)] if matches else self.server.body
+
+    def reply(self, status, body, headers=None):
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        body = json.dumps(body).replace('{base}', base).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_PUT = do_POST = respond
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(latency=0.0, handshake_delay=0.0, body=None, failure_rate=0.0, seed=0, rate_limit=0,
+                      rate_period=60.0, routes=None):
+    """
+    Starts stub HTTP server on a free local port in a background thread.
+
+    :param latency: Seconds every response is delayed by.
+    :param handshake_delay: Seconds every new connection is delayed by.
+    :param body: JSON serializable response body.
+    :param failure_rate: Fraction of requests answered with a 503, drawn from a seeded RNG.
+                         Set server.outage to True to answer every request with a 503.
+    :param seed: Seed of the failure RNG.
+    :param rate_limit: Requests per rate_period window before answering 429s, with X-RateLimit headers like
+                       api.lifx.com. 0 for no limit.
+    :param rate_period: Seconds of the rate limit window.
+    :param routes: Dict of path prefix to the body answered for paths starting with it instead of body.
+                   {base} anywhere in a body is replaced by the server's base url.
+    :return: Running server, base url is f"http://127.0.0.1:{server.server_port}"
+             server.calls lists the (method, path, JSON body) of every request.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.handshake_delay = handshake_delay
+    server.body = body if body is not None else [{}]
+    server.failure_rate = failure_rate
+    server.rng = random.Random(seed)
+    server.outage = False
+    server.connections = 0
+    server.requests = 0
+    server.failures = 0
+    server.calls = []
+    server.routes = routes or {}
+    server.rate_limit = rate_limit
+    server.rate_period = rate_period
+    server.rate_limited = 0
+    server.window_reset = server.window_used = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_stub_config(**configs):
+    """
+    Points luminary at a temporary config dir so api modules can be imported without a real setup.
+    Must be called before importing any luminary.api module.
+
+    :param configs: Config file name (without .ini) to dict of DEFAULT values, e.g. lifx={'api_key': 'stub'}
+    :return: Path of the temporary config dir.
+    """
+    defaults = {
+        'lifx': {'api_key': 'stub', 'light_id': 'stub'},
+        'weather': {'loc_x': '39.745', 'loc_y': '-97.089'},
+        'raspberry-pi': {'uds_trig': '23', 'uds_echo': '24'},
+    }
+    config_dir = tempfile.mkdtemp(prefix='luminary-')
+    for name in set(defaults) | set(configs):
+        config = configparser.ConfigParser()
+        config['DEFAULT'] = {**defaults.get(name, {}), **configs.get(name, {})}
+        with open(f"{config_dir}/{name}.ini", 'w') as f:
+            config.write(f)
+    os.environ['LUMINARY_CONFIG_DIR'] = config_dir
+    return config_dir
+
+
+class StubBulb:
+    def __init__(self, mac='d073d5000001', label='Stub', zones=0):
+        """
+        Stand-in bulb speaking the LIFX LAN protocol on a free local UDP port, answering in a background thread.
+
+        :param mac: MAC hex string the bulb reports; also its cloud light id.
+        :param label: Bulb label.
+        :param zones: Number of multizone zones or tile pixels, 0 for a plain bulb.
+        """
+        from luminary.api import lifx_lan
+
+        self.lan = lifx_lan
+        self.mac = mac
+        self.target = bytes.fromhex(mac) + b'\x00\x00'
+        self.label = label.encode()
+        self.hsbk = [0, 0, 65535, 3500]
+        self.power = 0
+        self.waveforms = []
+        self.received = 0
+        self.bytes_received = 0
+        self.zones = [(0, 0, 0, 3500)] * zones
+        self.applied = 0
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.port = self.socket.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        lan = self.lan
+        buffer = bytearray(1024)
+        while True:
+            try:
+                size, address = self.socket.recvfrom_into(buffer)
+            except OSError:
+                return
+            self.received += 1
+            self.bytes_received += size
+            _, _, source, _, _, flags, sequence, _, msg_type, _ = lan.HEADER.unpack_from(buffer)
+            _, _, _, _, values = lan.decode(buffer[:size])
+
+            if msg_type == lan.SET_COLOR:
+                self.hsbk = list(values[1:5])
+            elif msg_type == lan.SET_POWER:
+                self.power = values[0]
+            elif msg_type == lan.SET_WAVEFORM_OPTIONAL:
+                self.waveforms.append(values)
+            elif msg_type == lan.SET_COLOR_ZONES:
+                start, end, *hsbk, _, apply = values
+                self.zones[start:end + 1] = [tuple(hsbk)] * (end + 1 - start)
+                self.applied += apply
+            elif msg_type == lan.SET_EXTENDED_COLOR_ZONES:
+                _, apply, start, count, *colors = values
+                self.zones[start:start + count] = [tuple(colors[i:i + 4]) for i in range(0, 4 * count, 4)]
+                self.applied += apply
+            elif msg_type == lan.SET64:
+                tile, colors = values[0], values[7:]
+                start = tile * lan.TILE_ZONES
+                self.zones[start:start + lan.TILE_ZONES] = [tuple(colors[i:i + 4]) for i in range(0, len(colors), 4)]
+                self.applied += 1
+
+            if msg_type == lan.GET_SERVICE:
+                reply = (lan.STATE_SERVICE, (1, self.port))
+            elif msg_type == lan.LIGHT_GET:
+                reply = (lan.LIGHT_STATE, (*self.hsbk, 0, self.power, self.label, 0))
+            elif msg_type == lan.GET_POWER:
+                reply = (lan.STATE_POWER, (self.power,))
+            elif flags & lan.ACK_REQUIRED:
+                reply = (lan.ACKNOWLEDGEMENT, ())
+            else:
+                continue
+
+            packet = lan.Packet(source)
+            self.socket.sendto(packet.encode(reply[0], self.target, sequence, reply[1]), address)
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+End to end scenarios run fully offline: a stand-in LIFX API with configurable latency, rate limit and failures, a
+canned weather.gov and the fake GPIO replaying recorded echo pulse widths. Each scenario runs in a fresh process,
+so lazily built clients and caches start cold and its CPU time doesn't include the stand-in servers. Reports the
+requests each server received, wall time and CPU time per scenario, and writes them as JSON to compare across
+commits.
+
+Usage: python -m benchmarks.suite [--output FILE] [--compare FILE] [--only NAME ...] [--latency SECONDS]
+                                  [--trace FILE]
+
+A trace file has one echo pulse width in seconds per line, `none` for a missed echo, taken at TRACE_RATE per second.
+Without one, the gestures benchmark's synthetic trace is used.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+LIGHT_ID = 'd073d5000001'
+TRACE_RATE = 20  # readings per second
+STATUS = [{'id': LIGHT_ID, 'label': 'Stub', 'connected': True, 'power': 'on', 'brightness': 1.0,
+           'color': {'hue': 0.0, 'saturation': 0.0, 'kelvin': 3500}}]
+FORECAST = '{base}/gridpoints/TOP/31,80/forecast'
+WEATHER_ROUTES = {
+    '/points/': {'properties': {'forecast': FORECAST, 'forecastHourly': f"{FORECAST}/hourly"}},
+    '/gridpoints/TOP/31,80/forecast': {'properties': {'periods': [
+        {'number': 1, 'name': 'Today', 'isDaytime': True, 'temperature': 72, 'temperatureUnit': 'F',
+         'icon': 'https://api.weather.gov/icons/land/day/tsra_hi,40?size=medium',
+         'shortForecast': 'Chance Showers And Thunderstorms'},
+        {'number': 2, 'name': 'Tonight', 'isDaytime': False, 'temperature': 58, 'temperatureUnit': 'F',
+         'icon': 'https://api.weather.gov/icons/land/night/few?size=medium', 'shortForecast': 'Mostly Clear'},
+    ]}},
+}
+
+# scenario: stand-in LIFX API it runs against, see servers()
+SCENARIOS = {
+    'blink_power': 'lifx',
+    'effects': 'lifx',
+    'set_state_burst': 'lifx',
+    'rate_limited_burst': 'rate_limited',
+    'flaky_burst': 'flaky',
+    'report_weather_cold': 'lifx',
+    'report_weather_warm': 'lifx',
+    'light_switch': 'lifx',
+}
+# scenarios run in a fresh config dir of their own, after a run of the given scenario (if any) there to seed its
+# caches; the others share config and caches with the scenarios against the same server
+FRESH = {
+    'report_weather_cold': None,
+    'report_weather_warm': 'report_weather_cold',
+}
+BURST = 30
+RATE_LIMIT, RATE_PERIOD = 10, 2.0  # a scaled down api.lifx.com window, so a burst runs into it in seconds
+LIFX_CONFIG = {  # lifx.ini settings per server besides api_url
+    'lifx': {},
+    'rate_limited': {'rate_limit': str(RATE_LIMIT), 'rate_period': str(RATE_PERIOD)},
+    'flaky': {'backoff_factor': '0.01'},
+}
+
+
+def servers(latency):
+    """
+    :return: Dict of name to running stand-in LIFX API.
+    """
+    return {
+        'lifx': start_stub_server(latency=latency, body=STATUS),
+        'rate_limited': start_stub_server(latency=latency, body=STATUS, rate_limit=RATE_LIMIT,
+                                          rate_period=RATE_PERIOD),
+        'flaky': start_stub_server(latency=latency, body=STATUS, failure_rate=0.2),
+    }
+
+
+def run_blink_power():
+    from luminary.api import lifx
+
+    lifx.blink_power(cycles=3)
+
+
+def run_effects():
+    from luminary.api import lifx_effects
+
+    lifx_effects.pulse('red', cycles=2)
+    lifx_effects.breathe('blue', period=0.5, cycles=2)
+    lifx_effects.effects_off()
+
+
+def run_burst():
+    from luminary.api import lifx
+
+    for i in range(BURST):
+        lifx.set_state({'brightness': round((i + 1) / BURST, 3), 'duration': 0.2})
+
+
+def run_report_weather():
+    from luminary import wakeup
+
+    wakeup.report_weather()
+
+
+def run_light_switch():
+    from luminary import light_switch
+    from luminary.api import fake_gpio, ultrasonic_depth_sensor as uds
+
+    widths = load_trace(os.environ['LUMINARY_TRACE'])
+    fake_gpio.pulses = iter(widths)
+    uds.setup_pins(settle=0)
+    light_switch.listen(itertools.islice(uds.distances(TRACE_RATE), len(widths)))
+
+
+RUNNERS = {
+    'blink_power': run_blink_power,
+    'effects': run_effects,
+    'set_state_burst': run_burst,
+    'rate_limited_burst': run_burst,
+    'flaky_burst': run_burst,
+    'report_weather_cold': run_report_weather,
+    'report_weather_warm': run_report_weather,
+    'light_switch': run_light_switch,
+}
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [None if line.strip().lower() in ('', 'none') else float(line) for line in f]
+
+
+def synthetic_trace():
+    """
+    :return: Path of a trace file made from the gestures benchmark's synthetic readings.
+    """
+    from benchmarks.gestures import trace
+
+    path = os.path.join(tempfile.mkdtemp(prefix='luminary-trace-'), 'gestures.trace')
+    with open(path, 'w') as f:
+        for _, distance in trace(TRACE_RATE):
+            f.write('none\n' if distance is None else f"{distance / 17150:.7f}\n")
+    return path
+
+
+def child(name):
+    """
+    Runs one scenario in this process and prints its wall and CPU seconds as JSON.
+    """
+    import luminary.api.lifx  # noqa: F401, imported ahead so the timings are the scenario's alone
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    RUNNERS[name]()
+    print(json.dumps({'wall_s': round(time.perf_counter() - wall, 4), 'cpu_s': round(time.process_time() - cpu, 4)}))
+
+
+def run(name, api, weather, env):
+    before = {key: (server.requests, server.failures, server.rate_limited) for key, server in
+              (('lifx', api), ('weather', weather))}
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--child', name], env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{result.stderr}")
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    lifx_requests, failures, rate_limited = (now - then for now, then in zip(
+        (api.requests, api.failures, api.rate_limited), before['lifx']))
+    return {
+        'lifx_requests': lifx_requests,
+        'lifx_failures': failures,
+        'lifx_rate_limited': rate_limited,
+        'weather_requests': weather.requests - before['weather'][0],
+        **measured,
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    with open(path) as f:
+        baseline = json.load(f)
+    print(f"\nvs. {path} ({baseline.get('commit')})")
+    for name, metrics in results['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        changes = [f"{key} {old[key]} -> {value}" for key, value in metrics.items() if old.get(key) != value]
+        print(f"{name:<22}{', '.join(changes) or 'same'}")
+
+
+def stub_config(server, api, weather):
+    """
+    :return: Path of a new config dir pointed at the stand-in servers.
+    """
+    return use_stub_config(
+        lifx={'api_url': f"http://127.0.0.1:{api.server_port}", 'light_id': LIGHT_ID, **LIFX_CONFIG[server]},
+        weather={'api_url': f"http://127.0.0.1:{weather.server_port}"},
+        **{'raspberry-pi': {'gpio': 'fake', 'uds_trig': '23', 'uds_echo': '24'}})
+
+
+def main(output=None, baseline=None, only=None, latency=0.02, trace=None):
+    stubs = servers(latency)
+    weather = start_stub_server(latency=latency, routes=WEATHER_ROUTES)
+    env = dict(os.environ, LUMINARY_TRACE=trace or synthetic_trace())
+    config_dirs = {}
+
+    results = {'commit': commit(), 'python': platform.python_version(), 'latency': latency, 'scenarios': {}}
+    print(f"{'scenario':<22}{'lifx req':>9}{'failed':>7}{'429s':>6}{'weather req':>12}{'wall s':>9}{'cpu s':>8}")
+    for name, server in SCENARIOS.items():
+        if only and name not in only:
+            continue
+        if name in FRESH:
+            env['LUMINARY_CONFIG_DIR'] = stub_config(server, stubs[server], weather)
+            if FRESH[name] is not None:
+                run(FRESH[name], stubs[server], weather, env)  # seeds the caches, not measured
+        else:
+            if server not in config_dirs:
+                config_dirs[server] = stub_config(server, stubs[server], weather)
+            env['LUMINARY_CONFIG_DIR'] = config_dirs[server]
+        metrics = run(name, stubs[server], weather, env)
+        results['scenarios'][name] = metrics
+        print(f"{name:<22}{metrics['lifx_requests']:9d}{metrics['lifx_failures']:7d}{metrics['lifx_rate_limited']:6d}"
+              f"{metrics['weather_requests']:12d}{metrics['wall_s']:9.3f}{metrics['cpu_s']:8.3f}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        compare(results, baseline)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='File to write the JSON results to.')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with.')
+    parser.add_argument('--only', nargs='+', choices=list(SCENARIOS), help='Scenarios to run, default all.')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stand-in servers take to answer.')
+    parser.add_argument('--trace', help='Echo pulse width trace for the light_switch scenario.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+    else:
+        main(args.output, args.compare, args.only, args.latency, args.trace)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Ambient weather light: through the day the light takes on the color of the hour's forecast temperature, or its
+precipitation color when rain or snow is likely, and dims with cloud cover and at night. The day's changes are
+planned from the hourly forecast in one pass and then applied on schedule with set_state. Power is left alone, so
+the light only shows it while it's on.
+
+Usage: python -m luminary.ambient [--hours N] [--dry-run]
+"""
+import argparse
+import bisect
+import datetime
+import threading
+import time
+
+import numpy as np
+
+from luminary.api import hourly_forecast, lifx
+from luminary.util import scheduler, weather_rules
+
+JOB_NAME = 'ambient-plan'  # the At job applying the plan, named apart from the [ambient] job planning it daily
+
+
+def ambient_schedule(forecast, rules=None, start=None, hours=24):
+    """
+    :param forecast: hourly_forecast.HourlyForecast
+    :param rules: weather_rules.Rules, defaults to the configured rules.
+    :param start: Epoch seconds the schedule starts at, defaults to now.
+    :param hours: Hours the schedule covers.
+    :return: List of (epoch seconds, set_state payload), one per change, the first at start.
+    """
+    rules = rules or weather_rules.get_rules()
+    start = time.time() if start is None else start
+    hour = np.searchsorted(forecast.start, start, side='right') - 1
+    rows = slice(max(hour, 0), np.searchsorted(forecast.start, start + hours * 3600, side='left'))
+    times = np.maximum(forecast.start[rows], start)
+    if not len(times):
+        return []
+
+    temperature_colors = rules.temperature.evaluate_array(forecast.temperature[rows])
+    precipitation_chance = np.nan_to_num(forecast.precipitation_chance[rows])
+    precipitation_colors = rules.precipitation_chance.evaluate_array(precipitation_chance)
+    colors = np.where(precipitation_chance >= rules.ambient_precipitation_chance,
+                      precipitation_colors, temperature_colors)
+    brightness = rules.ambient_brightness.evaluate_array(forecast.sky_cover[rows])
+    brightness = np.round(np.where(forecast.is_daytime[rows], 1.0, rules.night_brightness)
+                          * brightness, 3)
+
+    changed = np.ones(len(times), dtype=bool)
+    changed[1:] = (colors[1:] != colors[:-1]) | (brightness[1:] != brightness[:-1])
+    duration = rules.ambient_duration
+    return [(at, {'color': color, 'brightness': level, 'duration': duration})
+            for at, color, level in zip(times[changed].tolist(), colors[changed].tolist(),
+                                        brightness[changed].tolist())]
+
+
+def schedule_day(schedule, hours=24, selector=None):
+    """
+    Plans the coming hours from the hourly forecast, applies the current hour's state and queues the rest on
+    schedule, replacing any plan queued before.
+
+    :param schedule: scheduler.Scheduler, e.g. the daemon's.
+    :param hours: Hours to plan.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
+    :return: The planned changes, see ambient_schedule.
+    """
+    changes = ambient_schedule(hourly_forecast.get_hourly_forecast(), hours=hours)
+    schedule.cancel(JOB_NAME)
+    if not changes:
+        return changes
+    lifx.set_state(changes[0][1], selector)
+
+    times = [datetime.datetime.fromtimestamp(at) for at, _ in changes]
+
+    def apply():
+        index = bisect.bisect_right(times, schedule.now()) - 1
+        lifx.set_state(changes[max(index, 0)][1], selector)
+
+    schedule.add(scheduler.Job(JOB_NAME, scheduler.At(times[1:]), apply))
+    return changes
+
+
+def main(hours=24, dry_run=False):
+    if dry_run:
+        for at, payload in ambient_schedule(hourly_forecast.get_hourly_forecast(), hours=hours):
+            print(datetime.datetime.fromtimestamp(at).strftime('%a %H:%M'), payload)
+        return
+
+    schedule = scheduler.Scheduler()
+    done = threading.Event()
+    schedule_day(schedule, hours)
+    schedule.add(scheduler.Job('done', scheduler.At([datetime.datetime.now() + datetime.timedelta(hours=hours)]),
+                               done.set))
+    schedule.start()
+    done.wait()
+    schedule.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=int, default=24, help='Hours to plan and run for.')
+    parser.add_argument('--dry-run', action='store_true', help='Print the planned changes instead of applying them.')
+    args = parser.parse_args()
+    main(args.hours, args.dry_run)
@@ -0,0 +1,190 @@
+import colorsys
+import functools
+import math
+
+# https://api.developer.lifx.com/docs/colors
+NAMED_COLORS = {
+    'white': {'saturation': 0.0},
+    'red': {'hue': 0.0, 'saturation': 1.0},
+    'orange': {'hue': 36.0, 'saturation': 1.0},
+    'yellow': {'hue': 60.0, 'saturation': 1.0},
+    'cyan': {'hue': 180.0, 'saturation': 1.0},
+    'green': {'hue': 120.0, 'saturation': 1.0},
+    'blue': {'hue': 250.0, 'saturation': 1.0},
+    'purple': {'hue': 280.0, 'saturation': 1.0},
+    'pink': {'hue': 325.0, 'saturation': 1.0},
+}
+
+RANGES = {
+    'hue': (0.0, 360.0),
+    'saturation': (0.0, 1.0),
+    'brightness': (0.0, 1.0),
+    'kelvin': (1500, 9000),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def resolve(color, fetch):
+    """
+    Resolves color string to HSBK values. Parsed locally when possible, otherwise looked up with fetch.
+
+    :param color: LIFX color string.
+    :param fetch: Called with the color string on a local miss; must return a dict of HSBK values.
+    :return: Dict of hue, saturation, brightness and kelvin.
+    """
+    parsed = parse(color)
+    if parsed is None:
+        parsed = fetch(color)
+    return parsed
+
+
+def parse(color):
+    """
+    Parses LIFX color string without the API, e.g. 'green', 'hue:120 saturation:1.0', '#00ff00 kelvin:3500',
+    'rgb:0,255,0 brightness:0.5'.
+
+    :param color: LIFX color string.
+    :return: Dict of hue, saturation, brightness and kelvin (None if not given),
+             or None if the string can't be parsed locally.
+    """
+    hsbk = dict.fromkeys(RANGES)
+    tokens = color.lower().split()
+    if not tokens:
+        return None
+
+    for token in tokens:
+        if token in NAMED_COLORS:
+            hsbk.update(NAMED_COLORS[token])
+            continue
+
+        if token.startswith('#'):
+            rgb = _parse_hex(token[1:])
+        elif token.startswith('rgb:'):
+            rgb = _parse_rgb(token[4:])
+        else:
+            key, _, value = token.partition(':')
+            if key not in RANGES:
+                return None
+            try:
+                hsbk[key] = int(value) if key == 'kelvin' else float(value)
+            except ValueError:
+                return None
+            continue
+
+        if rgb is None:
+            return None
+        hsbk.update(rgb_to_hsbk(*(channel / 255 for channel in rgb)))
+
+    for key, (low, high) in RANGES.items():
+        if hsbk[key] is not None and not low <= hsbk[key] <= high:
+            return None  # let the API report the invalid value
+
+    return hsbk
+
+
+def rgb_to_hsbk(red, green, blue):
+    """
+    :param red, green, blue: sRGB channels, 0-1.
+    :return: Dict of hue, saturation and brightness.
+    """
+    hue, saturation, brightness = colorsys.rgb_to_hsv(red, green, blue)
+    return {'hue': hue * 360, 'saturation': saturation, 'brightness': brightness}
+
+
+def hsbk_to_rgb(hue, saturation, brightness, kelvin=None):
+    """
+    Approximates the color a bulb shows: the hue mixed by saturation with the white of kelvin, scaled by brightness.
+
+    :param kelvin: White point; neutral white if None, so rgb_to_hsbk round trips.
+    :return: Tuple of sRGB channels, 0-1.
+    """
+    color = colorsys.hsv_to_rgb((hue or 0.0) / 360 % 1, 1.0, 1.0)
+    white = (1.0, 1.0, 1.0) if kelvin is None else kelvin_to_rgb(kelvin)
+    saturation = 1.0 if saturation is None else saturation
+    brightness = 1.0 if brightness is None else brightness
+    return tuple(brightness * (saturation * c + (1 - saturation) * w) for c, w in zip(color, white))
+
+
+def kelvin_to_rgb(kelvin):
+    """
+    Color of a black body at kelvin, after Tanner Helland's fit of the CIE tables.
+
+    :return: Tuple of sRGB channels, 0-1.
+    """
+    temperature = kelvin / 100
+    if temperature <= 66:
+        red = 255.0
+        green = 99.4708025861 * math.log(temperature) - 161.1195681661
+    else:
+        red = 329.698727446 * (temperature - 60) ** -0.1332047592
+        green = 288.1221695283 * (temperature - 60) ** -0.0755148492
+    if temperature >= 66:
+        blue = 255.0
+    elif temperature <= 19:
+        blue = 0.0
+    else:
+        blue = 138.5177312231 * math.log(temperature - 10) - 305.0447927307
+    return tuple(min(max(channel, 0.0), 255.0) / 255 for channel in (red, green, blue))
+
+
+# sRGB (D65) linear RGB <-> CIE XYZ
+RGB_TO_XYZ = (
+    (0.4124, 0.3576, 0.1805),
+    (0.2126, 0.7152, 0.0722),
+    (0.0193, 0.1192, 0.9505),
+)
+XYZ_TO_RGB = (
+    (3.2406, -1.5372, -0.4986),
+    (-0.9689, 1.8758, 0.0415),
+    (0.0557, -0.2040, 1.0570),
+)
+
+
+def rgb_to_xy(red, green, blue):
+    """
+    :param red, green, blue: sRGB channels, 0-1.
+    :return: Tuple of CIE 1931 x, y chromaticity and luminance Y, 0-1.
+    """
+    linear = [channel / 12.92 if channel <= 0.04045 else ((channel + 0.055) / 1.055) ** 2.4
+              for channel in (red, green, blue)]
+    x, y, z = (sum(weight * channel for weight, channel in zip(row, linear)) for row in RGB_TO_XYZ)
+    total = x + y + z
+    if total == 0:
+        return 0.3127, 0.3290, 0.0  # black, D65 white point
+    return x / total, y / total, y
+
+
+def xy_to_rgb(x, y, luminance=1.0):
+    """
+    :param x, y: CIE 1931 chromaticity.
+    :param luminance: Y, 0-1.
+    :return: Tuple of sRGB channels, 0-1. Colors outside sRGB are clipped and scaled down to fit.
+    """
+    if y == 0:
+        return 0.0, 0.0, 0.0
+    xyz = (x * luminance / y, luminance, (1 - x - y) * luminance / y)
+    linear = [max(sum(weight * value for weight, value in zip(row, xyz)), 0.0) for row in XYZ_TO_RGB]
+    peak = max(linear)
+    if peak > 1:
+        linear = [channel / peak for channel in linear]
+    return tuple(12.92 * channel if channel <= 0.0031308 else 1.055 * channel ** (1 / 2.4) - 0.055
+                 for channel in linear)
+
+
+def _parse_hex(digits):
+    if len(digits) != 6:
+        return None
+    try:
+        return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return None
+
+
+def _parse_rgb(channels):
+    try:
+        rgb = tuple(int(channel) for channel in channels.split(','))
+    except ValueError:
+        return None
+    if len(rgb) != 3 or not all(0 <= channel <= 255 for channel in rgb):
+        return None
+    return rgb
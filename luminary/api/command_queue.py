@@ -0,0 +1,308 @@
+"""
+Outbound command queue, so light commands survive the network or api.lifx.com being down.
+
+Writes (set_state, set_states, toggle_power, cycle, post_effect, activate_scene) return as soon as they're queued in
+memory and a worker thread sends them in order, retrying failures with jittered exponential backoff. Each command
+expires: a set_state is still worth sending some minutes late, but a toggle from an hour ago is dropped rather than
+replayed.
+Queued set_states for the same selector merge into the latest state, and a toggle right after a queued toggle
+cancels it.
+
+Queued commands are kept in an append-only log in the config dir, written by the worker so callers never wait on
+disk, and replayed by the next process if this one exits with commands still queued.
+"""
+import atexit
+import collections
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from luminary.api import lifx_lan
+from luminary.util import project
+
+logger = logging.getLogger(__name__)
+
+WRITES = ('set_state', 'set_states', 'toggle_power', 'cycle', 'post_effect', 'activate_scene')
+EXPIRY = 600.0  # seconds a set_state is still sent
+ACTION_EXPIRY = 30.0  # seconds a toggle, cycle or effect is still sent
+
+
+def retryable(error):
+    """
+    :return: True if the command may go through when sent again: connection errors, timeouts, 429s and 5xxs.
+    """
+    from requests.exceptions import HTTPError  # deferred like all of requests, see HttpClient
+
+    if isinstance(error, HTTPError):
+        status = error.args[0] if error.args else None
+        return status == 429 or (isinstance(status, int) and status >= 500)
+    return isinstance(error, (OSError, lifx_lan.LanError))  # requests' connection errors are OSErrors
+
+
+class CommandLog:
+    def __init__(self, name='command_queue.log'):
+        """
+        Append-only JSON lines log of queued commands: {"add": command} when a command is queued or changed,
+        {"done": id} when it's sent, dropped or expired.
+
+        :param name: File name within the config dir.
+        """
+        self.path = f"{project.config_dir()}/{name}"
+
+    def load(self):
+        """
+        :return: Commands still queued, in order.
+        """
+        commands = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of a crashed write
+                    if 'add' in record:
+                        commands[record['add']['id']] = record['add']
+                    else:
+                        commands.pop(record['done'], None)
+        except OSError:
+            pass
+        return list(commands.values())
+
+    def append(self, lines):
+        """
+        :param lines: JSON encoded records.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+    def rewrite(self, commands):
+        """
+        Replaces the log with just commands, written then renamed like DiskCache.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(''.join(json.dumps({'add': command}) + '\n' for command in commands))
+        os.replace(tmp_path, self.path)
+
+
+class QueuedTransport:
+    def __init__(self, transport, log=None, expiry=EXPIRY, action_expiry=ACTION_EXPIRY, backoff=0.5,
+                 max_backoff=30.0, drain_timeout=5.0, clock=time.time, rng=random.random, on_error=None):
+        """
+        Queues writes to transport and sends them from a worker thread, see module doc. Reads go straight through.
+
+        :param transport: Transport commands are sent on.
+        :param log: CommandLog, None to keep the queue in memory only.
+        :param expiry: Seconds a queued set_state is still sent.
+        :param action_expiry: Seconds a queued toggle_power, cycle, post_effect or activate_scene is still sent.
+        :param backoff: Seconds of the first retry's backoff ceiling, doubled every failure up to max_backoff.
+                        Each retry waits a random fraction of the ceiling, so many clients don't retry in lockstep.
+        :param max_backoff: Most seconds between retries.
+        :param drain_timeout: Seconds an exiting process waits for the queue to empty. Commands still queued are
+                              left in the log for the next process.
+        :param clock: Wall clock; expiry is kept in the log, so it has to hold across processes.
+        :param rng: Returns a float in [0, 1), for the jitter.
+        :param on_error: Called with the selector of a command that expired or was dropped, e.g. to drop the state a
+                         MirroredTransport already applied for it.
+        """
+        self.transport = transport
+        self.log = log
+        self.expiry = {method: action_expiry for method in WRITES}
+        self.expiry['set_state'] = self.expiry['set_states'] = expiry
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.rng = rng
+        self.on_error = on_error
+
+        self.condition = threading.Condition()
+        self.queue = collections.deque()
+        self.unlogged = []  # records for the worker to append
+        self.writing = False
+        self.sending = None
+        self.ids = itertools.count()
+        self.prefix = f"{os.getpid()}-{int(clock())}-"
+        self.sent = self.dropped = self.expired = self.retries = 0
+
+        if log is not None:
+            self.queue.extend(log.load())
+            log.rewrite(self.queue)
+            if self.queue:
+                logger.info('Replaying %d queued commands', len(self.queue))
+        threading.Thread(target=self.run, name='command-queue', daemon=True).start()
+        if drain_timeout:
+            atexit.register(self.drain, drain_timeout)
+
+    def enqueue(self, method, selector, *args):
+        now = self.clock()
+        with self.condition:
+            last = self.last_queued(selector)
+            if last is not None and method == 'set_state' and last['method'] == 'set_state':
+                last['args'][0] = dict(last['args'][0], **args[0])
+                last['expires'] = now + self.expiry[method]
+                self.unlogged.append({'add': last})
+            elif last is not None and method == 'toggle_power' and last['method'] == 'toggle_power':
+                self.queue.remove(last)  # two toggles make no change
+                self.unlogged.append({'done': last['id']})
+            else:
+                command = {'id': f"{self.prefix}{next(self.ids)}", 'method': method, 'selector': selector,
+                           'args': list(args), 'expires': now + self.expiry[method], 'attempts': 0, 'due': now}
+                self.queue.append(command)
+                self.unlogged.append({'add': command})
+            self.condition.notify_all()
+
+    def last_queued(self, selector):
+        """
+        :return: Selector's last queued command if nothing else for selector is queued after it and it isn't
+                 being sent right now, else None.
+        """
+        for command in reversed(self.queue):
+            if command['selector'] == selector:
+                return command if command is not self.sending else None
+        return None
+
+    def run(self):
+        while True:
+            expired = []
+            with self.condition:
+                while True:
+                    expired.extend(self.drop_expired())
+                    # serialized here, as queued set_states may still change once the lock is let go
+                    records, self.unlogged = [json.dumps(record) for record in self.unlogged], []
+                    if records:
+                        self.writing = True
+                        break
+                    if not self.queue:
+                        self.condition.wait()
+                        continue
+                    now = self.clock()
+                    if self.queue[0]['due'] <= now:
+                        self.sending = self.queue[0]
+                        break
+                    # commands wait in order behind the head, but expire on their own time
+                    wake = min(self.queue[0]['due'], min(command['expires'] for command in self.queue))
+                    self.condition.wait(wake - now)
+            for command in expired:
+                self.failed(command)
+            if records:
+                self.write(records)
+                continue
+            self.send(self.sending)
+
+    def drop_expired(self):
+        """
+        :return: List of the commands dropped.
+        """
+        now = self.clock()
+        expired = [command for command in self.queue if command['expires'] <= now]
+        for command in expired:
+            logger.warning('Dropping %s for %s, it expired after %d attempts', command['method'],
+                           command['selector'], command['attempts'])
+            self.queue.remove(command)
+            self.unlogged.append({'done': command['id']})
+            self.expired += 1
+        return expired
+
+    def failed(self, command):
+        if self.on_error is not None:
+            try:
+                self.on_error(command['selector'])
+            except Exception:
+                logger.exception('Handling the failed %s for %s failed', command['method'], command['selector'])
+
+    def send(self, command):
+        try:
+            if command['method'] == 'set_states':
+                self.transport.set_states(*command['args'])
+            else:
+                getattr(self.transport, command['method'])(command['selector'], *command['args'])
+            done = True
+            self.sent += 1
+        except Exception as e:
+            done = not retryable(e)
+            if done:
+                logger.error('Dropping %s for %s: %s', command['method'], command['selector'], e)
+                self.dropped += 1
+                self.failed(command)
+            else:
+                ceiling = min(self.max_backoff, self.backoff * 2 ** command['attempts'])
+                command['due'] = self.clock() + self.rng() * ceiling
+                logger.info('%s for %s failed, retrying: %s', command['method'], command['selector'], e)
+                self.retries += 1
+            command['attempts'] += 1
+
+        with self.condition:
+            self.sending = None
+            if done:
+                self.queue.remove(command)
+                self.unlogged.append({'done': command['id']})
+            self.condition.notify_all()
+
+    def write(self, records):
+        if self.log is not None:
+            try:
+                with self.condition:
+                    empty = not self.queue and not self.unlogged
+                if empty:
+                    self.log.rewrite([])  # keep the log from growing forever
+                else:
+                    self.log.append(records)
+            except OSError as e:
+                logger.warning('Writing the command log failed: %s', e)
+        with self.condition:
+            self.writing = False
+            self.condition.notify_all()  # for drain
+
+    def drain(self, timeout=None):
+        """
+        Waits for every queued command to be sent, dropped or expire.
+
+        :return: True if the queue emptied within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.queue or self.unlogged or self.writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def pending(self):
+        """
+        :return: Number of queued commands.
+        """
+        with self.condition:
+            return len(self.queue)
+
+    def set_state(self, selector, payload):
+        self.enqueue('set_state', selector, payload)
+
+    def set_states(self, payload):
+        # goes out as is; the batch's selector only keys it for logs and the log
+        self.enqueue('set_states', ','.join(state['selector'] for state in payload['states']), payload)
+
+    def toggle_power(self, selector):
+        self.enqueue('toggle_power', selector)
+
+    def cycle(self, selector, payload):
+        self.enqueue('cycle', selector, payload)
+
+    def get_status(self, selector):
+        return self.transport.get_status(selector)
+
+    def get_statuses(self, selector):
+        return self.transport.get_statuses(selector)
+
+    def activate_scene(self, selector, payload):
+        self.enqueue('activate_scene', selector, payload)
+
+    def post_effect(self, selector, effect, payload):
+        self.enqueue('post_effect', selector, effect, payload)
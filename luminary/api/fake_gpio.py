@@ -0,0 +1,108 @@
+"""
+Stand-in for RPi.GPIO simulating an HC-SR04 ultrasonic depth sensor, so the sensor code runs off a Raspberry Pi.
+Select it with `gpio = fake` in raspberry-pi.ini.
+
+Pulsing TRIG makes ECHO go high for as long as sound takes to travel to `distance` cm and back,
+firing the edge callbacks like the real library. Set `pulses` to replay echo pulse widths recorded off a real sensor.
+"""
+import threading
+import time
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+SPEED_OF_SOUND = 34300  # cm/s
+ECHO_DELAY = 0.0005  # seconds between the trigger pulse and the sensor raising echo
+
+distance = 100.0  # cm the simulated sensor sees; None simulates a missed echo
+distances = None  # optional iterator of distances, one per measurement, overriding distance
+pulses = None  # optional iterator of echo pulse widths in seconds (None for a missed echo), overriding both
+
+levels = {}
+modes = {}
+callbacks = {}
+echo_pins = set()
+lock = threading.Lock()
+
+
+def setmode(mode):
+    pass
+
+
+def setwarnings(flag):
+    pass
+
+
+def setup(channel, mode):
+    modes[channel] = mode
+    levels[channel] = LOW
+    if mode == IN:
+        echo_pins.add(channel)
+
+
+def input(channel):
+    return levels.get(channel, LOW)
+
+
+def output(channel, value):
+    previous = levels.get(channel, LOW)
+    levels[channel] = HIGH if value else LOW
+    if previous == HIGH and not value:  # falling edge of the trigger pulse
+        threading.Thread(target=echo, daemon=True).start()
+
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    callbacks[channel] = (edge, callback)
+
+
+def remove_event_detect(channel):
+    callbacks.pop(channel, None)
+
+
+def cleanup(channel=None):
+    levels.clear()
+    modes.clear()
+    callbacks.clear()
+    echo_pins.clear()
+
+
+def next_distance():
+    if distances is not None:
+        return next(distances, None)
+    return distance
+
+
+def next_pulse():
+    """
+    :return: Seconds the next echo pulse lasts, None for a missed echo.
+    """
+    if pulses is not None:
+        return next(pulses, None)
+    target = next_distance()
+    return None if target is None else 2 * target / SPEED_OF_SOUND
+
+
+def echo():
+    width = next_pulse()
+    if width is None:
+        return
+    time.sleep(ECHO_DELAY)
+    with lock:
+        set_echo(HIGH)
+        time.sleep(width)
+        set_echo(LOW)
+
+
+def set_echo(level):
+    for channel in echo_pins:
+        levels[channel] = level
+        edge, callback = callbacks.get(channel, (None, None))
+        if callback is not None and (edge == BOTH or edge == (RISING if level else FALLING)):
+            callback(channel)
@@ -0,0 +1,150 @@
+"""
+weather.gov's hourly forecast, a week of hourly periods, read straight off the response stream into columns.
+
+The document is a few hundred KB, nearly all of it the periods array, and only a handful of each period's fields
+are of use. Rather than json.loads building the whole document first, HourlyParser finds the periods array as
+chunks arrive and decodes one period at a time, keeping just those fields in typed arrays. Memory stays at about a
+chunk plus the columns, and the first periods are parsed while the rest is still downloading.
+"""
+import array
+import codecs
+import datetime
+import json
+import re
+
+import numpy as np
+
+from luminary.api import weather
+from luminary.api.http_client import http_error
+from luminary.util import weather_rules
+
+PERIODS = re.compile(r'"periods"\s*:\s*\[')
+SEPARATOR = re.compile(r'[\s,]*')
+CHUNK_SIZE = 16 * 1024
+
+
+class HourlyForecast:
+    def __init__(self, start, temperature, precipitation_chance, sky_cover, is_daytime):
+        """
+        Hourly periods as columns, one row per hour.
+
+        :param start: Array of period start times, epoch seconds.
+        :param temperature: Array of degrees F.
+        :param precipitation_chance: Array of precipitation chances in percent, NaN where not given.
+        :param sky_cover: Array of sky cover in percent. The hourly forecast has no sky cover field, so it's the
+                          cloud level of the period's short forecast (see weather_rules) times 25.
+        :param is_daytime: Boolean array.
+        """
+        self.start = start
+        self.temperature = temperature
+        self.precipitation_chance = precipitation_chance
+        self.sky_cover = sky_cover
+        self.is_daytime = is_daytime
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in (self.start, self.temperature, self.precipitation_chance,
+                                                self.sky_cover, self.is_daytime))
+
+
+class HourlyParser:
+    def __init__(self, rules=None):
+        """
+        Incremental parser of a forecastHourly document. feed it chunks as they arrive, then close it.
+
+        :param rules: weather_rules.Rules deciding each period's cloud level, defaults to the configured rules.
+        """
+        self.rules = rules or weather_rules.get_rules()
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.in_periods = False
+        self.done = False
+        self.start = array.array('d')
+        self.temperature = array.array('f')
+        self.precipitation_chance = array.array('f')
+        self.sky_cover = array.array('f')
+        self.is_daytime = array.array('b')
+
+    def feed(self, chunk):
+        """
+        :param chunk: Next bytes of the document.
+        """
+        if self.done:
+            return
+        self.buffer = self.buffer[self.position:] + self.text.decode(chunk)
+        self.position = 0
+        if not self.in_periods:
+            match = PERIODS.search(self.buffer)
+            if match is None:
+                self.position = max(0, len(self.buffer) - 64)  # keep enough to find a key split across chunks
+                return
+            self.in_periods = True
+            self.position = match.end()
+
+        while True:
+            self.position = SEPARATOR.match(self.buffer, self.position).end()
+            if self.position == len(self.buffer):
+                return
+            if self.buffer[self.position] == ']':
+                self.done = True
+                return
+            try:
+                period, self.position = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                return  # period continues in the next chunk
+            self.add(period)
+
+    def add(self, period):
+        self.start.append(datetime.datetime.fromisoformat(period['startTime']).timestamp())
+        self.temperature.append(weather.get_temperature(period))
+        chance = (period.get('probabilityOfPrecipitation') or {}).get('value')
+        self.precipitation_chance.append(float('nan') if chance is None else chance)
+        self.sky_cover.append(25 * self.rules.cloud_level(period['shortForecast']))
+        self.is_daytime.append(period['isDaytime'])
+
+    def close(self):
+        """
+        :return: HourlyForecast
+        :raise ValueError: If the document ended before its periods did.
+        """
+        if not self.done:
+            raise ValueError('Hourly forecast ended before its periods did')
+        return HourlyForecast(
+            np.frombuffer(self.start, dtype=np.float64),
+            np.frombuffer(self.temperature, dtype=np.float32),
+            np.frombuffer(self.precipitation_chance, dtype=np.float32),
+            np.frombuffer(self.sky_cover, dtype=np.float32),
+            np.frombuffer(self.is_daytime, dtype=np.int8).astype(bool),
+        )
+
+
+def parse(chunks, rules=None):
+    """
+    :param chunks: Iterable of bytes of a forecastHourly document.
+    :param rules: See HourlyParser.
+    :return: HourlyForecast
+    """
+    parser = HourlyParser(rules)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.close()
+
+
+def get_hourly_forecast():
+    """
+    Streams the configured location's hourly forecast.
+
+    :return: HourlyForecast
+    """
+    response = weather.get_client().get(weather.get_forecast_url(hourly=True), stream=True)
+    with response:
+        if not response.ok:
+            raise http_error(response)
+        return parse(response.iter_content(CHUNK_SIZE))
@@ -0,0 +1,132 @@
+import functools
+import json
+import re
+import urllib.parse
+
+from luminary.util import metrics
+
+RATE_LIMITED_RETRIES = 2
+
+
+class HttpClient:
+    def __init__(self, base_url, headers=None, timeout=5.0, retries=3, backoff_factor=0.3, pool_size=10,
+                 rate_limiter=None):
+        """
+        Pooled keep-alive HTTP client.
+        Share one instance per API so repeated calls reuse an open connection instead of paying a fresh
+        TCP + TLS handshake every time.
+
+        :param base_url: URL every request path is relative to, e.g. https://api.lifx.com/v1
+        :param headers: Headers sent with every request.
+        :param timeout: Seconds to wait for a connection or response before giving up.
+        :param retries: Times to retry connection failures and 5xx responses of idempotent requests.
+        :param backoff_factor: Retry backoff; sleeps backoff_factor * 2^(retry - 1) seconds between retries.
+        :param pool_size: Max number of keep-alive connections held open to the host.
+        :param rate_limiter: Optional ratelimit.RateLimiter every request waits on. Requests answered with a 429
+                             are resent once the limiter allows.
+        """
+        import requests  # deferred, it's most of the startup time of scripts that never make a request
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+
+        # Only GET/PUT are retried on read errors and 5xx; POSTs like toggle aren't safe to send twice.
+        # Connection errors are always retried as the request never reached the server.
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'PUT']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, payload=None, **kwargs):
+        """
+        Send request over the pooled session.
+
+        :param method: HTTP method.
+        :param path: Path relative to base_url, or an absolute URL.
+        :param payload: Dict sent as the JSON body if given.
+        :return: requests.Response
+        """
+        if payload is not None:
+            kwargs['data'] = json.dumps(payload)
+        kwargs.setdefault('timeout', self.timeout)
+        url = path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+        if not metrics.enabled:
+            return self.send(method, url, **kwargs)
+
+        latency, errors, rate_limited = request_metrics(method, url)
+        start = metrics.clock()
+        try:
+            response = self.send(method, url, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        latency.record(metrics.clock() - start)
+        if response.status_code == 429:
+            rate_limited.inc()
+        elif response.status_code >= 400:
+            errors.inc()
+        return response
+
+    def send(self, method, url, **kwargs):
+        if self.rate_limiter is None:
+            return self.session.request(method, url, **kwargs)
+
+        for attempt in range(RATE_LIMITED_RETRIES + 1):
+            self.rate_limiter.acquire()
+            response = self.session.request(method, url, **kwargs)
+            self.rate_limiter.update(response.headers, response.status_code)
+            if response.status_code != 429:
+                break
+            if metrics.enabled and attempt < RATE_LIMITED_RETRIES:
+                request_metrics(method, url)[2].inc()
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def put(self, path, payload=None, **kwargs):
+        return self.request('PUT', path, payload, **kwargs)
+
+    def post(self, path, payload=None, **kwargs):
+        return self.request('POST', path, payload, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+@functools.lru_cache(maxsize=256)
+def endpoint(url):
+    """
+    :return: Host and path of url with selectors, ids and coordinates replaced by {}, so one label covers
+             e.g. every lights/{}/state request.
+    """
+    parts = urllib.parse.urlsplit(url)
+    return parts.netloc + re.sub(r'/(?:[^/]*[:,][^/]*|[0-9][^/]*)', '/{}', parts.path)
+
+
+@functools.lru_cache(maxsize=256)
+def request_metrics(method, url):
+    """
+    :return: Tuple of the latency histogram, error counter and 429 counter of method and url's endpoint, bound once
+             per url so recording a request doesn't build labels.
+    """
+    labels = {'method': method, 'endpoint': endpoint(url)}
+    return (metrics.histogram('http_request_seconds', **labels), metrics.counter('http_errors_total', **labels),
+            metrics.counter('http_rate_limited_total', **labels))
+
+
+def http_error(response):
+    """
+    :param response: Failed requests.Response
+    :return: requests.exceptions.HTTPError to raise for it.
+    """
+    from requests.exceptions import HTTPError
+    return HTTPError(response.status_code, response.reason, response.content)
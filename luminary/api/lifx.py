@@ -1,12 +1,19 @@
 import json
-import time
-
-import requests
 
+from luminary.api import colors, command_queue, lifx_lan, lights
+from luminary.api.http_client import HttpClient, http_error
+from luminary.api.ratelimit import RateLimiter
+from luminary.api.state import LightMirror, MirroredTransport
+from luminary.api.transport import CloudTransport, CoalescingTransport, FallbackTransport, LanTransport
 from luminary.util import project
+from luminary.util.cache import DiskCache
+
+MAX_STATES = 50  # states the set states endpoint takes per request
 
 
 class HSBK:
+    __slots__ = ('hue', 'saturation', 'brightness', 'kelvin')
+
     def __init__(self, color, brightness=None):
         """
         Hue Saturation Brightness Kelvin
@@ -15,22 +22,72 @@ class HSBK:
         :param brightness: Color brightness. Will set to 1.0 if None and color has no brightness value.
         """
         if type(color) is HSBK:
-            self.hue = color.hue
-            self.saturation = color.saturation
-            self.brightness = color.brightness
-            self.kelvin = color.kelvin
-            return
-        elif type(color) is str:
-            response = requests.get(f"https://api.lifx.com/v1/color?string={color}", headers=headers)
-            color = json.loads(response.content)
-
-        self.hue = color.get('hue')
-        self.saturation = color.get('saturation')
-        if brightness is not None:
-            self.brightness = color['brightness']
+            hue, saturation, brightness, kelvin = color.astuple()
         else:
-            self.brightness = color.get('brightness', 1.0)
-        self.kelvin = color.get('kelvin')
+            if type(color) is str:
+                color = colors.resolve(color, lookup_color)
+            hue, saturation, kelvin = color.get('hue'), color.get('saturation'), color.get('kelvin')
+            if brightness is None:
+                brightness = color.get('brightness', 1.0)
+
+        # immutable, as it hashes by value
+        object.__setattr__(self, 'hue', hue)
+        object.__setattr__(self, 'saturation', saturation)
+        object.__setattr__(self, 'brightness', brightness)
+        object.__setattr__(self, 'kelvin', kelvin)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"HSBK is immutable, can't set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"HSBK is immutable, can't delete {name}")
+
+    def with_brightness(self, brightness):
+        """
+        :return: Copy of this color at brightness.
+        """
+        color = HSBK(self)
+        object.__setattr__(color, 'brightness', brightness)
+        return color
+
+    @classmethod
+    def from_rgb(cls, red, green, blue):
+        """
+        :param red, green, blue: sRGB channels, 0-1.
+        """
+        return cls(colors.rgb_to_hsbk(red, green, blue))
+
+    @classmethod
+    def from_xy(cls, x, y, brightness=1.0):
+        """
+        :param x, y: CIE 1931 chromaticity.
+        :param brightness: Luminance, 0-1.
+        """
+        return cls.from_rgb(*colors.xy_to_rgb(x, y, brightness))
+
+    def to_rgb(self):
+        """
+        :return: Tuple of sRGB channels, 0-1, approximating what the bulb shows.
+        """
+        return colors.hsbk_to_rgb(self.hue, self.saturation, self.brightness, self.kelvin)
+
+    def to_xy(self):
+        """
+        :return: Tuple of CIE 1931 x, y chromaticity and luminance.
+        """
+        return colors.rgb_to_xy(*self.to_rgb())
+
+    def astuple(self):
+        return self.hue, self.saturation, self.brightness, self.kelvin
+
+    def __eq__(self, other):
+        return type(other) is HSBK and self.astuple() == other.astuple()
+
+    def __hash__(self):
+        return hash(self.astuple())
+
+    def __repr__(self):
+        return f"HSBK({self.encode()!r})"
 
     def encode(self):
         """
@@ -51,13 +108,49 @@ class HSBK:
         return ' '.join(color_str)
 
 
-def turn_on(color=None, brightness=None, duration=1.0):
+def lookup_color(color):
+    """
+    https://api.developer.lifx.com/docs/validate-color
+    Looks up color string in the on-disk color cache, falling back to the LIFX API on a miss.
+
+    :param color: LIFX color string.
+    :return: Dict of HSBK values.
+    """
+    cached = get_color_cache().get(color)
+    if cached is not None:
+        return cached
+
+    response = get_client().get(f"color?string={color}")
+    if not response.ok:
+        raise http_error(response)
+    hsbk = json.loads(response.content)
+    get_color_cache().set(color, hsbk)
+    return hsbk
+
+
+def default_selector(selector=None):
+    """
+    https://api.developer.lifx.com/docs/selectors
+
+    :param selector: Light selector, light name from lights.ini, a list of those, or None.
+    :return: Selector reaching the same lights in one call, see lights.combine, or the configured light's id
+             selector if None.
+    """
+    if selector is None:
+        return f"id:{light_id()}"
+    if isinstance(selector, str) and ':' in selector and ',' not in selector:
+        return selector  # a single raw selector, nothing to combine
+    return lights.combine(selector)
+
+
+def turn_on(color=None, brightness=None, duration=1.0, selector=None):
     """
     Turns on the light. Sets to given color and brightness if given; Uses fast query if both are not.
 
     :param color: Color to set light to.
     :param brightness: The brightness level from 0.0 to 1.0. Overrides any brightness set in color (if any).
     :param duration: How long in seconds you want the power action to take. Range: 0.0 – 3155760000.0 (100 years).
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "power": "on",
@@ -71,14 +164,15 @@ def turn_on(color=None, brightness=None, duration=1.0):
     if color is None and brightness is None:
         payload['fast'] = True
 
-    set_state(payload)
+    set_state(payload, selector)
 
 
-def turn_off(duration=1.0):
+def turn_off(duration=1.0, selector=None):
     """
     Turns off light with the fast query.
 
     :param duration: How long in seconds you want the power action to take. Range: 0.0 – 3155760000.0 (100 years).
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "power": "off",
@@ -86,47 +180,73 @@ def turn_off(duration=1.0):
         "fast": True,
     }
 
-    set_state(payload)
+    set_state(payload, selector)
 
 
-def toggle_power():
+def toggle_power(selector=None):
     """
     https://api.developer.lifx.com/docs/toggle-power
     Turn off lights if any of them are on, or turn them on if they are all off.
     All lights matched by the selector will share the same power state after this action.
     Physically powered off lights are ignored.
+
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
-    requests.post(f"https://api.lifx.com/v1/lights/id:{id}/toggle", headers=headers)
+    get_transport().toggle_power(default_selector(selector))
 
 
-def blink_power(cycles=1, period=.25, persist=False):
+def blink_power(cycles=1, period=.25, persist=False, selector=None):
     """
-    Blink the power state.
+    Blink the power state. When the state mirror knows the light is on, this runs server-side as a single pulse to
+    brightness 0 instead, which looks the same but leaves the power on throughout. Otherwise it toggles the power
+    as before, so blinking doesn't cost a status request.
     :param cycles: The number of times to repeat the effect.
     :param period: The time in seconds for one cycles of the effect.
     :param persist: If false set the light back to its previous value when effect ends,
                     if true leave the last effect color.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
-    for i in range(cycles):
-        toggle_power()
-        time.sleep(period)
-        if not (i == cycles - 1 and persist):
-            toggle_power()
-            time.sleep(period)
+    # imported here as both import this module
+    from luminary.util import effect_optimizer, timeline
+
+    routine = timeline.Timeline(timeline.blink(cycles, period, persist), selector)
+    status = get_mirror().get(default_selector(selector))
+    routine, _ = effect_optimizer.optimize(routine, light_on=status is not None and status.get('power') == 'on')
+    timeline.run(routine)
 
 
-def set_state(payload):
+def set_state(payload, selector=None):
     """
     https://api.developer.lifx.com/docs/set-state
 
     :param payload: Dict of state properties.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
-    response = requests.put(f"https://api.lifx.com/v1/lights/id:{id}/state", headers=headers, data=json.dumps(payload))
-    if not response.ok:
-        raise requests.exceptions.HTTPError(response.status_code, response.reason, response.content)
+    get_transport().set_state(default_selector(selector), payload)
 
 
-def cycle(states, defaults=None, direction='forward'):
+def set_states(states, defaults=None):
+    """
+    https://api.developer.lifx.com/docs/set-states
+    Sets different states on different lights in as few requests as possible: lights getting the same state share
+    a selector, and it's a single set_state if they all get the same one.
+
+    :param states: Dict of light name, selector or tuple of those to set_state payload.
+    :param defaults: Dict of state properties used where a payload doesn't set them.
+    """
+    batched = lights.batch(states)
+    if len(batched) == 1:
+        selector, payload = batched[0]
+        get_transport().set_state(selector, dict(defaults or {}, **payload))
+        return
+    for start in range(0, len(batched), MAX_STATES):
+        payload = {'states': [dict(state, selector=selector) for selector, state in batched[start:start + MAX_STATES]]}
+        if defaults is not None:
+            payload['defaults'] = defaults
+        get_transport().set_states(payload)
+
+
+def cycle(states, defaults=None, direction='forward', selector=None):
     """
     https://api.developer.lifx.com/docs/cycle
     Make the light(s) cycle to the next or previous state in a list of states.
@@ -134,6 +254,7 @@ def cycle(states, defaults=None, direction='forward'):
     :param states: Array of state hashes as per Set State. Must have 2 to 10 entries.
     :param defaults: Default values to use when not specified in each states[] object.
     :param direction: Direction in which to cycle through the list. Can be forward or backward.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "states": states,
@@ -142,28 +263,144 @@ def cycle(states, defaults=None, direction='forward'):
     if defaults is not None:
         payload['defaults'] = defaults
 
-    response = requests.post(f"https://api.lifx.com/v1/lights/id:{id}/cycle", headers=headers, data=json.dumps(payload))
-    if not response.ok:
-        raise requests.exceptions.HTTPError(response.status_code, response.reason, response.content)
+    get_transport().cycle(default_selector(selector), payload)
 
 
-def get_status():
+def get_status(selector=None):
     """
     https://api.developer.lifx.com/docs/list-lights
-    Gets the status for the configured light.
+    Gets the status for the selected light.
 
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     :return: Dictionary of properties for given light.
     """
-    response = requests.get(f"https://api.lifx.com/v1/lights/id:{id}", headers=headers)
-    if response.ok:
-        return json.loads(response.content)[0]
-    else:
-        raise requests.exceptions.HTTPError(response.status_code, response.reason, response.content)
+    return get_transport().get_status(default_selector(selector))
+
+
+def get_statuses(selector=None):
+    """
+    https://api.developer.lifx.com/docs/list-lights
+    Gets the status of every selected light, in one request for those the state mirror doesn't trust.
+
+    :param selector: Light selector, light name from lights.ini or a list of those. Defaults to the configured light.
+    :return: List of dictionaries of properties, one per light.
+    """
+    return get_transport().get_statuses(default_selector(selector))
+
+
+def status_age(selector=None):
+    """
+    How stale the locally mirrored state is. get_status answers from the mirror without I/O while this is within
+    `state_max_age` in lifx.ini.
+
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
+    :return: Seconds since the light's state was last confirmed, None if it never was.
+    """
+    return get_mirror().age(default_selector(selector))
+
+
+def create_transport():
+    """
+    Builds the transport configured by `transport` in lifx.ini: `cloud` (default) or `lan`.
+    The LAN transport talks to the bulb at `light_ip`, or discovers it if not set, and falls back to the cloud.
+    Writes are queued and retried through outages if `command_queue` is on, set_state calls are coalesced if
+    `coalesce_window` is set, and every call keeps the light state mirror current.
+    """
+    config = settings()
+    built = CloudTransport(get_client())
+    if config.get('transport', 'cloud') == 'lan':
+        timeout = config.getfloat('lan_timeout', 0.25)
+        if 'light_ip' in config:
+            bulbs = {light_id().lower(): lifx_lan.LanLight(config['light_ip'], light_id(), timeout=timeout)}
+        else:
+            bulbs = lifx_lan.discover(request_timeout=timeout)
+        built = FallbackTransport(LanTransport(bulbs, lookup_color), built)
+
+    queued = None
+    if config.getboolean('command_queue', False):
+        built = queued = command_queue.QueuedTransport(
+            built, command_queue.CommandLog(),
+            expiry=config.getfloat('queue_expiry', command_queue.EXPIRY),
+            action_expiry=config.getfloat('queue_action_expiry', command_queue.ACTION_EXPIRY))
+
+    coalescing = None
+    coalesce_window = config.getfloat('coalesce_window', 0)
+    if coalesce_window > 0:
+        built = coalescing = CoalescingTransport(built, coalesce_window)
+
+    built = MirroredTransport(built, get_mirror(), lights.expand)
+    if coalescing is not None:
+        coalescing.on_error = built.invalidate  # the mirror applied the state when it was merged
+    if queued is not None:
+        queued.on_error = built.invalidate  # the mirror applied the change when it was queued
+    poll_interval = config.getfloat('state_poll_interval', 0)
+    if poll_interval > 0:
+        built.start_polling(poll_interval)
+    return built
 
 
-config = project.load_config('lifx.ini')
-headers = {
-    "Authorization": f"Bearer {config['DEFAULT']['api_key']}",
+def settings():
+    return project.settings('lifx.ini')
+
+
+@project.lazy
+def light_id():
+    return project.required('lifx.ini', 'light_id')
+
+
+@project.lazy
+def get_client():
+    """
+    Shared by lifx_effects and lifx_async so every bulb action reuses the same keep-alive connection and rate limit.
+    """
+    config = settings()
+    rate_limit = config.getint('rate_limit', 120)
+    headers = {
+        "Authorization": f"Bearer {project.required('lifx.ini', 'api_key')}",
+    }
+    return HttpClient(config.get('api_url', "https://api.lifx.com/v1"), headers,
+                      timeout=config.getfloat('timeout', 5.0),
+                      retries=config.getint('retries', 3),
+                      backoff_factor=config.getfloat('backoff_factor', 0.3),
+                      pool_size=config.getint('concurrency', 10),
+                      rate_limiter=RateLimiter(rate_limit, config.getfloat('rate_period', 60.0))
+                      if rate_limit > 0 else None)
+
+
+@project.lazy
+def get_color_cache():
+    """
+    Colors the API had to resolve; named, hsbk, hex and rgb strings are parsed locally by colors.parse
+    """
+    return DiskCache('colors.json', ttl=settings().getfloat('color_cache_ttl', 30 * 24 * 60 * 60))
+
+
+@project.lazy
+def get_mirror():
+    """
+    What we last knew of each light; lets get_status skip I/O and set_state skip no-op writes
+    """
+    return LightMirror(max_age=settings().getfloat('state_max_age', 10.0))
+
+
+@project.lazy
+def get_transport():
+    return create_transport()
+
+
+# Config, clients and the transport are built on first use rather than at import, so scripts only pay for what
+# they touch and a missing setting only fails the call that needs it. They're still reachable as attributes.
+lazy_attributes = {
+    'config': lambda: project.load_config('lifx.ini'),
+    'id': light_id,
+    'client': get_client,
+    'color_cache': get_color_cache,
+    'mirror': get_mirror,
+    'transport': get_transport,
 }
 
-id = config['DEFAULT']['light_id']
+
+def __getattr__(name):
+    if name in lazy_attributes:
+        return lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,69 @@
+"""
+asyncio variants of the lifx and lifx_effects calls that take a list of selectors and send one request per selector
+concurrently over the shared lifx.get_client() connection pool.
+Concurrency is capped by the `concurrency` setting in lifx.ini (default 10), which also sizes the pool.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from luminary.api import lifx, lifx_effects
+from luminary.util import project
+
+
+async def fan_out(func, selectors, *args, **kwargs):
+    """
+    Runs blocking lifx call once per selector concurrently.
+
+    :param func: lifx or lifx_effects function taking a selector keyword.
+    :param selectors: Light selector or list of selectors.
+    :return: List of results in selector order.
+    """
+    if isinstance(selectors, str):
+        selectors = [selectors]
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(get_executor(), functools.partial(func, *args, selector=selector, **kwargs))
+        for selector in selectors
+    ))
+
+
+async def turn_on(selectors, color=None, brightness=None, duration=1.0):
+    return await fan_out(lifx.turn_on, selectors, color, brightness, duration)
+
+
+async def turn_off(selectors, duration=1.0):
+    return await fan_out(lifx.turn_off, selectors, duration)
+
+
+async def toggle_power(selectors):
+    return await fan_out(lifx.toggle_power, selectors)
+
+
+async def set_state(selectors, payload):
+    return await fan_out(lifx.set_state, selectors, payload)
+
+
+async def cycle(selectors, states, defaults=None, direction='forward'):
+    return await fan_out(lifx.cycle, selectors, states, defaults, direction)
+
+
+async def get_status(selectors):
+    return await fan_out(lifx.get_status, selectors)
+
+
+async def breathe(selectors, color, from_color=None, period=1.0, cycles=1.0, persist=False, power_on=True, peak=0.5):
+    return await fan_out(lifx_effects.breathe, selectors, color, from_color, period, cycles, persist, power_on, peak)
+
+
+async def pulse(selectors, color, from_color=None, period=1.0, cycles=1.0, persist=False, power_on=True):
+    return await fan_out(lifx_effects.pulse, selectors, color, from_color, period, cycles, persist, power_on)
+
+
+async def effects_off(selectors, power_off=False):
+    return await fan_out(lifx_effects.effects_off, selectors, power_off)
+
+
+@project.lazy
+def get_executor():
+    return ThreadPoolExecutor(max_workers=lifx.settings().getint('concurrency', 10))
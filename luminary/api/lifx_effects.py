@@ -1,13 +1,10 @@
-import json
 import math
 
-import requests
-
 from luminary.api import lifx
 from luminary.api.lifx import HSBK
 
 
-def breathe(color, from_color=None, period=1.0, cycles=1.0, persist=False, power_on=True, peak=0.5):
+def breathe(color, from_color=None, period=1.0, cycles=1.0, persist=False, power_on=True, peak=0.5, selector=None):
     """
     https://api.developer.lifx.com/docs/breathe-effect
     Performs a breathe effect by slowly fading between the given colors. Use the parameters to tweak the effect.
@@ -21,6 +18,7 @@ def breathe(color, from_color=None, period=1.0, cycles=1.0, persist=False, power
                     if true leave the last effect color.
     :param power_on: If true, turn the bulb on if it is not already on.
     :param peak: Defines where in a period the target color is at its maximum. Minimum 0.0, maximum 1.0.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "color": HSBK(color).encode(),
@@ -33,10 +31,10 @@ def breathe(color, from_color=None, period=1.0, cycles=1.0, persist=False, power
     if from_color is not None:
         payload['from_color'] = HSBK(from_color).encode()
 
-    post_effect("breathe", payload)
+    post_effect("breathe", payload, selector)
 
 
-def move(direction="forward", period=1.0, cycles=math.inf, power_on=True):
+def move(direction="forward", period=1.0, cycles=math.inf, power_on=True, selector=None):
     """
     https://api.developer.lifx.com/docs/move-effect
     Performs a move effect on a linear device with zones, by moving the current pattern across the device.
@@ -49,6 +47,7 @@ def move(direction="forward", period=1.0, cycles=math.inf, power_on=True):
     :param cycles: The number of times to move the pattern across the device. Special cases are 0 to switch the effect
                    off, and unspecified to continue indefinitely.
     :param power_on: Switch any selected device that is off to on before performing the effect.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "direction": direction,
@@ -58,10 +57,10 @@ def move(direction="forward", period=1.0, cycles=math.inf, power_on=True):
     if cycles != math.inf:
         payload['cycles'] = cycles
 
-    post_effect("move", payload)
+    post_effect("move", payload, selector)
 
 
-def morph(palette, period=5.0, duration=math.inf, power_on=True):
+def morph(palette, period=5.0, duration=math.inf, power_on=True, selector=None):
     """
     https://api.developer.lifx.com/docs/morph-effect
     Performs a morph effect on the tiles in your selector. Use the parameters to tweak the effect.
@@ -77,6 +76,7 @@ def morph(palette, period=5.0, duration=math.inf, power_on=True):
                      in the animation once it has completed if duration is nonzero.
     :param palette: You can control the colors in the animation by specifying a list of color specifiers.
     :param power_on: Switch any selected device that is off to on before performing the effect.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
 
     payload = {
@@ -87,10 +87,10 @@ def morph(palette, period=5.0, duration=math.inf, power_on=True):
     if duration != math.inf:
         payload['duration'] = duration
 
-    post_effect("morph", payload)
+    post_effect("morph", payload, selector)
 
 
-def flame(period=5, duration=math.inf, power_on=True):
+def flame(period=5, duration=math.inf, power_on=True, selector=None):
     """
     https://api.developer.lifx.com/docs/flame-effect
     Performs a flame effect on the tiles in your selector. Use the parameters to tweak the effect.
@@ -105,6 +105,7 @@ def flame(period=5, duration=math.inf, power_on=True):
                      stop. Specifying 0 makes the animation stop. Note that there is a known bug where the tile remains
                      in the animation once it has completed if duration is nonzero.
     :param power_on: Switch any selected device that is off to on before performing the effect.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "period": period,
@@ -114,10 +115,10 @@ def flame(period=5, duration=math.inf, power_on=True):
     if duration != math.inf:
         payload['duration'] = math.inf
 
-    post_effect("flame", payload)
+    post_effect("flame", payload, selector)
 
 
-def pulse(color, from_color=None, period=1.0, cycles=1.0, persist=False, power_on=True):
+def pulse(color, from_color=None, period=1.0, cycles=1.0, persist=False, power_on=True, selector=None):
     """
     https://api.developer.lifx.com/docs/pulse-effect
     Performs a pulse effect by quickly flashing between the given colors. Use the parameters to tweak the effect.
@@ -130,6 +131,7 @@ def pulse(color, from_color=None, period=1.0, cycles=1.0, persist=False, power_o
     :param persist: If false set the light back to its previous value when effect ends,
                     if true leave the last effect color.
     :param power_on: If true, turn the bulb on if it is not already on.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {
         "color": HSBK(color).encode(),
@@ -141,10 +143,10 @@ def pulse(color, from_color=None, period=1.0, cycles=1.0, persist=False, power_o
     if from_color is not None:
         payload['from_color'] = HSBK(from_color).encode()
 
-    post_effect("pulse", payload)
+    post_effect("pulse", payload, selector)
 
 
-def effects_off(power_off=False):
+def effects_off(power_off=False, selector=None):
     """
     https://api.developer.lifx.com/docs/effects-off
     Turns off any running effects on the device. This includes any waveform (breathe or pulse) as well as
@@ -152,26 +154,37 @@ def effects_off(power_off=False):
     Also, if you specify power_off as true then the lights will also be powered off.
 
     :param power_off: If true, the devices will also be turned off.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
     payload = {"power_off": power_off}
-    post_effect("off", payload)
+    post_effect("off", payload, selector)
 
 
-def post_effect(effect, payload):
+def post_effect(effect, payload, selector=None):
     """
     Formats payload and POST to given effect api.
 
     :param effect: Effect to use.
     :param payload: JSON payload.
+    :param selector: Light selector, e.g. id:d073d5000000 or group:Bedroom. Defaults to the configured light.
     """
-    response = requests.post(f"https://api.lifx.com/v1/lights/id:{id}/effects/{effect}",
-                             headers=headers, data=json.dumps(payload))
-    if not response.ok:
-        raise requests.exceptions.HTTPError(response.status_code, response.reason, response.content)
+    lifx.get_transport().post_effect(lifx.default_selector(selector), effect, payload)
 
 
-headers = {
-    "Authorization": f"Bearer {lifx.config['DEFAULT']['api_key']}",
-}
+def stream(frames, fps=20.0, duration=0.0, tiles=False, selector=None):
+    """
+    Plays a custom animation frame by frame, for what move, morph and flame can't do, e.g. a rainbow scroll on a
+    strip. Only the zones that changed since the last frame are sent; see luminary.api.lifx_frames.
+
+    :param frames: Iterable of arrays of shape (zones, 4) of hue, saturation, brightness and kelvin per zone.
+    :param fps: Target frames per second; frames that fall a whole frame behind are skipped.
+    :param duration: Seconds each frame fades in over.
+    :param tiles: True for a tile chain, 64 zones per tile.
+    :param selector: Selector of one strip or tile chain. Defaults to the configured light.
+    :return: The FrameStream, with counts of frames, messages and bytes sent and frames skipped.
+    """
+    from luminary.api import lifx_frames  # pulls in NumPy
 
-id = lifx.config['DEFAULT']['light_id']
+    frame_stream = lifx_frames.open_stream(selector, tiles, fps)
+    frame_stream.play(frames, duration)
+    return frame_stream
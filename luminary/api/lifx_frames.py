@@ -0,0 +1,292 @@
+"""
+Frame streaming for multizone strips and tiles, for custom animations the firmware effects can't do.
+
+A frame is a NumPy array of shape (zones, 4) holding every zone's hue, saturation, brightness and kelvin in the
+layout luminary.util.color_math works with; tiles are 64 zones per tile, row by row. Each frame is compared with
+the last one sent and only the zones that changed go out, in as few messages as possible:
+
+    LAN strips    SetColorZones per run of same-colored changed zones, or SetExtendedColorZones per 82 zone window,
+                  whichever takes fewer messages. All but the last message of a frame are buffered by the strip,
+                  so the whole frame shows at once.
+    LAN tiles     Set64 per tile with a changed pixel.
+    Cloud         set_state per run of same-colored changed zones, on zone selectors like id:d073d5000000|2-5.
+
+A FrameGovernor paces frames to a steady rate and caps messages per second so the device isn't flooded.
+"""
+import time
+
+import numpy as np
+
+from luminary.api import lifx, lifx_lan
+from luminary.api.ratelimit import RateLimiter
+from luminary.api.transport import LanTransport, TransportError
+
+MESSAGE_RATE = 20  # LIFX's advice for messages per second per device
+
+
+def to_wire(frame):
+    """
+    :param frame: Array of shape (zones, 4); unset (NaN) hue, saturation and brightness count as 0, kelvin as 3500.
+    :return: Array of shape (zones, 4) of the 16 bit values sent to the device.
+    """
+    frame = np.asarray(frame, dtype=float).reshape(-1, 4)
+    wire = np.empty(frame.shape, dtype=np.uint16)
+    wire[:, 0] = np.round(np.nan_to_num(frame[:, 0]) % 360 / 360 * 65535).astype(np.int64) % 65536
+    wire[:, 1:3] = np.round(np.clip(np.nan_to_num(frame[:, 1:3]), 0.0, 1.0) * 65535)
+    wire[:, 3] = np.clip(np.nan_to_num(frame[:, 3], nan=3500.0), 1500, 9000)
+    return wire
+
+
+def changed_zones(wire, last):
+    """
+    :param wire: Frame in wire values.
+    :param last: Frame last sent, or None if nothing was.
+    :return: Boolean array of the zones that differ.
+    """
+    if last is None or last.shape != wire.shape:
+        return np.ones(len(wire), dtype=bool)
+    return (wire != last).any(axis=1)
+
+
+def color_runs(wire, changed):
+    """
+    :return: List of (start, end) inclusive ranges of consecutive changed zones sharing one color.
+    """
+    continues = np.zeros(len(wire), dtype=bool)  # zone is changed and the same color as the changed zone before it
+    continues[1:] = changed[1:] & changed[:-1] & (wire[1:] == wire[:-1]).all(axis=1)
+    starts = np.flatnonzero(changed & ~continues)
+    ends = np.flatnonzero(changed & ~np.append(continues[1:], False))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def windows(changed, size):
+    """
+    :return: List of (start, count) windows of at most size zones covering every changed zone.
+    """
+    result = []
+    indices = np.flatnonzero(changed)
+    position = 0
+    while position < len(indices):
+        start = int(indices[position])
+        count = min(size, len(changed) - start)
+        result.append((start, count))
+        position = int(np.searchsorted(indices, start + count))
+    return result
+
+
+class LanZoneSender:
+    MESSAGE_BYTES = {
+        msg_type: lifx_lan.HEADER.size + lifx_lan.PAYLOADS[msg_type].size
+        for msg_type in (lifx_lan.SET_COLOR_ZONES, lifx_lan.SET_EXTENDED_COLOR_ZONES)
+    }
+    APPLY_FIELD = {lifx_lan.SET_COLOR_ZONES: -1, lifx_lan.SET_EXTENDED_COLOR_ZONES: 1}
+
+    def __init__(self, light):
+        """
+        :param light: lifx_lan.LanLight of a multizone strip.
+        """
+        self.light = light
+
+    def plan(self, wire, changed, duration=0.0):
+        """
+        :return: List of (message type, payload values) for the changed zones, fewest messages first, then bytes.
+        """
+        ms = int(duration * 1000)
+        runs = color_runs(wire, changed)
+        extended = windows(changed, lifx_lan.EXTENDED_ZONES)
+        by_runs = len(runs), len(runs) * self.MESSAGE_BYTES[lifx_lan.SET_COLOR_ZONES]
+        by_windows = len(extended), len(extended) * self.MESSAGE_BYTES[lifx_lan.SET_EXTENDED_COLOR_ZONES]
+
+        messages = []
+        if by_runs <= by_windows:
+            for start, end in runs:
+                messages.append((lifx_lan.SET_COLOR_ZONES,
+                                 [start, end, *wire[start].tolist(), ms, lifx_lan.NO_APPLY]))
+        else:
+            padded = np.zeros((lifx_lan.EXTENDED_ZONES, 4), dtype=np.uint16)
+            for start, count in extended:
+                padded[:count] = wire[start:start + count]
+                padded[count:] = 0
+                messages.append((lifx_lan.SET_EXTENDED_COLOR_ZONES,
+                                 [ms, lifx_lan.NO_APPLY, start, count, *padded.ravel().tolist()]))
+        if messages:
+            msg_type, values = messages[-1]
+            values[self.APPLY_FIELD[msg_type]] = lifx_lan.APPLY
+        return messages
+
+    def send(self, messages):
+        return sum(self.light.send(msg_type, values) for msg_type, values in messages)
+
+
+class LanTileSender:
+    def __init__(self, light, width=8):
+        """
+        :param light: lifx_lan.LanLight of a tile chain.
+        :param width: Pixels per tile row.
+        """
+        self.light = light
+        self.width = width
+
+    def plan(self, wire, changed, duration=0.0):
+        ms = int(duration * 1000)
+        tiles = changed.reshape(-1, lifx_lan.TILE_ZONES).any(axis=1)
+        messages = []
+        for tile in np.flatnonzero(tiles).tolist():
+            pixels = wire[tile * lifx_lan.TILE_ZONES:(tile + 1) * lifx_lan.TILE_ZONES]
+            messages.append((lifx_lan.SET64, [tile, 1, 0, 0, 0, self.width, ms, *pixels.ravel().tolist()]))
+        return messages
+
+    def send(self, messages):
+        return sum(self.light.send(msg_type, values) for msg_type, values in messages)
+
+
+class CloudZoneSender:
+    def __init__(self, selector):
+        """
+        :param selector: Selector of one multizone light, e.g. id:d073d5000000
+        """
+        self.selector = selector
+
+    def plan(self, wire, changed, duration=0.0):
+        messages = []
+        for start, end in color_runs(wire, changed):
+            hue, saturation, brightness, kelvin = lifx_lan.from_hsbk(*wire[start].tolist())
+            zones = f"{start}-{end}" if end > start else str(start)
+            messages.append((f"{self.selector}|{zones}", {
+                'color': f"hue:{hue:.2f} saturation:{saturation:.4f} kelvin:{kelvin}",
+                'brightness': round(brightness, 4),
+                'duration': duration,
+            }))
+        return messages
+
+    def send(self, messages):
+        for selector, payload in messages:
+            lifx.set_state(payload, selector)
+        return 0  # the HTTP layer doesn't count bytes
+
+
+class FrameGovernor:
+    def __init__(self, fps=20.0, message_rate=MESSAGE_RATE, clock=time.monotonic, sleep=time.sleep):
+        """
+        Paces frames to fps on absolute deadlines, so slow frames don't add up into drift, and caps messages sent
+        per second with a token bucket.
+
+        :param fps: Target frames per second.
+        :param message_rate: Max messages per second, None for no cap.
+        :param clock: Monotonic clock.
+        :param sleep: Sleeps given seconds.
+        """
+        self.interval = 1 / fps
+        self.clock = clock
+        self.sleep = sleep
+        self.limiter = RateLimiter(message_rate, 1.0, clock, sleep) if message_rate else None
+        self.next_frame = None
+
+    def wait(self):
+        """
+        Sleeps until the next frame is due.
+
+        :return: False if the next frame is already a whole frame late and should be skipped.
+        """
+        now = self.clock()
+        if self.next_frame is None:
+            self.next_frame = now
+        if now - self.next_frame >= self.interval:
+            self.next_frame += self.interval
+            return False
+        if self.next_frame > now:
+            self.sleep(self.next_frame - now)
+        self.next_frame += self.interval
+        return True
+
+    def acquire(self, messages):
+        if self.limiter is not None:
+            for _ in range(messages):
+                self.limiter.acquire()
+
+
+class FrameStream:
+    def __init__(self, sender, governor=None):
+        """
+        :param sender: LanZoneSender, LanTileSender or CloudZoneSender.
+        :param governor: FrameGovernor pacing play; defaults to 20 fps and 20 messages per second.
+        """
+        self.sender = sender
+        self.governor = governor or FrameGovernor()
+        self.last = None
+        self.frames = 0
+        self.messages = 0
+        self.bytes = 0
+        self.skipped = 0
+
+    def send(self, frame, duration=0.0):
+        """
+        Sends what changed since the last frame right away, waiting only on the governor's message cap.
+
+        :param frame: Array of shape (zones, 4).
+        :param duration: Seconds the device fades to the frame over.
+        :return: Number of messages sent.
+        """
+        wire = to_wire(frame)
+        messages = self.sender.plan(wire, changed_zones(wire, self.last), duration)
+        self.governor.acquire(len(messages))
+        self.bytes += self.sender.send(messages)
+        self.last = wire
+        self.frames += 1
+        self.messages += len(messages)
+        return len(messages)
+
+    def play(self, frames, duration=0.0):
+        """
+        Sends frames at the governor's frame rate. Frames that come due while an earlier one is still going out
+        are skipped rather than queued, so the animation keeps time.
+
+        :param frames: Iterable of frames.
+        """
+        for frame in frames:
+            if self.governor.wait():
+                self.send(frame, duration)
+            else:
+                self.skipped += 1
+
+    def reset(self):
+        """
+        Forgets the last frame, so the next one is sent in full, e.g. after something else changed the device.
+        """
+        self.last = None
+
+
+def lan_light(selector):
+    """
+    :return: lifx_lan.LanLight for selector if the configured transport reaches it over the LAN, else None.
+    """
+    transport = lifx.get_transport()
+    while transport is not None:
+        if isinstance(transport, LanTransport):
+            try:
+                return transport.light(selector)
+            except TransportError:
+                return None
+        transport = getattr(transport, 'primary', None) or getattr(transport, 'transport', None)
+    return None
+
+
+def open_stream(selector=None, tiles=False, fps=20.0, message_rate=MESSAGE_RATE):
+    """
+    Streams to a light over the LAN if the configured transport reaches it there, else over the cloud API, where
+    the client's rate limit paces requests instead.
+
+    :param selector: Selector of one strip or tile chain. Defaults to the configured light.
+    :param tiles: True for a tile chain; tiles are only supported over the LAN.
+    :param fps: Target frames per second.
+    :param message_rate: Max LAN messages per second.
+    :return: FrameStream
+    """
+    selector = lifx.default_selector(selector)
+    light = lan_light(selector)
+    if light is not None:
+        sender = LanTileSender(light) if tiles else LanZoneSender(light)
+        return FrameStream(sender, FrameGovernor(fps, message_rate))
+    if tiles:
+        raise TransportError('Tiles can only be streamed to over the LAN')
+    return FrameStream(CloudZoneSender(selector), FrameGovernor(fps, None))
@@ -0,0 +1,280 @@
+"""
+LIFX LAN protocol: https://lan.developer.lifx.com/docs/packet-contents
+Every packet is a 36 byte little-endian header followed by a message specific payload.
+"""
+import os
+import socket
+import struct
+import threading
+import time
+
+PORT = 56700
+PROTOCOL = 1024
+ADDRESSABLE = 1 << 12
+TAGGED = 1 << 13
+RES_REQUIRED = 1
+ACK_REQUIRED = 2
+
+# message types
+GET_SERVICE = 2
+STATE_SERVICE = 3
+ACKNOWLEDGEMENT = 45
+LIGHT_GET = 101
+SET_COLOR = 102
+LIGHT_STATE = 107
+GET_POWER = 116
+SET_POWER = 117
+STATE_POWER = 118
+SET_WAVEFORM_OPTIONAL = 119
+SET_COLOR_ZONES = 501
+SET_EXTENDED_COLOR_ZONES = 510
+SET64 = 715
+
+# multizone apply
+NO_APPLY = 0  # buffer the change until a message with APPLY
+APPLY = 1
+
+EXTENDED_ZONES = 82  # colors per SetExtendedColorZones
+TILE_ZONES = 64  # 8x8 pixels per tile
+
+# waveforms
+SAW = 0
+SINE = 1
+HALF_SINE = 2
+TRIANGLE = 3
+PULSE = 4
+
+HEADER = struct.Struct('<HHI8s6sBBQHH')
+PAYLOADS = {
+    GET_SERVICE: struct.Struct('<'),
+    STATE_SERVICE: struct.Struct('<BI'),  # service, port
+    ACKNOWLEDGEMENT: struct.Struct('<'),
+    LIGHT_GET: struct.Struct('<'),
+    SET_COLOR: struct.Struct('<B4HI'),  # reserved, hue, saturation, brightness, kelvin, duration ms
+    LIGHT_STATE: struct.Struct('<4HhH32sQ'),  # hue, saturation, brightness, kelvin, reserved, power, label, reserved
+    GET_POWER: struct.Struct('<'),
+    SET_POWER: struct.Struct('<HI'),  # level, duration ms
+    STATE_POWER: struct.Struct('<H'),  # level
+    # reserved, transient, hue, saturation, brightness, kelvin, period ms, cycles, skew ratio, waveform,
+    # set hue, set saturation, set brightness, set kelvin
+    SET_WAVEFORM_OPTIONAL: struct.Struct('<BB4HIfhB4B'),
+    # start index, end index, hue, saturation, brightness, kelvin, duration ms, apply
+    SET_COLOR_ZONES: struct.Struct('<BB4HIB'),
+    # duration ms, apply, zone index, colors count, then hue, saturation, brightness, kelvin of 82 zones
+    SET_EXTENDED_COLOR_ZONES: struct.Struct(f"<IBHB{4 * EXTENDED_ZONES}H"),
+    # tile index, length, reserved, x, y, width, duration ms, then hue, saturation, brightness, kelvin of 64 pixels
+    SET64: struct.Struct(f"<BBBBBBI{4 * TILE_ZONES}H"),
+}
+MAX_PACKET = HEADER.size + max(payload.size for payload in PAYLOADS.values())
+
+
+class LanError(Exception):
+    pass
+
+
+class Packet:
+    def __init__(self, source):
+        """
+        Packet encoder writing into one preallocated buffer, so sending a message doesn't allocate.
+
+        :param source: Client id echoed back by the bulb in its responses.
+        """
+        self.source = source
+        self.buffer = bytearray(MAX_PACKET)
+        self.view = memoryview(self.buffer)
+
+    def encode(self, msg_type, target, sequence, values=(), tagged=False, flags=0):
+        """
+        :param msg_type: Message type.
+        :param target: 8 byte target; bulb MAC followed by two zero bytes, or all zeros for every bulb.
+        :param sequence: Sequence number 0-255 used to match responses.
+        :param values: Payload values in the order of PAYLOADS[msg_type].
+        :param tagged: True when broadcasting to all bulbs.
+        :param flags: RES_REQUIRED and/or ACK_REQUIRED.
+        :return: memoryview of the encoded packet. Only valid until the next encode.
+        """
+        payload = PAYLOADS[msg_type]
+        size = HEADER.size + payload.size
+        protocol = PROTOCOL | ADDRESSABLE | (TAGGED if tagged else 0)
+        HEADER.pack_into(self.buffer, 0, size, protocol, self.source, target, b'', flags, sequence, 0, msg_type, 0)
+        payload.pack_into(self.buffer, HEADER.size, *values)
+        return self.view[:size]
+
+
+def decode(data):
+    """
+    :param data: Received packet.
+    :return: Tuple of message type, source, target, sequence and payload values tuple.
+    """
+    if len(data) < HEADER.size:
+        raise LanError('Packet too short')
+    _, _, source, target, _, _, sequence, _, msg_type, _ = HEADER.unpack_from(data)
+    payload = PAYLOADS.get(msg_type)
+    values = payload.unpack_from(data, HEADER.size) if payload is not None else ()
+    return msg_type, source, target, sequence, values
+
+
+def new_source():
+    return struct.unpack('<I', os.urandom(4))[0] or 1
+
+
+def to_hsbk(hue, saturation, brightness, kelvin):
+    """
+    Converts LIFX API style HSBK floats to the 16 bit values used on the wire.
+    """
+    return (round(hue / 360 * 65535) % 65536, round(saturation * 65535), round(brightness * 65535), int(kelvin))
+
+
+def from_hsbk(hue, saturation, brightness, kelvin):
+    return hue / 65535 * 360, saturation / 65535, brightness / 65535, kelvin
+
+
+class LanLight:
+    def __init__(self, ip, mac, port=PORT, timeout=0.25, retries=3):
+        """
+        A bulb reachable over UDP on the local network.
+
+        :param ip: Bulb IP address.
+        :param mac: Bulb MAC as hex string; the same as the light id in the cloud API, e.g. d073d5000000.
+        :param port: Bulb UDP port.
+        :param timeout: Seconds to wait for a response before resending.
+        :param retries: Times to resend an unanswered message.
+        """
+        self.address = (ip, port)
+        self.mac = mac.lower()
+        self.target = bytes.fromhex(self.mac) + b'\x00\x00'
+        self.timeout = timeout
+        self.retries = retries
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.packet = Packet(new_source())
+        self.recv_buffer = bytearray(1024)
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def request(self, msg_type, values=(), response_type=ACKNOWLEDGEMENT):
+        """
+        Sends message and waits for its response, resending on timeout.
+
+        :param msg_type: Message type.
+        :param values: Payload values.
+        :param response_type: Message type expected back; ACKNOWLEDGEMENT for set messages.
+        :return: Response payload values.
+        """
+        with self.lock:
+            self.sequence = (self.sequence + 1) % 256
+            flags = ACK_REQUIRED if response_type == ACKNOWLEDGEMENT else RES_REQUIRED
+            data = self.packet.encode(msg_type, self.target, self.sequence, values, flags=flags)
+
+            for _ in range(self.retries + 1):
+                self.socket.sendto(data, self.address)
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.socket.settimeout(remaining)
+                    try:
+                        size = self.socket.recv_into(self.recv_buffer)
+                    except socket.timeout:
+                        break
+                    reply_type, source, _, sequence, reply = decode(self.recv_buffer[:size])
+                    if reply_type == response_type and source == self.packet.source and sequence == self.sequence:
+                        return reply
+
+        raise LanError(f"No response from {self.mac} at {self.address[0]}")
+
+    def send(self, msg_type, values=()):
+        """
+        Sends message without asking for an acknowledgement, for streams where a lost message is replaced by
+        the next one anyway.
+
+        :return: Bytes sent.
+        """
+        with self.lock:
+            self.sequence = (self.sequence + 1) % 256
+            return self.socket.sendto(self.packet.encode(msg_type, self.target, self.sequence, values), self.address)
+
+    def get_state(self):
+        """
+        :return: Dict of hue, saturation, brightness, kelvin, power (bool) and label.
+        """
+        hue, saturation, brightness, kelvin, _, power, label, _ = self.request(LIGHT_GET, response_type=LIGHT_STATE)
+        hue, saturation, brightness, kelvin = from_hsbk(hue, saturation, brightness, kelvin)
+        return {
+            'hue': hue,
+            'saturation': saturation,
+            'brightness': brightness,
+            'kelvin': kelvin,
+            'power': power > 0,
+            'label': label.rstrip(b'\x00').decode('utf-8', 'replace'),
+        }
+
+    def get_power(self):
+        level, = self.request(GET_POWER, response_type=STATE_POWER)
+        return level > 0
+
+    def set_power(self, on, duration=0.0):
+        self.request(SET_POWER, (65535 if on else 0, int(duration * 1000)))
+
+    def set_color(self, hue, saturation, brightness, kelvin, duration=0.0):
+        self.request(SET_COLOR, (0, *to_hsbk(hue, saturation, brightness, kelvin), int(duration * 1000)))
+
+    def set_waveform(self, waveform, hsbk, period, cycles, transient=True, skew_ratio=0.5):
+        """
+        https://lan.developer.lifx.com/docs/waveforms
+
+        :param waveform: SAW, SINE, HALF_SINE, TRIANGLE or PULSE.
+        :param hsbk: Dict of target hue, saturation, brightness and kelvin; components that are None are left as is.
+        :param period: Seconds for one cycle.
+        :param cycles: Number of cycles.
+        :param transient: If true return to the original color when done.
+        :param skew_ratio: 0.0-1.0, where in the period the target color is reached (duty cycle for PULSE).
+        """
+        keys = ('hue', 'saturation', 'brightness', 'kelvin')
+        values = [hsbk.get(key) for key in keys]
+        set_flags = [int(value is not None) for value in values]
+        wire = to_hsbk(*(value if value is not None else 0 for value in values))
+        skew = max(-32768, min(32767, round(skew_ratio * 65535) - 32768))
+        self.request(SET_WAVEFORM_OPTIONAL,
+                     (0, int(transient), *wire, int(period * 1000), float(cycles), skew, waveform, *set_flags))
+
+    def close(self):
+        self.socket.close()
+
+
+def discover(timeout=1.0, broadcast='255.255.255.255', port=PORT, request_timeout=0.25):
+    """
+    Broadcasts GetService and collects the bulbs that answer.
+
+    :param timeout: Seconds to listen for answers.
+    :param broadcast: Broadcast address of the local network.
+    :param port: Port bulbs listen on.
+    :param request_timeout: Seconds the returned lights wait for an answer before resending, see LanLight.
+    :return: Dict of MAC hex string to LanLight.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    packet = Packet(new_source())
+    buffer = bytearray(1024)
+
+    lights = {}
+    try:
+        sock.sendto(packet.encode(GET_SERVICE, bytes(8), 0, tagged=True, flags=RES_REQUIRED), (broadcast, port))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                size, (ip, _) = sock.recvfrom_into(buffer)
+            except socket.timeout:
+                break
+            msg_type, source, target, _, values = decode(buffer[:size])
+            if msg_type == STATE_SERVICE and source == packet.source and values[0] == 1:  # 1 = UDP service
+                mac = target[:6].hex()
+                lights[mac] = LanLight(ip, mac, port=values[1], timeout=request_timeout)
+    finally:
+        sock.close()
+    return lights
@@ -0,0 +1,120 @@
+"""
+Named lights, groups and locations from lights.ini in the config dir, one section per light:
+
+    [desk]
+    id = d073d5000001
+    group = Office
+    location = Home
+
+Anywhere a selector is taken, a light's name, a list of names and selectors, or a raw selector works too.
+Commands aimed at several lights compile to one selector: the group or location when they're exactly its lights,
+else the ids joined with commas. List every light of a group or location here, or the group selector could reach
+lights this file doesn't know about.
+"""
+import json
+
+from luminary.util import project
+
+
+class Light:
+    def __init__(self, name, light_id, group=None, location=None):
+        self.name = name
+        self.id = light_id.lower()
+        self.group = group
+        self.location = location
+
+    @property
+    def selector(self):
+        return f"id:{self.id}"
+
+    def __repr__(self):
+        return f"Light({self.name!r}, {self.id!r})"
+
+
+def load_lights(config_name='lights.ini'):
+    """
+    :return: Dict of light name to Light.
+    """
+    config = project.load_config(config_name)
+    lights = {}
+    for name in config.sections():
+        section = config[name]
+        if 'id' not in section:
+            raise project.ConfigError(f"[{name}] in {project.config_dir()}/{config_name} needs an id")
+        lights[name] = Light(name, section['id'], section.get('group'), section.get('location'))
+    return lights
+
+
+@project.lazy
+def get_lights():
+    return load_lights()
+
+
+def members(kind, label, lights=None):
+    """
+    :param kind: group or location.
+    :return: Set of the ids of the configured lights in the group or location labelled label.
+    """
+    lights = get_lights() if lights is None else lights
+    return {light.id for light in lights.values() if getattr(light, kind) == label}
+
+
+def expand(target, lights=None):
+    """
+    :param target: Light name, selector, comma-joined selectors or a list of any of those.
+    :return: List of selector parts, with names, groups and locations of configured lights expanded to id:
+             selectors, in order and without repeats.
+    """
+    lights = get_lights() if lights is None else lights
+    parts = []
+    for part in ([target] if isinstance(target, str) else target):
+        for selector in part.split(','):
+            selector = selector.strip()
+            kind, _, label = selector.partition(':')
+            if selector in lights:
+                parts.append(lights[selector].selector)
+            elif kind in ('group', 'location') and members(kind, label, lights):
+                parts.extend(f"id:{light_id}" for light_id in sorted(members(kind, label, lights)))
+            elif kind == 'id':
+                parts.append(f"id:{label.lower()}")
+            else:
+                parts.append(selector)
+    return list(dict.fromkeys(parts))
+
+
+def combine(target, lights=None):
+    """
+    Compiles target to a single selector reaching the same lights, as short as it can be made.
+
+    :param target: See expand.
+    :return: Selector string.
+    """
+    lights = get_lights() if lights is None else lights
+    parts = expand(target, lights)
+    ids = {part[3:] for part in parts if part.startswith('id:')}
+    others = [part for part in parts if not part.startswith('id:')]
+    if len(ids) > 1:
+        # whole locations first, then whole groups, in place of their ids
+        for kind in ('location', 'group'):
+            for label in sorted({getattr(light, kind) for light in lights.values()} - {None}):
+                covered = members(kind, label, lights)
+                if covered <= ids and len(covered) > 1:
+                    others.append(f"{kind}:{label}")
+                    ids -= covered
+    id_parts = [part for part in parts if part.startswith('id:') and part[3:] in ids]
+    return ','.join(id_parts + others)
+
+
+def batch(states, lights=None):
+    """
+    Groups per-light states so lights getting the same state share one entry, for the set states endpoint.
+
+    :param states: Dict of target (see expand) to set_state payload.
+    :return: List of (selector, payload), one per distinct payload.
+    """
+    lights = get_lights() if lights is None else lights
+    grouped = {}
+    for target, payload in states.items():
+        key = json.dumps(payload, sort_keys=True)
+        grouped.setdefault(key, (payload, []))[1].extend(expand(target, lights))
+    return [(combine(selectors, lights), payload) for payload, selectors in grouped.values()]
@@ -0,0 +1,92 @@
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, limit=120, period=60.0, clock=time.time, sleep=time.sleep):
+        """
+        Client-side governor for the LIFX cloud API rate limit: https://api.developer.lifx.com/docs/rate-limits
+        A token bucket of `limit` tokens refilled evenly over `period` spreads bursts out, and the X-RateLimit-*
+        headers of every response keep it in sync with the server's own count so calls wait instead of getting a 429.
+
+        :param limit: Requests allowed per period until the server says otherwise.
+        :param period: Seconds per rate limit window.
+        :param clock: Returns current time in epoch seconds; X-RateLimit-Reset is an epoch timestamp.
+        :param sleep: Sleeps given seconds.
+        """
+        self.limit = limit
+        self.period = period
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = float(limit)
+        self.updated = clock()
+        self.remaining = None  # requests left in the server's window, None if unknown
+        self.reset_at = None
+        self.opens_at = None  # when the window remaining counts down in opens, if it's the next one
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent without going over the limit.
+        """
+        with self.lock:
+            wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+
+    def reserve(self):
+        """
+        Takes a token for the next request.
+
+        :return: Seconds to wait before sending it.
+        """
+        now = self.clock()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.period)
+        self.updated = now
+
+        window_wait = 0
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining, self.reset_at, self.opens_at = None, None, None
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                # the window is used up: this and every caller after it get a slot in the next one
+                self.opens_at, self.reset_at, self.remaining = self.reset_at, self.reset_at + self.period, self.limit
+            self.remaining -= 1
+            if self.opens_at is not None:
+                window_wait = self.opens_at - now
+
+        self.tokens -= 1
+        bucket_wait = -self.tokens * self.period / self.limit if self.tokens < 0 else 0
+        return max(window_wait, bucket_wait)
+
+    def update(self, headers, status_code=200):
+        """
+        Syncs with the server's count.
+
+        :param headers: Response headers.
+        :param status_code: Response status code; a 429 means no requests are left in the window.
+        """
+        with self.lock:
+            if 'X-RateLimit-Limit' in headers:
+                limit = int(headers['X-RateLimit-Limit'])
+                if limit != self.limit:
+                    self.tokens = self.tokens * limit / self.limit
+                    self.limit = limit
+            reset_at = float(headers['X-RateLimit-Reset']) if 'X-RateLimit-Reset' in headers else None
+            remaining = int(headers['X-RateLimit-Remaining']) if 'X-RateLimit-Remaining' in headers else None
+            if status_code == 429:
+                remaining = 0
+                if reset_at is None and self.reset_at is None:
+                    reset_at = self.clock() + float(headers.get('Retry-After', self.period))
+
+            if reset_at is not None and self.opens_at is not None and reset_at < self.opens_at + self.period / 2:
+                return  # answer from a window before the one callers are already lined up for
+            if reset_at is not None and (self.reset_at is None or reset_at > self.reset_at + self.period / 2):
+                self.remaining, self.reset_at, self.opens_at = remaining, reset_at, None  # a window new to us
+                return
+            if reset_at is not None:
+                self.reset_at = max(self.reset_at, reset_at)
+            if remaining is not None:
+                # responses can arrive out of order and miss requests let through since, so only ever count down
+                self.remaining = remaining if self.remaining is None else min(self.remaining, remaining)
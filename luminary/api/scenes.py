@@ -0,0 +1,189 @@
+"""
+LIFX scenes: the cloud's, set up in the LIFX app, and local ones snapshotted from the lights into scene files in the
+config dir. Activating a local scene only writes to the lights that differ from it, in one set states request, so a
+scene that's mostly in place already costs few or no writes.
+
+Scene files are a header and one fixed size record per light, with colors in the LAN protocol's 16 bit units.
+"""
+import json
+import os
+import re
+import struct
+
+from luminary.api import lifx, lifx_lan, lights
+from luminary.api.http_client import http_error
+from luminary.util import project
+
+MAGIC = b'LSC1'
+HEADER = struct.Struct('<4sH')  # magic, light count
+RECORD = struct.Struct('<6sB4H')  # light id, power, hue, saturation, brightness, kelvin
+# Largest differences still counted as the same state, in 16 bit units: about 1 degree of hue, 0.005 of saturation
+# and brightness, like LightMirror.is_redundant
+TOLERANCE = (182, 328, 328, 1)
+
+
+def list_scenes():
+    """
+    https://api.developer.lifx.com/docs/list-scenes
+
+    :return: List of the account's scenes, each a dict with its uuid, name and states.
+    """
+    response = lifx.get_client().get('scenes')
+    if not response.ok:
+        raise http_error(response)
+    return json.loads(response.content)
+
+
+def find_scene(name):
+    """
+    :return: uuid of the cloud scene called name.
+    :raise ValueError: If there's none.
+    """
+    uuids = {scene['name']: scene['uuid'] for scene in list_scenes()}
+    if name not in uuids:
+        raise ValueError(f"Unknown scene {name}, expected one of {', '.join(uuids)}")
+    return uuids[name]
+
+
+def activate_scene(scene_uuid, duration=1.0, fast=False):
+    """
+    https://api.developer.lifx.com/docs/activate-scene
+
+    :param scene_uuid: Scene uuid, see find_scene.
+    :param duration: Seconds the lights take to change.
+    :param fast: Skip the API's state checks and don't wait for the lights to respond.
+    """
+    payload = {'duration': duration}
+    if fast:
+        payload['fast'] = True
+    lifx.get_transport().activate_scene(f"scene_id:{scene_uuid}", payload)
+
+
+class Scene:
+    def __init__(self, states):
+        """
+        :param states: Dict of light id to (power on, (hue, saturation, brightness, kelvin) in 16 bit units).
+        """
+        self.states = states
+
+    @classmethod
+    def from_statuses(cls, statuses):
+        """
+        :param statuses: Light statuses as returned by get_status.
+        """
+        return cls({status['id'].lower(): encode_status(status) for status in statuses})
+
+    def encode(self):
+        return HEADER.pack(MAGIC, len(self.states)) + b''.join(
+            RECORD.pack(bytes.fromhex(light_id), power, *hsbk) for light_id, (power, hsbk) in self.states.items())
+
+    @classmethod
+    def decode(cls, data):
+        magic, count = HEADER.unpack_from(data)
+        if magic != MAGIC or len(data) != HEADER.size + count * RECORD.size:
+            raise ValueError('Not a scene file')
+        return cls({light_id.hex(): (bool(power), tuple(hsbk))
+                    for light_id, power, *hsbk in RECORD.iter_unpack(data[HEADER.size:])})
+
+    def changes(self, statuses):
+        """
+        :param statuses: Current light statuses as returned by get_status.
+        :return: Dict of id: selector to set_state payload, for each of the scene's lights not already in its state.
+        """
+        current = {status['id'].lower(): status for status in statuses}
+        changes = {}
+        for light_id, (power, hsbk) in self.states.items():
+            status = current.get(light_id)
+            if status is not None and matches(encode_status(status), (power, hsbk)):
+                continue
+            if not power:
+                changes[f"id:{light_id}"] = {'power': 'off'}
+                continue
+            hue, saturation, brightness, kelvin = lifx_lan.from_hsbk(*hsbk)
+            changes[f"id:{light_id}"] = {'power': 'on', 'brightness': round(brightness, 4),
+                                         'color': f"hue:{hue:.2f} saturation:{saturation:.4f} kelvin:{kelvin}"}
+        return changes
+
+
+def encode_status(status):
+    """
+    :return: (power on, (hue, saturation, brightness, kelvin) in 16 bit units) of a light status.
+    """
+    color = status.get('color', {})
+    return status.get('power') == 'on', lifx_lan.to_hsbk(color.get('hue') or 0.0, color.get('saturation') or 0.0,
+                                                         status.get('brightness') or 0.0, color.get('kelvin') or 3500)
+
+
+def matches(state, target):
+    """
+    :return: True if state is target within TOLERANCE. Lights that are off match whatever color they'd have.
+    """
+    (power, hsbk), (target_power, target_hsbk) = state, target
+    if power != target_power:
+        return False
+    if not power:
+        return True
+    hue_difference = abs(hsbk[0] - target_hsbk[0])
+    differences = (min(hue_difference, 65536 - hue_difference),
+                   *(abs(value - target_value) for value, target_value in zip(hsbk[1:], target_hsbk[1:])))
+    return all(difference <= tolerance for difference, tolerance in zip(differences, TOLERANCE))
+
+
+def scene_path(name):
+    """
+    :param name: Snapshot name, letters, digits, _ and - only, as it comes from the daemon's clients.
+    :raise ValueError: If name has anything else, e.g. a path separator.
+    """
+    if not re.fullmatch(r'[\w-]+', name):
+        raise ValueError(f"Invalid scene name {name!r}, use letters, digits, _ and - only")
+    return f"{project.config_dir()}/scenes/{name}.scene"
+
+
+def save_scene(name, scene):
+    path = scene_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(scene.encode())
+    os.replace(tmp_path, path)
+
+
+def load_scene(name):
+    """
+    :raise FileNotFoundError: If no scene was saved as name.
+    """
+    with open(scene_path(name), 'rb') as f:
+        return Scene.decode(f.read())
+
+
+def snapshot(name, selector=None):
+    """
+    Saves the lights' current state as a local scene.
+
+    :param name: Scene name, see scene_path.
+    :param selector: Lights to save, defaults to every light in lights.ini, or the configured light if there are none.
+    :return: Scene.
+    """
+    scene_path(name)  # a bad name fails before reading the lights
+    if selector is None and lights.get_lights():
+        selector = [light.selector for light in lights.get_lights().values()]
+    scene = Scene.from_statuses(lifx.get_statuses(selector))
+    save_scene(name, scene)
+    return scene
+
+
+def activate_snapshot(name, duration=1.0):
+    """
+    Puts the lights of a local scene back the way they were when it was saved, writing only to those that differ.
+
+    :param name: Scene name.
+    :param duration: Seconds the lights take to change.
+    :return: Dict of the changes made, see Scene.changes.
+    """
+    scene = load_scene(name)
+    if not scene.states:
+        return {}
+    changes = scene.changes(lifx.get_statuses([f"id:{light_id}" for light_id in scene.states]))
+    if changes:
+        lifx.set_states(changes, defaults={'duration': duration})
+    return changes
@@ -0,0 +1,139 @@
+"""
+Depth sensor sampling in a process of its own, so network calls and other threads holding the GIL neither pause
+sampling nor delay the echo edge callbacks that time the pulses, which would read as longer distances.
+
+The sampler writes each reading into a ring buffer in shared memory and consumers read it in place, with no locks:
+there's one writer, and each slot carries the number of the reading it holds, set to -1 while it's being written,
+so a reader can tell a slot it read whole from one overwritten under it. Select it for the light switch with
+`sampler = process` in raspberry-pi.ini.
+"""
+import atexit
+import math
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+from luminary.api import ultrasonic_depth_sensor as uds
+
+SLOTS = 1024  # readings kept, about 100 seconds at 10 per second
+FIELDS = 3  # per slot: reading number, time.monotonic() it was taken, distance in cm (NaN for a missed echo)
+HEADER = 1  # before the slots: number of readings written so far
+
+
+class SampleRing:
+    def __init__(self, name=None, slots=SLOTS):
+        """
+        Ring buffer of readings in shared memory, read and written through a memoryview of float64s over it.
+
+        :param name: Shared memory block to attach to, None to create one.
+        :param slots: Readings the ring holds; must match the creator's when attaching.
+        """
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name, create=self.owner, size=8 * (HEADER + slots * FIELDS))
+        self.values = self.memory.buf.cast('d')
+        self.slots = slots
+        self.read = 0  # next reading number readings() yields
+        self.dropped = 0  # readings overwritten before readings() got to them
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def count(self):
+        """
+        :return: Number of readings written so far.
+        """
+        return int(self.values[0])
+
+    def write(self, taken, distance):
+        values = self.values
+        number = int(values[0])
+        base = HEADER + number % self.slots * FIELDS
+        values[base] = -1.0
+        values[base + 1] = taken
+        values[base + 2] = math.nan if distance is None else distance
+        values[base] = number
+        values[0] = number + 1
+
+    def get(self, number):
+        """
+        :return: uds.Reading number, None if it has been overwritten.
+        """
+        values = self.values
+        base = HEADER + number % self.slots * FIELDS
+        taken, distance = values[base + 1], values[base + 2]
+        if values[base] != number:
+            return None
+        return uds.Reading(taken, None if math.isnan(distance) else distance)
+
+    def readings(self, poll=0.005):
+        """
+        Generator of the readings written from now on, in order. Readings overwritten before they're reached are
+        skipped and counted in dropped.
+
+        :param poll: Seconds to sleep while waiting for the next reading.
+        """
+        self.read = self.count()
+        while True:
+            count = self.count()
+            if count - self.read > self.slots:
+                self.dropped += count - self.slots - self.read
+                self.read = count - self.slots
+            while self.read < count:
+                reading = self.get(self.read)
+                self.read += 1
+                if reading is None:
+                    self.dropped += 1
+                else:
+                    yield reading
+            time.sleep(poll)
+
+    def array(self):
+        """
+        :return: NumPy view of the slots without copying, one row of FIELDS per slot, for batch analysis.
+                 Rows are in slot order and may change while they're read. Delete it before close().
+        """
+        import numpy as np  # only batch users pay for NumPy
+
+        return np.frombuffer(self.memory.buf, dtype=np.float64, count=self.slots * FIELDS,
+                             offset=8 * HEADER).reshape(self.slots, FIELDS)
+
+    def close(self):
+        if self.memory.buf is None:
+            return  # already closed
+        self.values.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def sample(name, slots=SLOTS, rate=None):
+    """
+    Sampler process: takes readings at a steady rate forever, writing them to the ring named name.
+    """
+    ring = SampleRing(name, slots)
+    uds.setup_pins()
+    for reading in uds.distances(rate):
+        ring.write(reading.time, reading.distance)
+
+
+def start(rate=None, slots=SLOTS):
+    """
+    Starts the sampler process, stopped when this process exits.
+
+    :param rate: Readings per second. Defaults to `sample_rate` in raspberry-pi.ini.
+    :return: The process and the SampleRing it writes to.
+    """
+    ring = SampleRing(slots=slots)
+    process = multiprocessing.get_context('spawn').Process(target=sample, args=(ring.name, slots, rate),
+                                                           name='depth-sampler', daemon=True)
+    process.start()
+    atexit.register(stop, process, ring)
+    return process, ring
+
+
+def stop(process, ring):
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    ring.close()
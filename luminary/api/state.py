@@ -0,0 +1,288 @@
+import copy
+import logging
+import threading
+import time
+
+from luminary.api import colors
+
+logger = logging.getLogger(__name__)
+
+COLOR_KEYS = ('hue', 'saturation', 'kelvin')
+
+
+class LightMirror:
+    def __init__(self, max_age=10.0, clock=time.monotonic):
+        """
+        In-process record of the lights' state, keyed by selector, in the shape returned by the list lights API.
+        Seeded by get_status and updated optimistically after each successful call. An entry is trusted for
+        max_age seconds after it was last confirmed with the light; optimistic updates don't extend that.
+
+        :param max_age: Seconds a confirmed state is trusted for. 0 never trusts the mirror.
+        :param clock: Monotonic clock.
+        """
+        self.max_age = max_age
+        self.clock = clock
+        self.lights = {}  # selector -> (status dict, confirmed at)
+        self.lock = threading.RLock()
+
+    def seed(self, selector, status):
+        with self.lock:
+            self.lights[selector] = (copy.deepcopy(status), self.clock())
+
+    def invalidate(self, selector):
+        with self.lock:
+            self.lights.pop(selector, None)
+
+    def clear(self):
+        with self.lock:
+            self.lights.clear()
+
+    def age(self, selector):
+        """
+        :return: Seconds since selector's state was last confirmed with the light, None if unknown.
+        """
+        with self.lock:
+            if selector not in self.lights:
+                return None
+            return self.clock() - self.lights[selector][1]
+
+    def get(self, selector):
+        """
+        :return: Copy of selector's status if confirmed within max_age, else None.
+        """
+        with self.lock:
+            age = self.age(selector)
+            if age is None or age > self.max_age:
+                return None
+            return copy.deepcopy(self.lights[selector][0])
+
+    def selectors(self):
+        with self.lock:
+            return list(self.lights)
+
+    def update(self, selector, power=None, hsbk=None):
+        """
+        Optimistically applies a change.
+
+        :param power: 'on' or 'off'.
+        :param hsbk: Dict of hue, saturation, brightness and kelvin; None values are left as is.
+        """
+        with self.lock:
+            if selector not in self.lights:
+                return
+            status = self.lights[selector][0]
+            if power is not None:
+                status['power'] = power
+            if hsbk:
+                for key in COLOR_KEYS:
+                    if hsbk.get(key) is not None:
+                        status.setdefault('color', {})[key] = hsbk[key]
+                if hsbk.get('brightness') is not None:
+                    status['brightness'] = hsbk['brightness']
+
+    def apply_state(self, selector, payload):
+        """
+        Applies a set_state payload. Drops the entry if the payload's color can't be parsed locally.
+        """
+        hsbk = target_hsbk(payload)
+        if hsbk is None:
+            self.invalidate(selector)
+        else:
+            self.update(selector, payload.get('power'), hsbk)
+
+    def apply_effect(self, selector, effect, payload):
+        if effect == 'off':
+            if payload.get('power_off'):
+                self.update(selector, power='off')
+            return
+        if effect not in ('pulse', 'breathe'):
+            self.invalidate(selector)  # firmware effects leave the light in an unknown color
+            return
+
+        hsbk = target_hsbk({'color': payload['color']}) if payload.get('persist') else {}
+        if hsbk is None:
+            self.invalidate(selector)
+        else:
+            self.update(selector, 'on' if payload.get('power_on', True) else None, hsbk)
+
+    def toggle(self, selectors):
+        """
+        Applies a toggle of several lights the way the cloud API does: if any is on, all turn off, else all turn on.
+        Drops the entries if none is known to be on but some aren't known.
+        """
+        with self.lock:
+            powers = [self.lights[key][0].get('power') if key in self.lights else None for key in selectors]
+            if 'on' in powers:
+                power = 'off'
+            elif None in powers:
+                for key in selectors:
+                    self.invalidate(key)
+                return
+            else:
+                power = 'on'
+            for key in selectors:
+                self.update(key, power=power)
+
+    def is_redundant(self, selector, payload):
+        """
+        :return: True if the trusted state already matches everything the set_state payload asks for.
+        """
+        status = self.get(selector)
+        if status is None or not set(payload) <= {'power', 'color', 'brightness', 'duration', 'fast'}:
+            return False
+        if 'power' in payload and payload['power'] != status.get('power'):
+            return False
+
+        hsbk = target_hsbk(payload)
+        if hsbk is None:
+            return False
+        current = dict(status.get('color', {}), brightness=status.get('brightness'))
+        for key, value in hsbk.items():
+            if value is None:
+                continue
+            if current.get(key) is None:
+                return False
+            difference = abs(value - current[key])
+            if key == 'hue':
+                difference = min(difference, 360 - difference)
+            if difference > (1 if key in ('hue', 'kelvin') else 0.005):
+                return False
+        return True
+
+
+def target_hsbk(payload):
+    """
+    :return: Dict of HSBK values a set_state payload sets (None where untouched), None if its color can't be
+             parsed locally.
+    """
+    hsbk = dict.fromkeys(colors.RANGES)
+    if 'color' in payload:
+        parsed = colors.parse(payload['color'])
+        if parsed is None:
+            return None
+        hsbk.update(parsed)
+        if hsbk['kelvin'] is not None and hsbk['saturation'] is None:
+            hsbk['saturation'] = 0.0  # setting kelvin alone turns the light white
+    if payload.get('brightness') is not None:
+        hsbk['brightness'] = payload['brightness']
+    return hsbk
+
+
+class MirroredTransport:
+    def __init__(self, transport, mirror, expand=None):
+        """
+        Keeps a LightMirror up to date with every call made through transport, one entry per light. Skips
+        set_state calls the mirror says are no-ops for every light they reach and answers get_status from the
+        mirror while it is fresh.
+
+        :param transport: Transport requests are sent on.
+        :param mirror: LightMirror.
+        :param expand: Returns the single light selectors a selector reaches, e.g. lights.expand, so changes made
+                       through a group or comma-joined selector update each light's entry.
+                       Defaults to splitting comma-joined selectors.
+        """
+        self.transport = transport
+        self.mirror = mirror
+        self.expand = expand or (lambda selector: selector.split(','))
+
+    def reached(self, selector):
+        """
+        :return: id: selectors of the lights selector reaches, the only keys the mirror keeps so a change through
+                 one selector is seen through every other. Empty if it reaches lights that can't be told apart
+                 here, e.g. a group missing from lights.ini; as any light may change then, every entry is dropped.
+        """
+        keys = self.expand(selector)
+        if all(key.startswith('id:') for key in keys):
+            return keys
+        self.mirror.clear()
+        return []
+
+    def set_state(self, selector, payload):
+        keys = self.reached(selector)
+        if keys and all(self.mirror.is_redundant(key, payload) for key in keys):
+            return
+        self.transport.set_state(selector, payload)
+        for key in keys:
+            self.mirror.apply_state(key, payload)
+
+    def set_states(self, payload):
+        self.transport.set_states(payload)
+        for state in payload['states']:
+            merged = dict(payload.get('defaults', {}), **state)
+            del merged['selector']
+            for key in self.reached(state['selector']):
+                self.mirror.apply_state(key, merged)
+
+    def toggle_power(self, selector):
+        self.transport.toggle_power(selector)
+        self.mirror.toggle(self.reached(selector))
+
+    def cycle(self, selector, payload):
+        self.transport.cycle(selector, payload)
+        self.invalidate(selector)  # which state the lights cycled to is decided server side
+
+    def get_status(self, selector):
+        """
+        :return: Status of the first light selector reaches, like the cloud API's.
+        """
+        keys = self.expand(selector)
+        if len(keys) == 1 and keys[0].startswith('id:'):
+            return self.mirror.get(keys[0]) or self.reconcile(selector)
+        return self.get_statuses(selector)[0]
+
+    def get_statuses(self, selector):
+        """
+        :return: Statuses of the lights selector reaches, from the mirror where trusted and one call for the rest.
+        """
+        selectors = self.expand(selector)
+        statuses = {key: self.mirror.get(key) for key in selectors}
+        stale = [key for key, status in statuses.items() if status is None]
+        if stale:
+            if any(not key.startswith('id:') for key in stale):
+                stale = [selector]  # can't tell which lights a raw group or label reaches, ask for all of them
+            for status in self.transport.get_statuses(','.join(stale)):
+                self.mirror.seed(f"id:{status['id']}", status)
+                statuses[f"id:{status['id']}"] = status
+        return [status for status in statuses.values() if status is not None]
+
+    def post_effect(self, selector, effect, payload):
+        self.transport.post_effect(selector, effect, payload)
+        for key in self.reached(selector):
+            self.mirror.apply_effect(key, effect, payload)
+
+    def activate_scene(self, selector, payload):
+        self.transport.activate_scene(selector, payload)
+        self.mirror.clear()  # a cloud scene can reach any light
+
+    def invalidate(self, selector):
+        """
+        Drops the mirrored state of the lights selector reaches, e.g. after a change failed to reach them.
+        """
+        for key in self.reached(selector):
+            self.mirror.invalidate(key)
+
+    def reconcile(self, selector):
+        """
+        Refreshes the entries of the lights selector reaches from the lights.
+
+        :return: Status of the first of them.
+        """
+        statuses = self.transport.get_statuses(selector)
+        for status in statuses:
+            self.mirror.seed(f"id:{status['id']}", status)
+        return statuses[0]
+
+    def start_polling(self, interval):
+        """
+        Reconciles every known selector every interval seconds in a background thread.
+        """
+        def poll():
+            while True:
+                time.sleep(interval)
+                for selector in self.mirror.selectors():  # single lights, see reached
+                    try:
+                        self.reconcile(selector)
+                    except Exception as e:
+                        logger.warning('Reconciling %s failed: %s', selector, e)
+
+        threading.Thread(target=poll, name='light-state-poll', daemon=True).start()
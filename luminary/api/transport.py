@@ -0,0 +1,328 @@
+"""
+Transports carry out lifx and lifx_effects calls. They all take cloud API style selectors and payloads,
+so callers don't need to know whether a light is reached through api.lifx.com or directly over the LAN.
+"""
+import json
+import logging
+import threading
+
+from luminary.api import colors, lifx_lan
+from luminary.api.http_client import http_error
+
+logger = logging.getLogger(__name__)
+
+
+class TransportError(Exception):
+    pass
+
+
+class UnconfirmedPower(TransportError):
+    def __init__(self, power, error):
+        """
+        A toggle's SetPower went out but wasn't acknowledged, so it may or may not have been applied.
+
+        :param power: 'on' or 'off', the power the toggle was setting.
+        :param error: What went wrong.
+        """
+        super().__init__(f"Setting power {power} went unconfirmed: {error}")
+        self.power = power
+
+
+class CloudTransport:
+    def __init__(self, client):
+        """
+        https://api.developer.lifx.com/docs
+
+        :param client: HttpClient for https://api.lifx.com/v1
+        """
+        self.client = client
+
+    def set_state(self, selector, payload):
+        response = self.client.put(f"lights/{selector}/state", payload)
+        if not response.ok:
+            raise http_error(response)
+
+    def set_states(self, payload):
+        response = self.client.put('lights/states', payload)
+        if not response.ok:
+            raise http_error(response)
+
+    def toggle_power(self, selector):
+        response = self.client.post(f"lights/{selector}/toggle")
+        if not response.ok:
+            raise http_error(response)
+
+    def cycle(self, selector, payload):
+        response = self.client.post(f"lights/{selector}/cycle", payload)
+        if not response.ok:
+            raise http_error(response)
+
+    def get_status(self, selector):
+        return self.get_statuses(selector)[0]
+
+    def get_statuses(self, selector):
+        response = self.client.get(f"lights/{selector}")
+        if response.ok:
+            return json.loads(response.content)
+        else:
+            raise http_error(response)
+
+    def activate_scene(self, selector, payload):
+        response = self.client.put(f"scenes/{selector}/activate", payload)
+        if not response.ok:
+            raise http_error(response)
+
+    def post_effect(self, selector, effect, payload):
+        response = self.client.post(f"lights/{selector}/effects/{effect}", payload)
+        if not response.ok:
+            raise http_error(response)
+
+
+class LanTransport:
+    WAVEFORMS = {
+        'pulse': lifx_lan.PULSE,
+        'breathe': lifx_lan.SINE,
+    }
+
+    def __init__(self, lights, fetch_color):
+        """
+        Talks to bulbs directly over the LIFX LAN protocol. Only id: selectors of known lights (comma-joined ones for
+        set_state, set_states and get_statuses), set_state, set_states, toggle_power, get_status(es) and the
+        pulse/breathe waveforms are supported; anything else raises TransportError.
+
+        :param lights: Dict of light id (MAC hex string) to lifx_lan.LanLight.
+        :param fetch_color: Looks up color strings that can't be parsed locally, see colors.resolve.
+        """
+        self.lights = lights
+        self.fetch_color = fetch_color
+
+    def light(self, selector):
+        kind, _, light_id = selector.partition(':')
+        if kind != 'id' or light_id.lower() not in self.lights:
+            raise TransportError(f"{selector} is not a known LAN light")
+        return self.lights[light_id.lower()]
+
+    def hsbk(self, light, color=None, brightness=None):
+        """
+        :return: Dict of HSBK values from color string and brightness, or None if neither is given.
+                 Components not given are filled in from the light's current state.
+        """
+        if color is None and brightness is None:
+            return None
+        hsbk = dict(colors.resolve(color, self.fetch_color)) if color is not None else dict.fromkeys(colors.RANGES)
+        if brightness is not None:
+            hsbk['brightness'] = brightness
+        if None in hsbk.values():
+            current = light.get_state()
+            hsbk = {key: current[key] if value is None else value for key, value in hsbk.items()}
+        return hsbk
+
+    def set_state(self, selector, payload):
+        duration = payload.get('duration', 1.0)
+        for light in [self.light(part) for part in selector.split(',')]:
+            hsbk = self.hsbk(light, payload.get('color'), payload.get('brightness'))
+            if hsbk is not None:
+                light.set_color(hsbk['hue'], hsbk['saturation'], hsbk['brightness'], hsbk['kelvin'], duration)
+            if 'power' in payload:
+                light.set_power(payload['power'] == 'on', duration)
+
+    def set_states(self, payload):
+        states = [(state['selector'], dict(payload.get('defaults', {}), **state)) for state in payload['states']]
+        for selector, _ in states:
+            for part in selector.split(','):
+                self.light(part)  # all or nothing, so a fallback doesn't resend to lights already set
+        for selector, state in states:
+            del state['selector']
+            self.set_state(selector, state)
+
+    def toggle_power(self, selector):
+        """
+        :raise UnconfirmedPower: If setting the power fails after it was read, as the light may have applied it.
+        """
+        light = self.light(selector)
+        power = 'off' if light.get_power() else 'on'
+        try:
+            light.set_power(power == 'on', 1.0)
+        except (lifx_lan.LanError, OSError) as e:
+            raise UnconfirmedPower(power, e) from e
+
+    def cycle(self, selector, payload):
+        raise TransportError('cycle is only supported by the cloud API')
+
+    def get_status(self, selector):
+        light = self.light(selector)
+        state = light.get_state()
+        return {
+            'id': light.mac,
+            'label': state['label'],
+            'connected': True,
+            'power': 'on' if state['power'] else 'off',
+            'color': {
+                'hue': state['hue'],
+                'saturation': state['saturation'],
+                'kelvin': state['kelvin'],
+            },
+            'brightness': state['brightness'],
+        }
+
+    def get_statuses(self, selector):
+        return [self.get_status(part) for part in selector.split(',')]
+
+    def activate_scene(self, selector, payload):
+        raise TransportError('scenes are only supported by the cloud API')
+
+    def post_effect(self, selector, effect, payload):
+        if effect not in self.WAVEFORMS:
+            raise TransportError(f"{effect} effect is only supported by the cloud API")
+        light = self.light(selector)
+
+        if payload.get('power_on', True):
+            light.set_power(True)
+        if 'from_color' in payload:
+            start = self.hsbk(light, payload['from_color'])
+            light.set_color(start['hue'], start['saturation'], start['brightness'], start['kelvin'])
+
+        light.set_waveform(self.WAVEFORMS[effect], colors.resolve(payload['color'], self.fetch_color),
+                           payload.get('period', 1.0), payload.get('cycles', 1.0),
+                           transient=not payload.get('persist', False), skew_ratio=payload.get('peak', 0.5))
+
+
+class FallbackTransport:
+    def __init__(self, primary, fallback):
+        """
+        Uses primary transport, retrying calls it can't handle or that fail to reach the light on fallback.
+
+        :param primary: Preferred transport, e.g. LanTransport.
+        :param fallback: Transport to fall back to, e.g. CloudTransport.
+        """
+        self.primary = primary
+        self.fallback = fallback
+
+    def call(self, method, *args):
+        try:
+            return getattr(self.primary, method)(*args)
+        except (TransportError, lifx_lan.LanError, OSError) as e:
+            logger.info('%s failed over %s, falling back: %s', method, type(self.primary).__name__, e)
+            return getattr(self.fallback, method)(*args)
+
+    def set_state(self, selector, payload):
+        return self.call('set_state', selector, payload)
+
+    def set_states(self, payload):
+        return self.call('set_states', payload)
+
+    def toggle_power(self, selector):
+        try:
+            return self.primary.toggle_power(selector)
+        except UnconfirmedPower as e:
+            # toggling again could undo a toggle the light did apply, so set the power it was read to go to
+            logger.info('toggle_power failed over %s, falling back: %s', type(self.primary).__name__, e)
+            return self.fallback.set_state(selector, {'power': e.power, 'duration': 1.0})
+        except (TransportError, lifx_lan.LanError, OSError) as e:
+            logger.info('toggle_power failed over %s, falling back: %s', type(self.primary).__name__, e)
+            return self.fallback.toggle_power(selector)
+
+    def cycle(self, selector, payload):
+        return self.call('cycle', selector, payload)
+
+    def get_status(self, selector):
+        return self.call('get_status', selector)
+
+    def get_statuses(self, selector):
+        return self.call('get_statuses', selector)
+
+    def activate_scene(self, selector, payload):
+        return self.call('activate_scene', selector, payload)
+
+    def post_effect(self, selector, effect, payload):
+        return self.call('post_effect', selector, effect, payload)
+
+
+class CoalescingTransport:
+    def __init__(self, transport, window, timer=threading.Timer, on_error=None):
+        """
+        Sends a set_state right away, then for `window` seconds merges later payloads for the same selector into one
+        request sent when the window closes, e.g. several rapid turn_on(brightness=...) calls go out as the first
+        and the last. Any other call for the selector sends its pending state first so order is kept.
+        Errors from delayed requests are logged since the caller has already moved on.
+
+        :param transport: Transport requests are sent on.
+        :param window: Seconds after a set_state to hold later payloads for.
+        :param timer: threading.Timer compatible factory; lets a simulated clock drive the flushes.
+        :param on_error: Called with the selector of a delayed set_state that failed, e.g. to drop the state a
+                         MirroredTransport already applied for it.
+        """
+        self.transport = transport
+        self.window = window
+        self.timer = timer
+        self.on_error = on_error
+        self.pending = {}  # selector -> [payload merged while its window is open, timer closing it]
+        self.lock = threading.Lock()
+
+    def flush(self, selector=None):
+        """
+        Sends pending state for selector now, or for every selector if None, and closes their windows.
+        """
+        with self.lock:
+            selectors = list(self.pending) if selector is None else [selector]
+            payloads = [(key, self.pending.pop(key)) for key in selectors if key in self.pending]
+        for key, (payload, timer) in payloads:
+            if timer is not None:
+                timer.cancel()
+            if not payload:
+                continue  # nothing came in after the set_state that opened the window
+            try:
+                self.transport.set_state(key, payload)
+            except Exception:
+                logger.exception('Coalesced set_state for %s failed', key)
+                if self.on_error is not None:
+                    self.on_error(key)
+
+    def close(self, selector, window):
+        with self.lock:
+            if self.pending.get(selector) is not window:
+                return  # already flushed
+        self.flush(selector)
+
+    def set_state(self, selector, payload):
+        with self.lock:
+            window = self.pending.get(selector)
+            if window is not None:
+                window[0].update(payload)
+                return
+            window = self.pending[selector] = [{}, None]
+        try:
+            self.transport.set_state(selector, payload)
+        finally:
+            timer = self.timer(self.window, self.close, args=(selector, window))
+            with self.lock:
+                window[1] = timer
+            timer.start()
+
+    def set_states(self, payload):
+        self.flush()
+        return self.transport.set_states(payload)
+
+    def toggle_power(self, selector):
+        self.flush(selector)
+        return self.transport.toggle_power(selector)
+
+    def cycle(self, selector, payload):
+        self.flush(selector)
+        return self.transport.cycle(selector, payload)
+
+    def get_status(self, selector):
+        self.flush(selector)
+        return self.transport.get_status(selector)
+
+    def get_statuses(self, selector):
+        self.flush()
+        return self.transport.get_statuses(selector)
+
+    def activate_scene(self, selector, payload):
+        self.flush()
+        return self.transport.activate_scene(selector, payload)
+
+    def post_effect(self, selector, effect, payload):
+        self.flush(selector)
+        return self.transport.post_effect(selector, effect, payload)
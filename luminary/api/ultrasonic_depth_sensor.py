@@ -1,37 +1,141 @@
+import threading
 import time  # Import time library
+from collections import namedtuple
 
-import RPi.GPIO as GPIO  # Import GPIO library
-from luminary.util import project
+from luminary.util import metrics, project
 
+Reading = namedtuple('Reading', ['time', 'distance'])
 
-def setup_pins():
+
+class Echo:
+    def __init__(self):
+        """
+        Times the sensor's echo pulse from GPIO edge interrupts instead of busy-waiting on the pin.
+        """
+        self.start = None
+        self.duration = None
+        self.received = threading.Event()
+
+    def on_edge(self, channel):
+        now = time.perf_counter()  # timestamp first, before anything else adds delay
+        if gpio().input(channel):
+            self.start = now
+        elif self.start is not None:
+            self.duration = now - self.start
+            self.received.set()
+
+    def clear(self):
+        self.start = None
+        self.duration = None
+        self.received.clear()
+
+    def wait(self, timeout):
+        """
+        :return: Echo pulse duration in seconds, or None if it didn't end within timeout.
+        """
+        if self.received.wait(timeout):
+            return self.duration
+        return None
+
+
+def setup_pins(settle=2):
+    """
+    :param settle: Seconds to let the sensor settle after pulling TRIG low.
+    """
+    GPIO = gpio()
+    trig, echo_pin = pins()
     GPIO.setmode(GPIO.BCM)
 
-    GPIO.setup(TRIG, GPIO.OUT)
-    GPIO.setup(ECHO, GPIO.IN)
+    GPIO.setup(trig, GPIO.OUT)
+    GPIO.setup(echo_pin, GPIO.IN)
+    GPIO.add_event_detect(echo_pin, GPIO.BOTH, callback=echo.on_edge)
 
+    GPIO.output(trig, False)
+    time.sleep(settle)
 
-def detect():
-    GPIO.output(TRIG, False)
-    time.sleep(2)
 
-    GPIO.output(TRIG, True)
+def measure(timeout=None):
+    """
+    Sends one ping and waits for its echo.
+
+    :param timeout: Seconds to wait for the echo. Defaults to `echo_timeout` in raspberry-pi.ini.
+    :return: Distance in cm, or None if the echo was missed.
+    """
+    GPIO = gpio()
+    trig, _ = pins()
+    echo.clear()
+    GPIO.output(trig, True)
     time.sleep(0.00001)
-    GPIO.output(TRIG, False)
+    GPIO.output(trig, False)
+
+    if timeout is None:
+        timeout = settings().getfloat('echo_timeout', 0.06)
+    pulse_duration = echo.wait(timeout)
+    if pulse_duration is None:
+        if metrics.enabled:
+            echo_missed.inc()
+        return None
+    if metrics.enabled:
+        echo_pulse.record(pulse_duration)
+    return pulse_duration * 17150  # Multiply pulse duration by 17150 to get distance
+
+
+def distances(rate=None):
+    """
+    Stream of readings taken at a steady rate. Sleeps between pings so idle CPU use is near zero.
+
+    :param rate: Readings per second. Defaults to `sample_rate` in raspberry-pi.ini.
+    :return: Generator of Reading(time, distance), time from time.monotonic() and distance in cm or None if missed.
+    """
+    interval = 1 / (rate or settings().getfloat('sample_rate', 10.0))
+    next_reading = time.monotonic()
+    while True:
+        taken = time.monotonic()
+        if metrics.enabled:
+            sensor_jitter.record(abs(taken - next_reading))
+        yield Reading(taken, measure())
+
+        next_reading += interval
+        delay = next_reading - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_reading = time.monotonic()  # consumer fell behind; don't burst to catch up
+
+
+def detect():
+    distance = measure()
+    return distance is not None and distance < TRIGGER_DISTANCE
+
+
+def settings():
+    return project.settings('raspberry-pi.ini')
+
 
-    while GPIO.input(ECHO) == 0:
-        pulse_start = time.time()
+@project.lazy
+def gpio():
+    """
+    :return: GPIO module, imported on first use: RPi.GPIO, or fake_gpio if `gpio = fake` in raspberry-pi.ini.
+    """
+    if settings().get('gpio') == 'fake':
+        from luminary.api import fake_gpio
+        return fake_gpio
+    import RPi.GPIO
+    return RPi.GPIO
 
-    while GPIO.input(ECHO) == 1:
-        pulse_end = time.time()
 
-    pulse_duration = pulse_end - pulse_start
+@project.lazy
+def pins():
+    """
+    :return: Tuple of the TRIG and ECHO pin numbers.
+    """
+    return int(project.required('raspberry-pi.ini', 'uds_trig')), int(project.required('raspberry-pi.ini', 'uds_echo'))
 
-    distance = pulse_duration * 17150  # Multiply pulse duration by 17150 to get distance
 
-    return distance < 6
+TRIGGER_DISTANCE = 6  # cm
 
+echo_pulse = metrics.histogram('sensor_echo_pulse_seconds')
+echo_missed = metrics.counter('sensor_echo_missed_total')
+sensor_jitter = metrics.histogram('sensor_loop_jitter_seconds')  # how far each ping is from its schedule
 
-config = project.load_config('raspberry-pi.ini')
-TRIG = int(config['DEFAULT']['uds_trig'])
-ECHO = int(config['DEFAULT']['uds_echo'])
+echo = Echo()
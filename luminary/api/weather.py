@@ -1,8 +1,15 @@
+import email.utils
+import functools
 import json
+import logging
+import threading
+import time
 
-import requests
+from luminary.api.http_client import HttpClient, http_error
+from luminary.util import project, weather_rules
+from luminary.util.cache import DiskCache
 
-from luminary.util import project
+logger = logging.getLogger(__name__)
 
 
 def get_forecast():
@@ -12,15 +19,123 @@ def get_forecast():
 
     :return: Forecast dictionary
     """
-    response = requests.get(f"https://api.weather.gov/points/{X},{Y}")
-    data = json.loads(response.content)
-    periods = json.loads(requests.get(data['properties']['forecast']).content)['properties']['periods']
+    periods = get_forecast_document()['properties']['periods']
     if periods[0]['isDaytime']:
         return periods[0]
     else:
         return periods[1]
 
 
+def get_forecast_url(hourly=False):
+    """
+    Looks up the forecast URL for the configured location. It never changes, so it's kept on disk for good.
+
+    :param hourly: True for the hourly forecast's URL, else the 12 hour periods forecast's.
+    :return: Forecast URL.
+    """
+    location = '{},{}'.format(*coordinates())
+    key = f"{location} hourly" if hourly else location
+    url = get_points_cache().get(key)
+    if url is None:
+        response = get_client().get(f"points/{location}")
+        if not response.ok:
+            raise http_error(response)
+        properties = json.loads(response.content)['properties']
+        get_points_cache().set(location, properties['forecast'])
+        get_points_cache().set(f"{location} hourly", properties['forecastHourly'])
+        url = properties['forecastHourly' if hourly else 'forecast']
+    return url
+
+
+def get_forecast_document():
+    """
+    Gets the forecast, cached on disk for as long as weather.gov's Cache-Control/Expires headers allow and then
+    revalidated with a conditional request. If `max_stale` is set in weather.ini, a cached forecast up to that many
+    seconds past expiry is returned right away while it's revalidated in the background.
+
+    :return: Forecast JSON document.
+    """
+    url = get_forecast_url()
+    entry = get_forecast_cache().get(url)
+    if entry is not None:
+        staleness = time.time() - entry['expires']
+        if staleness < 0:
+            return entry['body']
+        if staleness < project.settings('weather.ini').getfloat('max_stale', 0):
+            revalidate_in_background(url, entry)
+            return entry['body']
+    return revalidate(url, entry)
+
+
+def revalidate(url, entry=None):
+    """
+    Fetches forecast, sending the cached entry's validators so an unchanged forecast costs only a 304.
+
+    :param url: Forecast URL.
+    :param entry: Cached entry, if any.
+    :return: Forecast JSON document.
+    """
+    headers = {}
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = get_client().get(url, headers=headers)
+    if response.status_code == 304 and entry is not None:
+        entry['expires'] = expires_at(response.headers)
+    elif response.ok:
+        entry = {
+            'body': json.loads(response.content),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'expires': expires_at(response.headers),
+        }
+    else:
+        raise http_error(response)
+
+    get_forecast_cache().set(url, entry)
+    return entry['body']
+
+
+def revalidate_in_background(url, entry):
+    if not revalidating.acquire(blocking=False):
+        return  # already on it
+
+    def run():
+        try:
+            revalidate(url, entry)
+        except Exception as e:
+            logger.warning('Revalidating forecast failed: %s', e)
+        finally:
+            revalidating.release()
+
+    threading.Thread(target=run, name='forecast-revalidate', daemon=True).start()
+
+
+def expires_at(headers):
+    """
+    :return: Epoch seconds the response is fresh until according to Cache-Control max-age or Expires;
+             now if neither says.
+    """
+    now = time.time()
+    cache_control = headers.get('Cache-Control', '')
+    for directive in cache_control.split(','):
+        name, _, value = directive.strip().partition('=')
+        if name.lower() in ('no-cache', 'no-store'):
+            return now
+        if name.lower() == 'max-age' and value.isdigit():
+            age = int(headers['Age']) if headers.get('Age', '').isdigit() else 0
+            return now + int(value) - age
+    if 'Expires' in headers:
+        try:
+            return email.utils.parsedate_to_datetime(headers['Expires']).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return now
+
+
 def get_temperature(forecast=None, degrees_fahrenheit=True):
     """
     Get temperature degrees.
@@ -52,46 +167,81 @@ def encode_forecast(forecast=None):
     """
     if forecast is None:
         forecast = get_forecast()
-    short_forecast = forecast['shortForecast'].lower()
 
     # oddly the only way to get rain chance is from the icon
-    simple_forecast = forecast['icon'].replace('?size=medium', '').split('/')
-    simple_forecast = simple_forecast[simple_forecast.index('day') + 1:]
-
-    def simple_forecast_contains(keys):
-        if type(keys) is list:
-            return any(key in simple_forecast for key in keys)
-        else:
-            return keys in simple_forecast
-
-    weather = {
-        'precipitation_chance': 0,
+    conditions, precipitation_chance = parse_icon(forecast['icon'])
+    return {
+        'precipitation_chance': precipitation_chance,
         'temperature': get_temperature(forecast),
-        'thunderstorms': False,
-        'snow': False,
-        'cloud_level': 0,  # Sunny
+        'thunderstorms': 'thunderstorms' in conditions,
+        'snow': 'snow' in conditions,
+        'cloud_level': weather_rules.get_rules().cloud_level(forecast['shortForecast']),
     }
 
-    if simple_forecast_contains(['rain', 'tsra', 'snow']):
-        weather['precipitation_chance'] = max(map(lambda x: int(x.split(',')[1]), filter(lambda y: ',' in y, simple_forecast)))
-    if simple_forecast_contains('tsra'):
-        weather['thunderstorms'] = True
-    if simple_forecast_contains('snow'):
-        weather['snow'] = True
-
-    if short_forecast != 'sunny':
-        if short_forecast == 'mostly sunny':
-            weather['cloud_level'] = 1
-        elif short_forecast == 'partly cloudy':
-            weather['cloud_level'] = 2
-        elif short_forecast == 'mostly cloudy':
-            weather['cloud_level'] = 3
-        else:
-            weather['cloud_level'] = 4
-
-    return weather
-
-
-config = project.load_config('weather.ini')
-X = config['DEFAULT']['loc_x']
-Y = config['DEFAULT']['loc_y']
+
+@functools.lru_cache(maxsize=256)
+def parse_icon(icon):
+    """
+    Reads conditions from a forecast icon URL in one pass over its path, e.g.
+    https://api.weather.gov/icons/land/day/tsra_hi,40/rain,60?size=medium has thunderstorms and a 60% precipitation
+    chance. Icons show one or two conditions, each an icon code with an optional chance. Forecasts reuse a few dozen
+    icons, so results are kept.
+
+    :param icon: Icon URL.
+    :return: Frozen set of conditions out of precipitation, thunderstorms and snow,
+             and the highest precipitation chance.
+    """
+    conditions = frozenset()
+    precipitation_chance = 0
+    path = icon.partition('?')[0]
+    for segment in path[path.index('/icons/') + 7:].split('/')[2:]:  # past land/day
+        code, _, chance = segment.partition(',')
+        found = icon_conditions(code)
+        conditions |= found
+        if chance and 'precipitation' in found:
+            precipitation_chance = max(precipitation_chance, int(chance))
+    return conditions, precipitation_chance
+
+
+def icon_conditions(code):
+    """
+    :param code: Icon code, e.g. rain_showers_hi.
+    :return: Set of conditions the code stands for.
+    """
+    words = set(code.split('_'))
+    conditions = set()
+    if words & PRECIPITATION_WORDS:
+        conditions.add('precipitation')
+    if 'tsra' in words:
+        conditions.add('thunderstorms')
+    if words & SNOW_WORDS:
+        conditions.add('snow')
+    return conditions
+
+
+@project.lazy
+def coordinates():
+    """
+    :return: Configured location's latitude and longitude strings, `loc_x` and `loc_y` in weather.ini.
+    """
+    return project.required('weather.ini', 'loc_x'), project.required('weather.ini', 'loc_y')
+
+
+@project.lazy
+def get_client():
+    return HttpClient(project.settings('weather.ini').get('api_url', "https://api.weather.gov"))
+
+
+@project.lazy
+def get_points_cache():
+    return DiskCache('weather_points.json')
+
+
+@project.lazy
+def get_forecast_cache():
+    return DiskCache('forecast.json')
+
+
+revalidating = threading.Lock()
+PRECIPITATION_WORDS = {'rain', 'tsra', 'snow', 'sleet', 'fzra', 'blizzard'}
+SNOW_WORDS = {'snow', 'blizzard'}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Thin client for the luminary daemon, e.g. for cron jobs and shell scripts:
+
+    python -m luminary.ctl turn_on brightness=0.5
+    python -m luminary.ctl run_routine name=wakeup
+
+Arguments are key=value pairs; values are parsed as JSON where possible, otherwise passed as strings.
+Only imports the standard library so it starts fast.
+"""
+import json
+import socket
+import sys
+
+from luminary.util import project
+
+
+def socket_path():
+    return f"{project.config_dir()}/luminary.sock"
+
+
+def call(method, params=None, path=None, timeout=30.0):
+    """
+    Calls method on the daemon.
+
+    :param method: Method name, e.g. turn_on.
+    :param params: Dict of keyword arguments.
+    :param path: Socket path. Defaults to luminary.sock in the config dir.
+    :param timeout: Seconds to wait for the daemon.
+    :return: Method's result.
+    """
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path or socket_path())
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as reader:
+            response = json.loads(reader.readline())
+
+    if 'error' in response:
+        raise RuntimeError(response['error']['message'])
+    return response['result']
+
+
+def parse_value(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def main(args):
+    if not args:
+        print(__doc__)
+        return 1
+    params = {}
+    for arg in args[1:]:
+        key, _, value = arg.partition('=')
+        params[key] = parse_value(value)
+    result = call(args[0], params)
+    if result is not None:
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Resident luminary process. Keeps the HTTP connections, caches, light state mirror and optionally the light switch
+sensor loop warm, and takes commands as newline delimited JSON-RPC 2.0 over a Unix socket (see luminary.ctl).
+Also runs the jobs in schedule.ini, in place of cron.
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import socketserver
+import threading
+
+from luminary import ctl, wakeup
+from luminary.api import lifx, lifx_effects, scenes, weather
+from luminary.util import metrics, project, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def plan_ambient():
+    """
+    Plans the day's ambient weather light on the daemon's schedule, see luminary.ambient.
+    """
+    from luminary import ambient  # pulls in NumPy
+    ambient.schedule_day(schedule)
+
+
+routines = {
+    'wakeup': wakeup.wakeup,
+    'report_weather': wakeup.report_weather,
+    'prefetch': wakeup.prefetch,
+    'ambient': plan_ambient,
+}
+
+
+def run_routine(name):
+    """
+    Starts routine in the background so the caller doesn't wait out its sleeps.
+    """
+    if name not in routines:
+        raise ValueError(f"Unknown routine {name}, expected one of {', '.join(routines)}")
+    threading.Thread(target=routines[name], name=name, daemon=True).start()
+    return name
+
+
+methods = {
+    'ping': lambda: 'pong',
+    'turn_on': lifx.turn_on,
+    'turn_off': lifx.turn_off,
+    'toggle_power': lifx.toggle_power,
+    'blink_power': lifx.blink_power,
+    'set_state': lifx.set_state,
+    'set_states': lifx.set_states,
+    'cycle': lifx.cycle,
+    'get_status': lifx.get_status,
+    'breathe': lifx_effects.breathe,
+    'pulse': lifx_effects.pulse,
+    'effects_off': lifx_effects.effects_off,
+    'list_scenes': lambda: [[scene['name'], scene['uuid']] for scene in scenes.list_scenes()],
+    'activate_scene': lambda name, duration=1.0: scenes.activate_scene(scenes.find_scene(name), duration),
+    'snapshot': lambda name, selector=None: sorted(scenes.snapshot(name, selector).states),
+    'activate_snapshot': scenes.activate_snapshot,
+    'run_routine': run_routine,
+    'jobs': lambda: [[name, at.isoformat()] for name, at in schedule.upcoming()],
+}
+
+WEATHER_ROUTINES = ('wakeup', 'report_weather')
+
+
+def command(line):
+    """
+    Parses a job's `run` line, a routine or method name followed by key=value arguments like luminary.ctl takes,
+    e.g. `wakeup` or `turn_on brightness=0.5`.
+
+    :return: Tuple of routine or method name and a function running it.
+    """
+    name, *args = line.split()
+    func = routines.get(name) or methods.get(name)
+    if func is None:
+        raise ValueError(f"Unknown routine or method {name}")
+    params = {}
+    for arg in args:
+        key, _, value = arg.partition('=')
+        params[key] = ctl.parse_value(value)
+    return name, functools.partial(func, **params)
+
+
+def warm_up(name):
+    """
+    Runs ahead of a scheduled job so it starts on time: opens the connection to the light, refreshing its
+    mirrored state on the way, and prefetches the forecast for weather routines.
+    """
+    lifx.get_transport().reconcile(lifx.default_selector(None))
+    if name in WEATHER_ROUTINES:
+        wakeup.prefetch()
+
+
+def load_jobs(config):
+    """
+    Jobs from schedule.ini, one section per job:
+
+        [wakeup]
+        cron = 30 6 * * 1-5
+        run = wakeup
+
+        [evening]
+        sun = sunset-30
+        run = turn_on brightness=0.6 duration=600
+        warm_up = 10
+
+    `cron` is a 5 field cron expression, `sun` sunrise or sunset plus or minus minutes at weather.ini's location.
+    `warm_up` is the seconds ahead of the job to warm up connections and data (default 30, 0 disables).
+
+    :return: List of scheduler.Job
+    """
+    jobs = []
+    for name in config.sections():
+        section = config[name]
+        if 'cron' in section:
+            trigger = scheduler.Cron(section['cron'])
+        elif 'sun' in section:
+            trigger = scheduler.Sun(section['sun'], *map(float, weather.coordinates()))
+        else:
+            raise ValueError(f"Job {name} in schedule.ini needs a cron or sun trigger")
+        routine, func = command(section['run'])
+        lead = section.getfloat('warm_up', 30)
+        jobs.append(scheduler.Job(name, trigger, func, functools.partial(warm_up, routine) if lead else None, lead))
+    return jobs
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            self.wfile.write(json.dumps(self.respond(line)).encode() + b'\n')
+
+    @staticmethod
+    def respond(line):
+        """
+        :param line: JSON-RPC 2.0 request.
+        :return: JSON-RPC 2.0 response, an error object if the request is malformed, names no known method or fails.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': f"Parse error: {e}"}}
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': "Invalid request"}}
+
+        request_id = request.get('id')
+        method = methods.get(request['method'])
+        if method is None:
+            return {'jsonrpc': '2.0', 'id': request_id,
+                    'error': {'code': -32601, 'message': f"Unknown method {request['method']!r}"}}
+        try:
+            params = request.get('params') or {}
+            result = method(*params) if isinstance(params, list) else method(**params)
+            return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        except Exception as e:
+            logger.exception('Request failed')
+            return {'jsonrpc': '2.0', 'id': request_id,
+                    'error': {'code': -32000, 'message': f"{type(e).__name__}: {e}"}}
+
+
+def serve(path=None, light_switch=False):
+    """
+    Serves commands until killed.
+
+    :param path: Socket path. Defaults to luminary.sock in the config dir.
+    :param light_switch: Also run the depth sensor light switch.
+    """
+    path = path or ctl.socket_path()
+    if os.path.exists(path):
+        os.remove(path)  # left over from a previous run
+
+    if light_switch:
+        from luminary import light_switch as switch  # needs the sensor's GPIO library
+        threading.Thread(target=switch.listen, name='light-switch', daemon=True).start()
+
+    for job in load_jobs(project.load_config('schedule.ini')):
+        schedule.add(job)
+    schedule.start()  # also runs jobs routines add later, e.g. ambient
+
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    logger.info('Listening on %s', path)
+    try:
+        server.serve_forever()
+    finally:
+        schedule.stop()
+        server.server_close()
+        os.remove(path)
+
+
+schedule = scheduler.Scheduler()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--socket', help='Socket path, defaults to luminary.sock in the config dir.')
+    parser.add_argument('--light-switch', action='store_true', help='Also run the depth sensor light switch.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    metrics.start()
+    serve(args.socket, args.light_switch)
@@ -1,16 +1,110 @@
 #!/usr/bin/env python
+import concurrent.futures
+import logging
+import threading
+import time
 
 from luminary.api import lifx
 from luminary.api import ultrasonic_depth_sensor as uds
+from luminary.util import gestures, metrics
 
+logger = logging.getLogger(__name__)
 
-def listen():
-    while True:
-        triggered = uds.detect()
-        if triggered:
-            lifx.toggle_power()
 
+def dim():
+    lifx.turn_on(brightness=uds.settings().getfloat('dim_brightness', 0.2))
 
-if __name__ == '__main__':
+
+def scene():
+    lifx.turn_on(color=uds.settings().get('scene_color', 'kelvin:2700 brightness:0.5'))
+
+
+actions = {
+    gestures.HOVER: lifx.toggle_power,
+    gestures.APPROACH: dim,
+    gestures.DOUBLE_WAVE: scene,
+}
+ack_latency = {gesture: metrics.histogram('gesture_to_ack_seconds', gesture=gesture) for gesture in actions}
+
+
+def listen(readings=None):
+    """
+    Hover a hand over the sensor to toggle the light, slowly bring it closer to dim, or wave twice for a scene.
+
+    :param readings: Iterable of uds.Reading, defaults to the sensor's endless stream: from the sampler process
+                     with `sampler = process` in raspberry-pi.ini, else taken in this thread. Returns once it's
+                     exhausted and the actions it triggered are done.
+    """
+    if readings is None:
+        readings = sensor_readings()
+    classifier = gestures.GestureClassifier(near=uds.TRIGGER_DISTANCE)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='light-switch') as executor:
+        pending = PendingActions(executor)
+        for reading in readings:
+            gesture = classifier.update(reading.time, reading.distance)
+            if gesture is not None:
+                pending.submit(gesture, reading.time)
+
+
+class PendingActions:
+    def __init__(self, executor):
+        """
+        Gestures waiting for the action before them to finish, at most one per gesture, so while the light is slow
+        or out of reach they don't pile up into a string of stale actions replayed once it's back. A repeated
+        gesture replaces the waiting one, and a second hover cancels a waiting toggle, as two make no change.
+
+        :param executor: Single worker executor the actions run on, in order.
+        """
+        self.executor = executor
+        self.waiting = {}  # gesture -> triggered, in the order they run
+        self.lock = threading.Lock()
+
+    def submit(self, gesture, triggered=None):
+        with self.lock:
+            if gesture in self.waiting:
+                del self.waiting[gesture]
+                if gesture == gestures.HOVER:
+                    return
+            self.waiting[gesture] = triggered
+        self.executor.submit(self.run_next)
+
+    def run_next(self):
+        with self.lock:
+            if not self.waiting:
+                return  # cancelled or replaced
+            gesture = next(iter(self.waiting))
+            triggered = self.waiting.pop(gesture)
+        act(gesture, triggered)
+
+
+def sensor_readings():
+    if uds.settings().get('sampler', 'thread') == 'process':
+        from luminary.api import sensor_sampler
+
+        _, ring = sensor_sampler.start()
+        return ring.readings()
     uds.setup_pins()
+    return uds.distances()
+
+
+def act(gesture, triggered=None):
+    """
+    Runs gesture's action off the sensor loop, in order, so a slow or failing request never stalls or ends it.
+    With `command_queue` on in lifx.ini, failed actions are retried once the light can be reached again.
+
+    :param triggered: time.monotonic() of the reading that completed the gesture, to time how long it takes until
+                      the light (or with `command_queue` on, the queue) has accepted the action.
+    """
+    try:
+        actions[gesture]()
+    except Exception:
+        logger.exception('%s failed', gesture)
+        return
+    if metrics.enabled and triggered is not None:
+        ack_latency[gesture].record(time.monotonic() - triggered)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    metrics.start()
     listen()
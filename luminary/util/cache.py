@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from luminary.util import project
+
+
+class DiskCache:
+    def __init__(self, name, ttl=None):
+        """
+        Small JSON backed key/value cache persisted in the config dir.
+
+        :param name: File name within the config dir, e.g. colors.json
+        :param ttl: Seconds an entry stays valid. Never expires if None.
+        """
+        self.path = f"{project.config_dir()}/{name}"
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    try:
+                        with open(self.path) as f:
+                            self._entries = json.load(f)
+                    except (OSError, ValueError):
+                        self._entries = {}
+        return self._entries
+
+    def get(self, key):
+        """
+        :return: Cached value, or None if missing or expired.
+        """
+        entry = self._load().get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl is not None and time.time() - stored_at > self.ttl:
+            return None
+        return value
+
+    def set(self, key, value):
+        entries = self._load()
+        with self._lock:
+            entries[key] = [time.time(), value]
+
+            # write then rename so a crash mid-write never leaves a corrupt cache behind, to a temp file of our own
+            # as other threads' or processes' caches may be writing the same file
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, prefix=f"{os.path.basename(self.path)}.",
+                                             suffix='.tmp', delete=False) as f:
+                try:
+                    json.dump(entries, f)
+                except BaseException:
+                    os.remove(f.name)
+                    raise
+            os.replace(f.name, self.path)
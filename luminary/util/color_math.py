@@ -0,0 +1,214 @@
+"""
+Batched color math with NumPy, for client-side fades and multizone frames that need hundreds of colors at once.
+
+Colors are float arrays with a last axis of (hue, saturation, brightness, kelvin), NaN where a value isn't set,
+like None on HSBK. Everything here works on whole arrays, so there's no Python loop per color.
+"""
+import numpy as np
+
+from luminary.api import colors
+from luminary.api.lifx import HSBK
+
+HUE, SATURATION, BRIGHTNESS, KELVIN = range(4)
+
+
+def to_array(hsbks):
+    """
+    :param hsbks: List of HSBK, color strings or dicts of HSBK values.
+    :return: Array of shape (len(hsbks), 4).
+    """
+    values = []
+    for color in hsbks:
+        color = color if type(color) is HSBK else HSBK(color)
+        values.append([np.nan if value is None else value for value in color.astuple()])
+    return np.array(values, dtype=float).reshape(-1, 4)
+
+
+def to_hsbk(array):
+    """
+    :param array: Array of shape (n, 4).
+    :return: List of HSBK.
+    """
+    hsbks = []
+    for hue, saturation, brightness, kelvin in np.asarray(array, dtype=float).reshape(-1, 4).tolist():
+        hsbks.append(HSBK({
+            'hue': None if hue != hue else hue,  # NaN
+            'saturation': None if saturation != saturation else saturation,
+            'brightness': None if brightness != brightness else brightness,
+            'kelvin': None if kelvin != kelvin else int(round(kelvin)),
+        }))
+    return hsbks
+
+
+def encode(array, digits=6):
+    """
+    :param array: Array of shape (n, 4).
+    :param digits: Significant digits of hue, saturation and brightness.
+    :return: List of LIFX API color strings, in HSBK.encode's format.
+    """
+    array = np.asarray(array, dtype=float).reshape(-1, 4)
+    order = (BRIGHTNESS, HUE, SATURATION, KELVIN)
+    fields = (f"brightness:%.{digits}g", f"hue:%.{digits}g", f"saturation:%.{digits}g", 'kelvin:%d')
+    template = ' '.join(fields)
+    values = array[:, order]
+    is_set = ~np.isnan(values)
+    strings = []
+    for row, complete, row_set in zip(values.tolist(), is_set.all(axis=1).tolist(), is_set.tolist()):
+        if complete:  # the common case, one format call per color
+            strings.append(template % tuple(row))
+        else:
+            strings.append(' '.join(field % value for field, value, present in zip(fields, row, row_set) if present))
+    return strings
+
+
+def blend(start, end, t):
+    """
+    Blends between colors: hue along the shorter way round the color wheel, kelvin linearly in mireds (how
+    differently white temperatures look), saturation and brightness linearly.
+    A value set on only one side is held at that value.
+
+    :param start: Array of shape (..., 4).
+    :param end: Array broadcastable with start.
+    :param t: Position between start (0) and end (1), broadcastable with start[..., 0].
+    :return: Array of the broadcast shape.
+    """
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    start, end = np.where(np.isnan(start), end, start), np.where(np.isnan(end), start, end)
+    t = np.asarray(t, dtype=float)
+
+    arc = (end[..., HUE] - start[..., HUE] + 180) % 360 - 180
+    start_mired, end_mired = 1e6 / start[..., KELVIN], 1e6 / end[..., KELVIN]
+    return np.stack([
+        (start[..., HUE] + t * arc) % 360,
+        start[..., SATURATION] + t * (end[..., SATURATION] - start[..., SATURATION]),
+        start[..., BRIGHTNESS] + t * (end[..., BRIGHTNESS] - start[..., BRIGHTNESS]),
+        1e6 / (start_mired + t * (end_mired - start_mired)),
+    ], axis=-1)
+
+
+def interpolate(start, end, fractions):
+    """
+    :param start: Array of shape (..., 4).
+    :param end: Array broadcastable with start.
+    :param fractions: Array of shape (m,) of positions between start (0) and end (1), see blend.
+    :return: Array of shape (m, ..., 4).
+    """
+    start, end = np.broadcast_arrays(np.asarray(start, dtype=float), np.asarray(end, dtype=float))
+    t = np.asarray(fractions, dtype=float).reshape((-1,) + (1,) * (start.ndim - 1))
+    return blend(start[None], end[None], t)
+
+
+def fade(start, end, steps):
+    """
+    :param start: Start color(s), array of shape (..., 4).
+    :param end: End color(s).
+    :param steps: Number of colors, including start and end.
+    :return: Array of shape (steps, ..., 4).
+    """
+    return interpolate(start, end, np.linspace(0.0, 1.0, steps))
+
+
+def gradient(stops, count):
+    """
+    Spreads colors evenly over count positions, e.g. the zones of a multizone strip.
+
+    :param stops: Array of shape (n, 4), n >= 1.
+    :param count: Number of colors to return.
+    :return: Array of shape (count, 4), starting at the first stop and ending at the last.
+    """
+    stops = np.asarray(stops, dtype=float).reshape(-1, 4)
+    if len(stops) == 1:
+        return np.repeat(stops, count, axis=0)
+    positions = np.linspace(0.0, len(stops) - 1, count)
+    index = np.minimum(positions.astype(int), len(stops) - 2)
+    return blend(stops[index], stops[index + 1], positions - index)
+
+
+def kelvin_to_rgb(kelvin):
+    """
+    Vectorized colors.kelvin_to_rgb.
+
+    :return: Array of shape kelvin.shape + (3,).
+    """
+    temperature = np.asarray(kelvin, dtype=float) / 100
+    with np.errstate(invalid='ignore', divide='ignore'):
+        warm = temperature <= 66
+        red = np.where(warm, 255.0, 329.698727446 * (temperature - 60) ** -0.1332047592)
+        green = np.where(warm, 99.4708025861 * np.log(temperature) - 161.1195681661,
+                         288.1221695283 * (temperature - 60) ** -0.0755148492)
+        blue = np.where(temperature >= 66, 255.0,
+                        np.where(temperature <= 19, 0.0, 138.5177312231 * np.log(temperature - 10) - 305.0447927307))
+    return np.clip(np.stack([red, green, blue], axis=-1), 0.0, 255.0) / 255
+
+
+def to_rgb(array):
+    """
+    Vectorized HSBK.to_rgb. Unset hue counts as 0, saturation and brightness as 1 and kelvin as neutral white.
+
+    :param array: Array of shape (..., 4).
+    :return: Array of shape (..., 3) of sRGB channels, 0-1.
+    """
+    array = np.asarray(array, dtype=float)
+    hue = np.nan_to_num(array[..., HUE], nan=0.0)
+    saturation = np.nan_to_num(array[..., SATURATION], nan=1.0)[..., None]
+    brightness = np.nan_to_num(array[..., BRIGHTNESS], nan=1.0)[..., None]
+    kelvin = array[..., KELVIN]
+
+    k = (np.array([5.0, 3.0, 1.0]) + (hue[..., None] % 360) / 60) % 6
+    color = 1 - np.clip(np.minimum(k, 4 - k), 0.0, 1.0)
+    white = np.where(np.isnan(kelvin)[..., None], 1.0, kelvin_to_rgb(np.nan_to_num(kelvin, nan=6600.0)))
+    return brightness * (saturation * color + (1 - saturation) * white)
+
+
+def from_rgb(rgb):
+    """
+    Vectorized HSBK.from_rgb.
+
+    :param rgb: Array of shape (..., 3) of sRGB channels, 0-1.
+    :return: Array of shape (..., 4), kelvin unset.
+    """
+    rgb = np.asarray(rgb, dtype=float)
+    red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    high, low = rgb.max(axis=-1), rgb.min(axis=-1)
+    spread = high - low
+    with np.errstate(invalid='ignore', divide='ignore'):
+        saturation = np.where(high > 0, spread / high, 0.0)
+        hue = np.select([spread == 0, high == red, high == green],
+                        [0.0, (green - blue) / spread % 6, (blue - red) / spread + 2],
+                        (red - green) / spread + 4) * 60
+    return np.stack([hue % 360, saturation, high, np.full_like(high, np.nan)], axis=-1)
+
+
+def to_xy(array):
+    """
+    Vectorized HSBK.to_xy.
+
+    :return: Array of shape (..., 3) of CIE 1931 x, y and luminance.
+    """
+    rgb = to_rgb(array)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array(colors.RGB_TO_XYZ).T
+    total = xyz.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.where(total > 0, xyz[..., 0] / total, 0.3127)
+        y = np.where(total > 0, xyz[..., 1] / total, 0.3290)
+    return np.stack([x, y, xyz[..., 1]], axis=-1)
+
+
+def from_xy(xy):
+    """
+    Vectorized HSBK.from_xy.
+
+    :param xy: Array of shape (..., 3) of CIE 1931 x, y and luminance.
+    :return: Array of shape (..., 4), kelvin unset.
+    """
+    xy = np.asarray(xy, dtype=float)
+    x, y, luminance = xy[..., 0], xy[..., 1], xy[..., 2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        xyz = np.stack([x * luminance / y, luminance, (1 - x - y) * luminance / y], axis=-1)
+    xyz = np.where((y == 0)[..., None], 0.0, xyz)
+    linear = np.maximum(xyz @ np.array(colors.XYZ_TO_RGB).T, 0.0)
+    peak = linear.max(axis=-1, keepdims=True)
+    linear = np.where(peak > 1, linear / np.where(peak > 1, peak, 1.0), linear)
+    rgb = np.where(linear <= 0.0031308, 12.92 * linear, 1.055 * linear ** (1 / 2.4) - 0.055)
+    return from_rgb(rgb)
@@ -0,0 +1,141 @@
+import logging
+
+from luminary.api.lifx import HSBK
+from luminary.util.timeline import Effect, State, Timeline, Toggle, Wait
+
+logger = logging.getLogger(__name__)
+
+WAVEFORMS = ('pulse', 'breathe')
+DEFAULTS = {'period': 1.0, 'cycles': 1.0}
+TOLERANCE = 1e-6
+
+
+def optimize(timeline, light_on=True):
+    """
+    Rewrites timeline into the fewest requests that play the same on the light:
+    - back to back identical pulse/breathe effects, each waited out, become one effect with their cycles summed
+    - toggle pairs blinking the light become one server-side pulse to brightness 0 (only if light_on)
+    - states sent with no wait between them are merged into one
+
+    :param timeline: Timeline to optimize.
+    :param light_on: Whether the light is on when the timeline starts; blinking an off light can't be a pulse.
+    :return: Tuple of optimized Timeline and number of requests saved.
+    """
+    steps = merge_states(timeline.steps)
+    if light_on:
+        steps = merge_toggles(steps)
+    steps = merge_waveforms(steps)
+
+    saved = requests(timeline.steps) - requests(steps)
+    logger.debug('Optimized timeline from %d to %d requests', requests(timeline.steps), requests(steps))
+    return Timeline(steps, timeline.selector), saved
+
+
+def requests(steps):
+    return sum(1 for step in steps if not isinstance(step, Wait))
+
+
+def merge_states(steps):
+    merged = []
+    for step in steps:
+        if isinstance(step, State) and merged and isinstance(merged[-1], State):
+            merged[-1] = State({**merged[-1].payload, **step.payload})
+        else:
+            merged.append(step)
+    return merged
+
+
+def merge_toggles(steps):
+    """
+    Toggle, Wait(p), Toggle, Wait(p) repeated k times -> pulse to brightness 0 with period 2p and k cycles.
+    """
+    merged = []
+    i = 0
+    while i < len(steps):
+        cycles, period = 0, None
+        while is_blink(steps[i:i + 4], period):
+            period = steps[i + 1].seconds
+            cycles += 1
+            i += 4
+        if cycles:
+            merged.append(Effect('pulse', {'color': 'brightness:0', 'period': 2 * period, 'cycles': cycles,
+                                           'power_on': False}))
+            merged.append(Wait(2 * period * cycles))
+        else:
+            merged.append(steps[i])
+            i += 1
+    return merged
+
+
+def is_blink(steps, period=None):
+    if len(steps) < 4:
+        return False
+    toggle, off, toggle_back, on = steps
+    return (isinstance(toggle, Toggle) and isinstance(off, Wait) and isinstance(toggle_back, Toggle)
+            and isinstance(on, Wait) and abs(off.seconds - on.seconds) < TOLERANCE
+            and (period is None or abs(off.seconds - period) < TOLERANCE))
+
+
+def merge_waveforms(steps):
+    """
+    Effect, Wait(period * cycles), Effect of the same waveform -> one Effect with the cycles summed.
+    """
+    merged = []
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+        if not (isinstance(step, Effect) and step.effect in WAVEFORMS):
+            merged.append(step)
+            i += 1
+            continue
+
+        kwargs = dict(step.kwargs)
+        cycles = kwargs.get('cycles', DEFAULTS['cycles'])
+        waited = 0.0
+        i += 1
+        while (i + 1 < len(steps) and is_effect_end(steps[i], kwargs)
+               and same_waveform(step, steps[i + 1], kwargs.get('persist'))):
+            waited += steps[i].seconds
+            cycles += steps[i + 1].kwargs.get('cycles', DEFAULTS['cycles'])
+            kwargs = dict(steps[i + 1].kwargs)
+            i += 2
+
+        kwargs['cycles'] = cycles
+        merged.append(Effect(step.effect, kwargs))
+        if waited:
+            merged.append(Wait(waited))
+    return merged
+
+
+def is_effect_end(step, kwargs):
+    """
+    True if step is a Wait lasting exactly as long as the effect, so the next effect starts right as it ends.
+    """
+    duration = kwargs.get('period', DEFAULTS['period']) * kwargs.get('cycles', DEFAULTS['cycles'])
+    return isinstance(step, Wait) and abs(step.seconds - duration) < TOLERANCE
+
+
+def same_waveform(first, second, persist=False):
+    """
+    True if both effects are the same waveform with the same settings apart from cycles.
+    Only the last may persist, as a persisting cycle in the middle would change where the next one starts from.
+
+    :param persist: Whether the effect merged last persists, in which case nothing more can be merged.
+    """
+    if not (isinstance(second, Effect) and second.effect == first.effect) or persist:
+        return False
+    return normalize(first.kwargs) == normalize(second.kwargs)
+
+
+def normalize(kwargs, ignore=('cycles', 'persist')):
+    normalized = {}
+    for key, value in kwargs.items():
+        if key in ignore:
+            continue
+        if key in ('color', 'from_color') and value is not None:
+            value = HSBK(value).encode()
+        normalized[key] = value
+    for key, value in DEFAULTS.items():
+        if key not in ignore:
+            normalized.setdefault(key, value)
+    return normalized
@@ -0,0 +1,195 @@
+"""
+Turns the depth sensor's noisy reading stream into gestures:
+
+    hover         hand held within the near distance            -> toggle
+    approach      hand slowly moving towards the sensor         -> dim
+    double_wave   two quick waves in front of the sensor        -> scene
+
+Everything is driven by reading timestamps only, so a recorded trace always classifies the same way,
+and memory use is constant.
+"""
+from array import array
+from collections import deque
+
+HOVER = 'hover'
+APPROACH = 'approach'
+DOUBLE_WAVE = 'double_wave'
+
+
+class DistanceFilter:
+    def __init__(self, window=3, alpha=0.5):
+        """
+        Median of the last `window` readings, smoothed with an exponential moving average.
+        The median drops single-sample spikes from stray echoes, the average steadies what's left for tracking
+        movement. Presence is judged on the median alone so quick waves aren't smoothed away.
+
+        :param window: Readings the median is taken over.
+        :param alpha: Weight of the newest median in the average, 0-1.
+        """
+        self.readings = deque(maxlen=window)
+        self.alpha = alpha
+        self.median = None
+        self.value = None
+
+    def update(self, distance):
+        """
+        :param distance: Distance in cm, or None for a missed echo.
+        :return: Smoothed distance, or None if there have been no readings yet.
+        """
+        if distance is None:
+            return self.value
+        self.readings.append(distance)
+        self.median = sorted(self.readings)[len(self.readings) // 2]
+        self.value = self.median if self.value is None else self.alpha * self.median + (1 - self.alpha) * self.value
+        return self.value
+
+
+class Presence:
+    def __init__(self, near=6, far=10, debounce=0.1):
+        """
+        Whether something is in front of the sensor, with hysteresis and debounce so readings hovering around the
+        threshold don't flicker.
+
+        :param near: Present once the distance drops below this many cm...
+        :param far: ...and absent again once it rises above this.
+        :param debounce: Seconds the new state has to hold before it counts.
+        """
+        self.near = near
+        self.far = far
+        self.debounce = debounce
+        self.present = False
+        self.pending_since = None
+
+    def update(self, time, distance):
+        """
+        :return: True if presence changed with this reading.
+        """
+        if distance is None:
+            return False
+        flipping = distance > self.far if self.present else distance < self.near
+        if not flipping:
+            self.pending_since = None
+            return False
+        if self.pending_since is None:
+            self.pending_since = time
+        if time - self.pending_since < self.debounce:
+            return False
+        self.present = not self.present
+        self.pending_since = None
+        return True
+
+
+class RingBuffer:
+    def __init__(self, size):
+        """
+        Fixed size buffer of timestamped distances.
+        """
+        self.times = array('d', bytes(8 * size))
+        self.distances = array('d', bytes(8 * size))
+        self.size = size
+        self.count = 0
+        self.head = 0
+
+    def append(self, time, distance):
+        self.times[self.head] = time
+        self.distances[self.head] = distance
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def since(self, time):
+        """
+        :return: List of (time, distance) from the given time on, oldest first.
+        """
+        readings = []
+        for i in range(1, self.count + 1):
+            index = (self.head - i) % self.size
+            if self.times[index] < time:
+                break
+            readings.append((self.times[index], self.distances[index]))
+        readings.reverse()
+        return readings
+
+
+class GestureClassifier:
+    def __init__(self, near=6, far=10, hover_time=0.6, wave_time=0.5, wave_gap=0.6,
+                 approach_time=1.0, approach_distance=10, approach_speed=30, approach_range=40, buffer_size=64):
+        """
+        :param near: cm below which a hand counts as present.
+        :param far: cm above which a present hand counts as gone.
+        :param hover_time: Seconds a hand has to stay present to hover.
+        :param wave_time: Max seconds a hand is present during a wave.
+        :param wave_gap: Max seconds between the two waves of a double wave.
+        :param approach_time: Seconds over which an approach is measured.
+        :param approach_distance: Min cm a hand has to come closer within approach_time.
+        :param approach_speed: Max cm/s for an approach; anything faster is a wave.
+        :param approach_range: cm within which approaches are tracked.
+        :param buffer_size: Readings kept; must cover approach_time at the sample rate.
+        """
+        self.filter = DistanceFilter()
+        self.presence = Presence(near, far)
+        self.buffer = RingBuffer(buffer_size)
+        self.hover_time = hover_time
+        self.wave_time = wave_time
+        self.wave_gap = wave_gap
+        self.approach_time = approach_time
+        self.approach_distance = approach_distance
+        self.approach_speed = approach_speed
+        self.approach_range = approach_range
+
+        self.present_since = None
+        self.hovered = False
+        self.last_wave = None
+        self.approached = False
+
+    def update(self, time, distance):
+        """
+        :param time: Reading timestamp in seconds.
+        :param distance: Distance in cm, or None for a missed echo.
+        :return: Gesture recognized with this reading, or None.
+        """
+        distance = self.filter.update(distance)
+        if distance is None:
+            return None
+        self.buffer.append(time, distance)
+
+        changed = self.presence.update(time, self.filter.median)
+        if self.presence.present:
+            if changed:
+                self.present_since = time
+            if not self.hovered and time - self.present_since >= self.hover_time:
+                self.hovered = True
+                self.last_wave = None
+                return HOVER
+            return None
+
+        if changed:
+            was_wave = not self.hovered and time - self.present_since <= self.wave_time
+            self.hovered = False
+            self.approached = False
+            if was_wave:
+                if self.last_wave is not None and self.present_since - self.last_wave <= self.wave_gap:
+                    self.last_wave = None
+                    return DOUBLE_WAVE
+                self.last_wave = time
+            return None
+
+        return self.approach(time, distance)
+
+    def approach(self, time, distance):
+        if distance > self.approach_range:
+            self.approached = False
+            return None
+        if self.approached:
+            return None
+
+        readings = self.buffer.since(time - self.approach_time)
+        if len(readings) < 2 or time - readings[0][0] < self.approach_time * 0.9:
+            return None
+        closer = readings[0][1] - distance
+        if closer < self.approach_distance or closer / (time - readings[0][0]) > self.approach_speed:
+            return None
+        if any(later > earlier + 1 for (_, earlier), (_, later) in zip(readings, readings[1:])):
+            return None  # moved away somewhere in between, not a steady approach
+
+        self.approached = True
+        return APPROACH
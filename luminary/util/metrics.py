@@ -0,0 +1,221 @@
+"""
+In-process latency histograms and counters for the hot paths: every HTTP request by endpoint, echo pulses, the
+sensor loop's jitter and how long gestures take from the sensor reading to the light acting on them.
+
+Off unless `enabled` is on in metrics.ini and the process calls start(), as the daemon and the light switch do.
+While off the instrumented paths only test `enabled`. Histograms have fixed HDR-style buckets, powers of two each
+split into SUB_BUCKETS linear steps, so recording is a bisect and a few increments, and memory never grows with
+the number of calls. Once started, the metrics are served in the Prometheus text format on `port` and summarized
+in the log every `log_interval` seconds.
+"""
+import bisect
+import logging
+import threading
+import time
+
+from luminary.util import project
+
+logger = logging.getLogger(__name__)
+
+SUB_BUCKETS = 8  # within 12.5% of the real value, like 1 significant digit HDR histograms
+# upper bounds in seconds, about 1us to 2 minutes
+BOUNDS = tuple(2.0 ** exponent * (1 + step / SUB_BUCKETS)
+               for exponent in range(-20, 7) for step in range(SUB_BUCKETS))
+EXPORTED = range(0, len(BOUNDS), SUB_BUCKETS)  # bounds at powers of two, enough resolution for Prometheus
+
+enabled = False
+clock = time.perf_counter
+
+histograms = {}  # (name, labels) -> Histogram
+counters = {}  # (name, labels) -> Counter
+registry_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count', 'lock')
+
+    def __init__(self):
+        """
+        Counts of seconds in the BOUNDS buckets, plus one for anything past the last bound.
+        """
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        index = bisect.bisect_left(BOUNDS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q):
+        """
+        :return: Upper bound of the bucket holding the q quantile, inf if past the last bound, None if empty.
+        """
+        with self.lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= rank:
+                return BOUNDS[index] if index < len(BOUNDS) else float('inf')
+        return float('inf')
+
+
+class Counter:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+def histogram(name, **labels):
+    """
+    :return: The Histogram for name and labels, created on first use.
+    """
+    return lookup(histograms, Histogram, name, labels)
+
+
+def counter(name, **labels):
+    """
+    :return: The Counter for name and labels, created on first use.
+    """
+    return lookup(counters, Counter, name, labels)
+
+
+def lookup(registry, factory, name, labels):
+    key = (name, tuple(sorted(labels.items())))
+    metric = registry.get(key)
+    if metric is None:
+        with registry_lock:
+            metric = registry.setdefault(key, factory())
+    return metric
+
+
+def observe(name, seconds, **labels):
+    """
+    Records into the histogram for name and labels, looking it up each call. Hot paths keep the Histogram instead.
+    """
+    histogram(name, **labels).record(seconds)
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+def prometheus():
+    """
+    :return: Every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for kind, registry in (('counter', counters), ('histogram', histograms)):
+        with registry_lock:
+            metrics = sorted(registry.items())
+        typed = set()
+        for (name, labels), metric in metrics:
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+            if kind == 'counter':
+                lines.append(f"{name}{format_labels(labels)} {metric.value}")
+                continue
+            with metric.lock:
+                counts, total, count = list(metric.counts), metric.sum, metric.count
+            cumulative = 0
+            for index, bound in enumerate(BOUNDS):
+                cumulative += counts[index]
+                if index in EXPORTED:
+                    lines.append(f"{name}_bucket{format_labels(labels, le=repr(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels, le='+Inf')} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def summary():
+    """
+    :return: Lines of counts and p50/p90/p99 of each histogram and each counter's value, for the log.
+    """
+    lines = []
+    with registry_lock:
+        histogram_items, counter_items = sorted(histograms.items()), sorted(counters.items())
+    for (name, labels), metric in histogram_items:
+        if metric.count:
+            quantiles = ' '.join(f"p{round(q * 100)}={metric.quantile(q) * 1000:.2f}ms" for q in (0.5, 0.9, 0.99))
+            lines.append(f"{name}{format_labels(labels)} n={metric.count} {quantiles}")
+    for (name, labels), metric in counter_items:
+        lines.append(f"{name}{format_labels(labels)} {metric.value}")
+    return lines
+
+
+def serve(port, host='127.0.0.1'):
+    """
+    Serves prometheus() on every GET from a background thread.
+
+    :return: The running server.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+def log_summaries(interval):
+    def run():
+        while True:
+            time.sleep(interval)
+            for line in summary():
+                logger.info('%s', line)
+
+    threading.Thread(target=run, name='metrics-log', daemon=True).start()
+
+
+def start():
+    """
+    Turns metrics on if `enabled` in metrics.ini, then starts the Prometheus endpoint on `port` (default 0, off)
+    and the log summary every `log_interval` seconds (default 300, 0 off). Does nothing if already started.
+
+    :return: True if metrics are on.
+    """
+    global enabled
+    config = settings()
+    if enabled or not config.getboolean('enabled', False):
+        return enabled
+    enabled = True
+    port = config.getint('port', 0)
+    if port:
+        serve(port)
+    interval = config.getfloat('log_interval', 300)
+    if interval > 0:
+        log_summaries(interval)
+    return enabled
+
+
+def settings():
+    return project.settings('metrics.ini')
@@ -1,9 +1,66 @@
 import configparser
+import functools
 import os
+import threading
+
+
+class ConfigError(Exception):
+    pass
+
+
+def config_dir():
+    if 'LUMINARY_CONFIG_DIR' in os.environ:
+        return os.environ['LUMINARY_CONFIG_DIR']
+    return f"{os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))}/config"
 
 
 def load_config(config_name):
+    """
+    :param config_name: Config file name within the config dir, e.g. lifx.ini
+    :return: ConfigParser, read once and shared by every module asking for the same file.
+    """
+    return read_config(f"{config_dir()}/{config_name}")
+
+
+@functools.lru_cache(maxsize=None)
+def read_config(path):
     config = configparser.ConfigParser()
-    config_dir = f"{os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))}/config"
-    config.read(f"{config_dir}/{config_name}")
+    config.read(path)
     return config
+
+
+def settings(config_name):
+    """
+    :return: DEFAULT section of config_name, where all settings live.
+    """
+    return load_config(config_name)['DEFAULT']
+
+
+def required(config_name, key):
+    """
+    :return: Value of a setting `python setup.py` writes.
+    :raise ConfigError: If it's missing.
+    """
+    value = settings(config_name).get(key)
+    if value is None:
+        raise ConfigError(f"{key} missing from {config_dir()}/{config_name}, run `python setup.py`")
+    return value
+
+
+def lazy(func):
+    """
+    Decorates a function without arguments so it runs once, on first call, and returns that result from then on.
+    For module-level clients and settings, so importing a module costs nothing until it's used. Thread safe.
+    """
+    result = []
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(func())
+        return result[0]
+
+    return wrapper
@@ -0,0 +1,299 @@
+"""
+Runs jobs at cron-style or sunrise/sunset-relative times from within a long running process, e.g. the daemon,
+so routines don't pay for a cold start at their trigger time.
+
+Jobs wait in a heap ordered by their next fire time and a single thread sleeps until the earliest one is due.
+Each job can have a warm-up hook that runs some seconds ahead of it, e.g. to open connections and prefetch data.
+"""
+import bisect
+import datetime
+import heapq
+import itertools
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+FIRE = 'fire'
+WARM_UP = 'warm_up'
+
+
+class Cron:
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        """
+        Standard 5 field cron expression: minute hour day-of-month month day-of-week (0 or 7 is Sunday).
+        Fields take *, numbers, ranges a-b, steps */n or a-b/n, and comma separated lists of those.
+        Like cron, if both day fields are restricted a day matching either counts.
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELDS))
+        self.weekdays = {weekday % 7 for weekday in self.weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def matches_day(self, day):
+        weekday = (day.weekday() + 1) % 7  # cron counts from Sunday
+        if self.any_day or self.any_weekday:
+            return day.day in self.days and weekday in self.weekdays
+        return day.day in self.days or weekday in self.weekdays
+
+    def next(self, after):
+        """
+        :param after: Naive local datetime.
+        :return: First matching datetime after it.
+        """
+        moment = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months or not self.matches_day(moment):
+                moment = datetime.datetime.combine(moment.date() + datetime.timedelta(days=1), datetime.time())
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            else:
+                minute = next((m for m in sorted(self.minutes) if m >= moment.minute), None)
+                if minute is not None:
+                    return moment.replace(minute=minute)
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+    def __repr__(self):
+        return f"Cron({self.expression!r})"
+
+
+def parse_field(field, low, high):
+    values = set()
+    for part in field.split(','):
+        span, _, step = part.partition('/')
+        if span == '*':
+            start, end = low, high
+        elif '-' in span:
+            start, end = map(int, span.split('-'))
+        else:
+            start = end = int(span)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field {field!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+class Sun:
+    EVENTS = ('sunrise', 'sunset')
+
+    def __init__(self, expression, latitude, longitude):
+        """
+        Fires relative to the local sunrise or sunset, e.g. 'sunset', 'sunset-30' or 'sunrise+15' (minutes).
+        Days the sun doesn't rise or set at the location are skipped.
+
+        :param latitude: Degrees north.
+        :param longitude: Degrees east.
+        """
+        expression = expression.replace(' ', '')
+        self.event = expression.rstrip('+-0123456789.')
+        if self.event not in self.EVENTS:
+            raise ValueError(f"Sun trigger must start with one of {', '.join(self.EVENTS)}, got {expression!r}")
+        offset = expression[len(self.event):]
+        self.offset = datetime.timedelta(minutes=float(offset) if offset else 0)
+        self.expression = expression
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def next(self, after):
+        """
+        :param after: Naive local datetime.
+        :return: First event time after it, as naive local datetime.
+        """
+        day = after.date() - datetime.timedelta(days=1)  # an offset can pull tomorrow's event before midnight
+        for _ in range(370):
+            times = sun_times(day, self.latitude, self.longitude)
+            if times is not None:
+                moment = times[self.EVENTS.index(self.event)] + self.offset
+                if moment > after:
+                    return moment
+            day += datetime.timedelta(days=1)
+        raise ValueError(f"The sun never {self.event[3:]}s at {self.latitude}, {self.longitude}")
+
+    def __repr__(self):
+        return f"Sun({self.expression!r})"
+
+
+class At:
+    def __init__(self, times):
+        """
+        Fires at each of the given times once, e.g. a day's planned light changes.
+
+        :param times: Naive local datetimes.
+        """
+        self.times = sorted(times)
+
+    def next(self, after):
+        """
+        :return: First of the times after `after`, or None once they're all past.
+        """
+        index = bisect.bisect_right(self.times, after)
+        return self.times[index] if index < len(self.times) else None
+
+    def __repr__(self):
+        return f"At({len(self.times)} times)"
+
+
+def sun_times(day, latitude, longitude):
+    """
+    Sunrise equation, accurate to about a minute.
+
+    :param day: date
+    :param latitude: Degrees north.
+    :param longitude: Degrees east.
+    :return: Tuple of sunrise and sunset as naive local datetimes, None if the sun doesn't rise or set that day.
+    """
+    days = day.toordinal() - datetime.date(2000, 1, 1).toordinal()
+    noon = days - longitude / 360  # mean solar noon, days since J2000
+    anomaly = math.radians((357.5291 + 0.98560028 * noon) % 360)
+    center = 1.9148 * math.sin(anomaly) + 0.02 * math.sin(2 * anomaly) + 0.0003 * math.sin(3 * anomaly)
+    ecliptic = math.radians((math.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = 2451545.0 + noon + 0.0053 * math.sin(anomaly) - 0.0069 * math.sin(2 * ecliptic)
+
+    declination = math.asin(math.sin(ecliptic) * math.sin(math.radians(23.4397)))
+    latitude = math.radians(latitude)
+    cos_hour_angle = ((math.sin(math.radians(-0.833)) - math.sin(latitude) * math.sin(declination))
+                      / (math.cos(latitude) * math.cos(declination)))
+    if not -1 <= cos_hour_angle <= 1:
+        return None
+    hour_angle = math.degrees(math.acos(cos_hour_angle)) / 360
+
+    def local(julian):
+        return datetime.datetime.fromtimestamp((julian - 2440587.5) * 86400)
+
+    return local(transit - hour_angle), local(transit + hour_angle)
+
+
+class Job:
+    def __init__(self, name, trigger, func, warm_up=None, lead=60.0):
+        """
+        :param name: Name for logs.
+        :param trigger: Cron, Sun, At or anything with a next(after) method returning the next naive local datetime,
+                        or None once the job is done.
+        :param func: Called without arguments when the job fires.
+        :param warm_up: Optional callable run lead seconds before each firing.
+        :param lead: Seconds the warm-up runs ahead of the job.
+        """
+        self.name = name
+        self.trigger = trigger
+        self.func = func
+        self.warm_up = warm_up
+        self.lead = lead
+        self.next_run = None
+
+
+class Scheduler:
+    def __init__(self, now=datetime.datetime.now, max_sleep=15 * 60):
+        """
+        :param now: Returns the current naive local datetime.
+        :param max_sleep: Max seconds to sleep at once. The sleep itself is monotonic, so waking up now and then
+                          catches wall clock corrections, e.g. NTP setting the clock after boot.
+        """
+        self.now = now
+        self.max_sleep = max_sleep
+        self.jobs = []
+        self.queue = []  # (datetime, tie breaker, FIRE or WARM_UP, job)
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+
+    def add(self, job):
+        """
+        Queues job's next firing, and its warm-up if there's still time for it.
+        """
+        with self.condition:
+            self.jobs.append(job)
+            self.schedule(job, self.now())
+            self.condition.notify()
+        return job
+
+    def schedule(self, job, after):
+        job.next_run = job.trigger.next(after)
+        if job.next_run is None:
+            self.jobs.remove(job)
+            logger.info('%s is done', job.name)
+            return
+        heapq.heappush(self.queue, (job.next_run, next(self.counter), FIRE, job))
+        if job.warm_up is not None:
+            warm_up_at = job.next_run - datetime.timedelta(seconds=job.lead)
+            if warm_up_at > self.now():
+                heapq.heappush(self.queue, (warm_up_at, next(self.counter), WARM_UP, job))
+        logger.info('Next %s at %s', job.name, job.next_run)
+
+    def cancel(self, name):
+        """
+        Drops the jobs called name, along with their queued firings and warm-ups.
+        """
+        with self.condition:
+            self.jobs = [job for job in self.jobs if job.name != name]
+            self.queue = [entry for entry in self.queue if entry[3].name != name]
+            heapq.heapify(self.queue)
+            self.condition.notify()
+
+    def upcoming(self):
+        """
+        :return: List of (job name, next run datetime), soonest first.
+        """
+        with self.condition:
+            return sorted(((job.name, job.next_run) for job in self.jobs), key=lambda entry: entry[1])
+
+    def run(self):
+        """
+        Fires jobs as they come due until stop is called. Each job runs in its own thread, so a long routine
+        doesn't hold up the ones after it.
+        """
+        with self.condition:
+            self.running = True
+        self.loop()
+
+    def loop(self):
+        while True:
+            with self.condition:
+                while self.running:
+                    wait = (self.queue[0][0] - self.now()).total_seconds() if self.queue else self.max_sleep
+                    if wait <= 0:
+                        break
+                    self.condition.wait(min(wait, self.max_sleep))
+                if not self.running:
+                    return
+                at, _, kind, job = heapq.heappop(self.queue)
+                if kind == FIRE:
+                    self.schedule(job, max(at, self.now()))  # after downtime, fire once rather than catch up
+
+            func = job.func if kind == FIRE else job.warm_up
+            threading.Thread(target=self.call, args=(job, kind, func), name=f"{job.name}-{kind}",
+                             daemon=True).start()
+
+    def call(self, job, kind, func):
+        logger.info('Running %s %s', job.name, kind)
+        try:
+            func()
+        except Exception:
+            logger.exception('%s %s failed', job.name, kind)
+
+    def start(self):
+        """
+        Runs the scheduler in a background thread. It counts as running from here on, so a stop before the thread
+        gets going still stops it.
+        """
+        with self.condition:
+            self.running = True
+        thread = threading.Thread(target=self.loop, name='scheduler', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -0,0 +1,117 @@
+"""
+Routines declared as data. A timeline is a list of steps:
+
+    State(payload)          lifx.set_state(payload)
+    Effect(effect, kwargs)  lifx_effects.<effect>(**kwargs), e.g. Effect('pulse', {'color': 'green', 'period': 2})
+    Toggle()                lifx.toggle_power()
+    Wait(seconds)           pause before the next step
+
+Timelines are compiled to absolute deadlines and run by one loop, so request latency doesn't add up into drift
+and several timelines can play at once without threads.
+"""
+import heapq
+import time
+from collections import namedtuple
+
+from luminary.api import lifx, lifx_effects
+
+State = namedtuple('State', ['payload'])
+Effect = namedtuple('Effect', ['effect', 'kwargs'])
+Toggle = namedtuple('Toggle', [])
+Wait = namedtuple('Wait', ['seconds'])
+
+
+class Timeline:
+    def __init__(self, steps, selector=None):
+        """
+        :param steps: List of State, Effect, Toggle and Wait steps.
+        :param selector: Light selector the timeline plays on. Defaults to the configured light.
+        """
+        self.steps = list(steps)
+        self.selector = selector
+
+    def compile(self):
+        """
+        :return: List of (offset seconds from start, step) for every step that isn't a Wait.
+        """
+        schedule = []
+        offset = 0.0
+        for step in self.steps:
+            if isinstance(step, Wait):
+                offset += step.seconds
+            else:
+                schedule.append((offset, step))
+        return schedule
+
+    def duration(self):
+        return sum(step.seconds for step in self.steps if isinstance(step, Wait))
+
+
+def execute(step, selector=None):
+    if isinstance(step, State):
+        lifx.set_state(step.payload, selector)
+    elif isinstance(step, Effect):
+        getattr(lifx_effects, step.effect)(selector=selector, **step.kwargs)
+    elif isinstance(step, Toggle):
+        lifx.toggle_power(selector)
+    else:
+        raise TypeError(f"Unknown timeline step {step!r}")
+
+
+def run(*timelines, execute=execute, clock=time.monotonic, sleep=time.sleep, smoothing=0.3):
+    """
+    Plays timelines concurrently on a single loop.
+    Steps are sent early by half the measured request time, roughly when the request reaches the light,
+    so each change lands on its deadline.
+
+    :param timelines: Timelines to play, all starting now.
+    :param execute: Sends a step; called with step and the timeline's selector.
+    :param clock: Monotonic clock.
+    :param sleep: Sleeps given seconds.
+    :param smoothing: Weight of the newest request time in the latency estimate.
+    :return: List of (step, scheduled offset, actual offset) for every step sent.
+             Returns once the longest timeline, including trailing waits, has played out.
+    """
+    start = clock()
+    queue = []
+    schedules = [timeline.compile() for timeline in timelines]
+    for index, schedule in enumerate(schedules):
+        if schedule:
+            heapq.heappush(queue, (start + schedule[0][0], index, 0))
+
+    latency = 0.0
+    log = []
+    while queue:
+        deadline, index, position = heapq.heappop(queue)
+        wait = deadline - latency / 2 - clock()
+        if wait > 0:
+            sleep(wait)
+
+        step = schedules[index][position][1]
+        sent = clock()
+        execute(step, timelines[index].selector)
+        took = clock() - sent
+        latency = took if not log else (1 - smoothing) * latency + smoothing * took
+        log.append((step, deadline - start, sent + took / 2 - start))
+
+        if position + 1 < len(schedules[index]):
+            heapq.heappush(queue, (start + schedules[index][position + 1][0], index, position + 1))
+
+    remaining = start + max((timeline.duration() for timeline in timelines), default=0) - clock()
+    if remaining > 0:
+        sleep(remaining)
+    return log
+
+
+def blink(cycles=1, period=.25, persist=False):
+    """
+    Steps blinking the power state, see lifx.blink_power.
+
+    :return: List of Toggle and Wait steps.
+    """
+    steps = []
+    for i in range(cycles):
+        steps += [Toggle(), Wait(period)]
+        if not (i == cycles - 1 and persist):
+            steps += [Toggle(), Wait(period)]
+    return steps
@@ -0,0 +1,230 @@
+"""
+Rules for encoding weather into light, as data rather than code, so they can be changed per user in
+weather_rules.ini in the config dir. A section there replaces the default section of the same name.
+
+Each threshold section maps bounds to values, plus `else` for anything past the last bound:
+
+    [temperature]
+    match = at_least    # a temperature gets the value of the highest bound it's at or above, else `else`
+    95 = hue:7.03 saturation:0.98 kelvin:4000
+    ...
+    else = hue:237.66 saturation:0 kelvin:9000
+
+    [precipitation_chance]
+    match = at_most     # a chance gets the value of the lowest bound it's at or below, else `else`
+
+Sections are compiled once into sorted bound lists searched with bisect, with colors already encoded to LIFX API
+color strings, so encoding a report is a handful of lookups.
+"""
+import bisect
+import configparser
+
+from luminary.api.lifx import HSBK
+from luminary.util import project
+
+# these values are all subjective to what I think is very hot, hot, etc.
+DEFAULT_RULES = """
+[temperature]
+match = at_least
+# dark red
+95 = hue:7.031357289997711 saturation:0.979995422293431 kelvin:4000
+# red
+85 = hue:7.031357289997711 saturation:0.6299992370489051 kelvin:4000
+# orange
+78 = hue:42.188143739986266 saturation:0.9726710917830167 kelvin:4000
+# yellow
+68 = hue:45.00068665598535 saturation:1 kelvin:4000
+# sunny white
+60 = hue:237.65987640192265 saturation:0 kelvin:3500
+# light blue
+50 = hue:177.19020370794232 saturation:0.7199969481956207 kelvin:4000
+# snowy white
+else = hue:237.65987640192265 saturation:0 kelvin:9000
+
+[precipitation_chance]
+match = at_most
+# sunny white
+0 = hue:237.65987640192265 saturation:0 kelvin:3500
+# white blue
+25 = hue:177.19020370794232 saturation:0.4399938963912413 kelvin:4000
+# light blue
+50 = hue:177.19020370794232 saturation:0.7199969481956207 kelvin:4000
+# blue
+75 = hue:202.50308995193407 saturation:0.7199969481956207 kelvin:4000
+# dark blue
+else = hue:220.78461890592814 saturation:0.9 kelvin:4000
+
+[cloud_brightness]
+match = at_least
+# brightness the light dips to for each cloud level, 0 (sunny) to 4 (cloudy)
+4 = 0
+3 = 0.25
+2 = 0.5
+1 = 0.75
+else = 1
+
+[flags]
+# color pulsed after the precipitation chance when the forecast has the condition
+thunderstorms = hue:45.00068665598535 saturation:1 kelvin:4000
+snow = hue:237.65987640192265 saturation:0 kelvin:9000
+
+[cloud_levels]
+# short forecast to cloud level; any other forecast is `else`
+sunny = 0
+mostly sunny = 1
+partly cloudy = 2
+mostly cloudy = 3
+# night time forecasts, e.g. in the hourly forecast
+clear = 0
+mostly clear = 1
+else = 4
+
+[ambient]
+# day long light schedule from the hourly forecast, see luminary.ambient
+# hours at or above this precipitation chance show its color rather than the temperature's
+precipitation_chance = 50
+# brightness is scaled by this at night
+night_brightness = 0.3
+# seconds each change fades over
+duration = 600
+
+[ambient_brightness]
+# ambient brightness by sky cover percentage
+match = at_least
+100 = 0.5
+75 = 0.6
+50 = 0.8
+25 = 0.9
+else = 1
+"""
+
+
+class Table:
+    def __init__(self, bounds, values, other, at_least=True):
+        """
+        :param bounds: Sorted numeric bounds.
+        :param values: Value of each bound.
+        :param other: Value past the last bound: below the lowest if at_least, else above the highest.
+        :param at_least: True if a bound applies to what's at or above it, False if to what's at or below it.
+        """
+        self.bounds = bounds
+        self.at_least = at_least
+        # one slot per bisect result, so lookup is a single index
+        self.slots = [other] + values if at_least else values + [other]
+        self.slot_array = None
+
+    @classmethod
+    def from_section(cls, section, parse):
+        """
+        :param section: Config section of bound = value entries, `else` and `match`.
+        :param parse: Turns a config string into a value.
+        """
+        match = section.get('match', 'at_least')
+        if match not in ('at_least', 'at_most'):
+            raise project.ConfigError(f"[{section.name}] match must be at_least or at_most, not {match}")
+        entries = sorted((float(key), parse(value)) for key, value in section.items()
+                         if key not in ('match', 'else'))
+        return cls([bound for bound, _ in entries], [value for _, value in entries], parse(section['else']),
+                   match == 'at_least')
+
+    def __call__(self, value):
+        if self.at_least:
+            return self.slots[bisect.bisect_right(self.bounds, value)]
+        return self.slots[bisect.bisect_left(self.bounds, value)]
+
+    def evaluate(self, values):
+        """
+        :return: List of the value for each of values.
+        """
+        return [self(value) for value in values]
+
+    def evaluate_array(self, values):
+        """
+        Vectorized evaluate.
+
+        :param values: NumPy array.
+        :return: Array of the value for each of values, of dtype object for string values.
+        """
+        import numpy as np  # only batch users pay for NumPy
+
+        if self.slot_array is None:
+            self.slot_array = np.array(self.slots, dtype=object if isinstance(self.slots[0], str) else float)
+        return self.slot_array[np.searchsorted(self.bounds, values, side='right' if self.at_least else 'left')]
+
+
+def encode_color(color):
+    """
+    :param color: Color string; full brightness unless it says otherwise.
+    :return: LIFX API color string.
+    """
+    color = HSBK(color)
+    if color.brightness is None:
+        color = color.with_brightness(1.0)
+    return color.encode()
+
+
+class Rules:
+    def __init__(self, config):
+        """
+        :param config: ConfigParser with every section of DEFAULT_RULES.
+        """
+        self.temperature = Table.from_section(config['temperature'], encode_color)
+        self.precipitation_chance = Table.from_section(config['precipitation_chance'], encode_color)
+        self.cloud_brightness = Table.from_section(config['cloud_brightness'], float)
+        self.flags = {flag: encode_color(color) for flag, color in config['flags'].items()}
+        levels = config['cloud_levels']
+        self.cloud_levels = {forecast: int(level) for forecast, level in levels.items() if forecast != 'else'}
+        self.default_cloud_level = int(levels['else'])
+        ambient = config['ambient']
+        self.ambient_precipitation_chance = ambient.getfloat('precipitation_chance')
+        self.night_brightness = ambient.getfloat('night_brightness')
+        self.ambient_duration = ambient.getfloat('duration')
+        self.ambient_brightness = Table.from_section(config['ambient_brightness'], float)
+
+    def cloud_level(self, short_forecast):
+        """
+        :param short_forecast: Forecast's shortForecast, e.g. Mostly Sunny.
+        :return: Cloud level, 0 (sunny) to 4 (cloudy) by default.
+        """
+        return self.cloud_levels.get(short_forecast.lower(), self.default_cloud_level)
+
+    def colors(self, weather_report):
+        """
+        :param weather_report: Encoded weather dictionary, see weather.encode_forecast.
+        :return: Dict of the report's encoded temperature and precipitation colors, the encoded colors of the flags
+                 it has in order, and the brightness its clouds dim to.
+        """
+        return {
+            'temperature': self.temperature(weather_report['temperature']),
+            'precipitation_chance': self.precipitation_chance(weather_report['precipitation_chance']),
+            'flags': [color for flag, color in self.flags.items() if weather_report.get(flag)],
+            'cloud_brightness': self.cloud_brightness(weather_report['cloud_level']),
+        }
+
+    def evaluate(self, weather_reports):
+        """
+        Encodes many reports at once, e.g. each hour of a day's hourly forecast into a light schedule.
+
+        :return: List of colors, see colors.
+        """
+        return [self.colors(weather_report) for weather_report in weather_reports]
+
+
+def load_rules(config_name='weather_rules.ini'):
+    """
+    :return: Rules from DEFAULT_RULES, with sections of config_name in the config dir replacing the defaults.
+    """
+    config = configparser.ConfigParser(inline_comment_prefixes=('#',))
+    config.read_string(DEFAULT_RULES)
+    overrides = project.load_config(config_name)
+    for name in overrides.sections():
+        config.remove_section(name)
+        config.add_section(name)
+        for key, value in overrides.items(name, raw=True):
+            config.set(name, key, value)
+    return Rules(config)
+
+
+@project.lazy
+def get_rules():
+    return load_rules()
@@ -1,14 +1,22 @@
 #!/usr/bin/env python
+import datetime
+import sys
+import threading
 import time
 
-from luminary.api import lifx, lifx_effects, weather
-from luminary.api.lifx import HSBK
+from luminary.api import lifx, weather
+from luminary.util import effect_optimizer, project, timeline, weather_rules
+from luminary.util.cache import DiskCache
+from luminary.util.timeline import Effect, State, Timeline, Wait
 
 
 def wakeup():
     """
     Wakeup light, delay minute for wake up laziness, then report weather.
+    The forecast is fetched in the background meanwhile, unless it was already prefetched.
     """
+    if prefetched_report() is None:
+        threading.Thread(target=prefetch, name='weather-prefetch', daemon=True).start()
     lifx.turn_on(brightness=1)
     time.sleep(60)  # wait 1 minute to report weather
     report_weather()
@@ -18,81 +26,130 @@ def report_weather():
     """
     Blink colors for temperature, rain chance, thunder storms, and cloud level.
     """
+    weather_report = prefetched_report()
+    if weather_report is None:
+        weather_report = weather.encode_forecast()
+    routine, _ = effect_optimizer.optimize(weather_timeline(weather_report))
+    timeline.run(routine)
+
+
+def prefetch():
+    """
+    Fetches and encodes the forecast now, keeping it on disk for report_weather.
+
+    :return: Encoded weather dictionary.
+    """
     weather_report = weather.encode_forecast()
+    get_prefetch_cache().set('weather_report', weather_report)
+    return weather_report
+
+
+def prefetched_report():
+    """
+    :return: Prefetched encoded weather dictionary, or None if there is none younger than `prefetch_max_age`.
+    """
+    return get_prefetch_cache().get('weather_report')
+
+
+def next_wakeup(now=None):
+    """
+    :return: datetime of the next configured wakeup `time` in wakeup.ini, or None if not configured.
+    """
+    config = settings()
+    if 'time' not in config:
+        return None
+    now = now or datetime.datetime.now()
+    hour, minute = map(int, config['time'].split(':'))
+    wakeup_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if wakeup_at <= now:
+        wakeup_at += datetime.timedelta(days=1)
+    return wakeup_at
+
+
+def prefetch_before_wakeup():
+    """
+    Waits until `prefetch_lead` seconds before the next wakeup, then prefetches the forecast.
+    """
+    wakeup_at = next_wakeup()
+    if wakeup_at is None:
+        raise ValueError('No wakeup time configured in wakeup.ini')
+    delay = (wakeup_at - datetime.datetime.now()).total_seconds() - prefetch_lead()
+    if delay > 0:
+        time.sleep(delay)
+    prefetch()
+
+
+def weather_timeline(weather_report):
+    """
+    Builds the weather report routine.
+
+    :param weather_report: Encoded weather dictionary, see weather.encode_forecast.
+    :return: Timeline, colored by the rules in weather_rules.ini.
+    """
+    def pulse(color):
+        return [Effect('pulse', {'color': color, 'period': 2}), Wait(2)]
 
-    def transition():
-        """
-        Blink green to indicate transition.
-        """
-        lifx_effects.pulse('green', period=2)
-        time.sleep(2)
+    # Blink green to indicate transition.
+    transition = pulse('green')
 
-    transition()
-    transition()
+    steps = transition + transition
+
+    colors = weather_rules.get_rules().colors(weather_report)
 
     # Temperature
-    temperature = weather_report['temperature']
-    # these values are all subjective to what I think is very hot, hot, etc.
-    if temperature >= 95:  # dark red
-        lifx_effects.pulse(
-            HSBK({'hue': 7.031357289997711, 'saturation': 0.979995422293431, 'kelvin': 4000}), period=2)
-    elif temperature >= 85:  # red
-        lifx_effects.pulse(
-            HSBK({'hue': 7.031357289997711, 'saturation': 0.6299992370489051, 'kelvin': 4000}), period=2)
-    elif temperature >= 78:  # orange
-        lifx_effects.pulse(
-            HSBK({'hue': 42.188143739986266, 'saturation': 0.9726710917830167, 'kelvin': 4000}), period=2)
-    elif temperature >= 68:  # yellow
-        lifx_effects.pulse(
-            HSBK({'hue': 45.00068665598535, 'saturation': 1, 'kelvin': 4000}), period=2)
-    elif temperature >= 60:  # sunny white
-        lifx_effects.pulse(
-            HSBK({'hue': 237.65987640192265, 'saturation': 0, 'kelvin': 3500}), period=2)
-    elif temperature >= 50:  # light blue
-        lifx_effects.pulse(
-            HSBK({'hue': 177.19020370794232, 'saturation': 0.7199969481956207, 'kelvin': 4000}), period=2)
-    else:  # snowy white
-        lifx_effects.pulse(
-            HSBK({'hue': 237.65987640192265, 'saturation': 0, 'kelvin': 9000}), period=2)
-
-    transition()
+    steps += pulse(colors['temperature'])
+
+    steps += transition
 
     # Precipitation
-    precipitation_chance = weather_report['precipitation_chance']
-    if precipitation_chance == 0:  # sunny white
-        lifx_effects.pulse(
-            HSBK({'hue': 237.65987640192265, 'saturation': 0, 'kelvin': 3500}), period=2)
-    elif precipitation_chance <= 25:  # white blue
-        lifx_effects.pulse(
-            HSBK({'hue': 177.19020370794232, 'saturation': 0.4399938963912413, 'kelvin': 4000}), period=2)
-    elif precipitation_chance <= 50:  # light blue
-        lifx_effects.pulse(
-            HSBK({'hue': 177.19020370794232, 'saturation': 0.7199969481956207, 'kelvin': 4000}), period=2)
-    elif precipitation_chance <= 75:  # blue
-        lifx_effects.pulse(
-            HSBK({'hue': 202.50308995193407, 'saturation': 0.7199969481956207, 'kelvin': 4000}), period=2)
-    else:  # dark blue
-        lifx_effects.pulse(
-            HSBK({'hue': 220.78461890592814, 'saturation': .9, 'kelvin': 4000}), period=2)
-
-    if weather_report['thunderstorms']:  # yellow
-        lifx_effects.pulse(
-            HSBK({'hue': 45.00068665598535, 'saturation': 1, 'kelvin': 4000}), period=2)
-    if weather_report['snow']:  # snowy white
-        lifx_effects.pulse(
-            HSBK({'hue': 237.65987640192265, 'saturation': 0, 'kelvin': 9000}), period=2)
-
-    transition()
+    steps += pulse(colors['precipitation_chance'])
+    for color in colors['flags']:  # thunderstorms, snow
+        steps += pulse(color)
+
+    steps += transition
 
     # Cloud Level
-    cloud_dim = 100 - (25 * weather_report['cloud_level'])
-    lifx.turn_on(brightness=cloud_dim)
-    time.sleep(1)
-    lifx.turn_on(brightness=1)
+    steps += [
+        State({'power': 'on', 'duration': 1.0, 'brightness': colors['cloud_brightness']}),
+        Wait(1),
+        State({'power': 'on', 'duration': 1.0, 'brightness': 1}),
+    ]
+
+    steps += transition + transition
+    return Timeline(steps)
+
+
+def settings():
+    return project.settings('wakeup.ini')
+
+
+def prefetch_lead():
+    return settings().getfloat('prefetch_lead', 15 * 60)
+
+
+@project.lazy
+def get_prefetch_cache():
+    return DiskCache('prefetch.json', ttl=settings().getfloat('prefetch_max_age', 60 * 60))
+
+
+# Read on first use like lifx's and weather's, so importing this module doesn't need wakeup.ini.
+lazy_attributes = {
+    'config': lambda: project.load_config('wakeup.ini'),
+    'PREFETCH_LEAD': prefetch_lead,
+    'prefetch_cache': get_prefetch_cache,
+}
+
 
-    transition()
-    transition()
+def __getattr__(name):
+    if name in lazy_attributes:
+        return lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    wakeup()
+    if sys.argv[1:] == ['prefetch']:
+        prefetch()
+    elif sys.argv[1:] == ['prefetch-before-wakeup']:
+        prefetch_before_wakeup()
+    else:
+        wakeup()
@@ -6,6 +6,7 @@ def setup_configs():
     setup_lifx()
     setup_raspberry_pi()
     setup_weather()
+    setup_wakeup()
 
 
 def setup_lifx():
@@ -57,6 +58,23 @@ def setup_weather():
         config.write(configfile)
 
 
+def setup_wakeup():
+    config_file = f"{config_dir}/wakeup.ini"
+    if os.path.exists(config_file):
+        print('Wakeup already set up.')
+        return
+    print('Setting up Wakeup...')
+
+    config = gen_config()
+
+    wakeup_time = input('Wakeup time as HH:MM (blank for none): ').strip()
+    if wakeup_time:
+        config['DEFAULT']['time'] = wakeup_time
+
+    with open(config_file, 'w') as configfile:
+        config.write(configfile)
+
+
 def gen_config():
     config = configparser.ConfigParser()
     config['DEFAULT'] = {}
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from benchmarks.multi_light import write_lights
+from benchmarks.stubs import start_stub_server, use_stub_config
+
+
+@pytest.fixture(scope='session')
+def lifx_stub():
+    """
+    Local stand-in for the LIFX API with luminary's config pointed at it and lights.ini holding
+    benchmarks.multi_light's rooms. One for the whole session, as luminary keeps its clients and settings once built.
+
+    :return: (server, dict of room to its light names)
+    """
+    previous = os.environ.get('LUMINARY_CONFIG_DIR')
+    server = start_stub_server()
+    config_dir = use_stub_config(lifx={'api_url': f"http://127.0.0.1:{server.server_port}", 'rate_limit': '0',
+                                       'state_max_age': '0'})
+    yield server, write_lights(config_dir)
+    server.shutdown()
+    if previous is None:
+        del os.environ['LUMINARY_CONFIG_DIR']
+    else:
+        os.environ['LUMINARY_CONFIG_DIR'] = previous
+
+
+@pytest.fixture
+def lifx_calls(lifx_stub):
+    """
+    :return: (server with no calls recorded yet, dict of room to its light names)
+    """
+    server, rooms = lifx_stub
+    server.body = [{}]
+    del server.calls[:]
+    return server, rooms
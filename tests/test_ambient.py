@@ -0,0 +1,39 @@
+import datetime
+import threading
+
+from luminary import ambient
+from luminary.util import scheduler
+
+
+def test_daily_plan_keeps_firing(monkeypatch):
+    """
+    The [ambient] job from schedule.ini plans two days on a fake clock; planning mustn't cancel the daily job.
+    """
+    clock = [datetime.datetime(2026, 1, 1, 4, 0)]
+    schedule = scheduler.Scheduler(now=lambda: clock[0], max_sleep=0.01)
+    applied = []
+    sent = threading.Semaphore(0)
+
+    def set_state(payload, selector=None):
+        applied.append(payload['brightness'])
+        sent.release()
+
+    def ambient_schedule(forecast, hours):
+        start = clock[0].timestamp()
+        return [(start, {'brightness': 1.0}), (start + 3600, {'brightness': 0.5})]
+
+    monkeypatch.setattr(ambient.hourly_forecast, 'get_hourly_forecast', lambda: None)
+    monkeypatch.setattr(ambient.lifx, 'set_state', set_state)
+    monkeypatch.setattr(ambient, 'ambient_schedule', ambient_schedule)
+    schedule.add(scheduler.Job('ambient', scheduler.Cron('0 5 * * *'), lambda: ambient.schedule_day(schedule)))
+    schedule.start()
+    try:
+        for day in (1, 2):
+            clock[0] = datetime.datetime(2026, 1, day, 5, 0)
+            assert sent.acquire(timeout=5), f"the day wasn't planned on day {day}"
+            clock[0] = datetime.datetime(2026, 1, day, 6, 0)
+            assert sent.acquire(timeout=5), f"the plan wasn't applied on day {day}"
+            assert [name for name, _ in schedule.upcoming()] == ['ambient']
+    finally:
+        schedule.stop()
+    assert applied == [1.0, 0.5, 1.0, 0.5]
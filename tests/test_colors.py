@@ -0,0 +1,56 @@
+import pytest
+
+from luminary.api import colors
+from luminary.api.lifx import HSBK
+
+
+def hsbk(hue=None, saturation=None, brightness=None, kelvin=None):
+    return {'hue': hue, 'saturation': saturation, 'brightness': brightness, 'kelvin': kelvin}
+
+
+@pytest.mark.parametrize('color, expected', [
+    ('red', hsbk(0.0, 1.0)),
+    ('Blue', hsbk(250.0, 1.0)),
+    ('white', hsbk(saturation=0.0)),
+    ('white kelvin:2700', hsbk(saturation=0.0, kelvin=2700)),
+    ('hue:120 saturation:1.0', hsbk(120.0, 1.0)),
+    ('hue:120 saturation:0.5 brightness:0.25 kelvin:3500', hsbk(120.0, 0.5, 0.25, 3500)),
+    ('brightness:0', hsbk(brightness=0.0)),
+    ('green brightness:0.5', hsbk(120.0, 1.0, 0.5)),
+    ('#00ff00', hsbk(120.0, 1.0, 1.0)),
+    ('#FF0000 kelvin:3500', hsbk(0.0, 1.0, 1.0, 3500)),
+    ('rgb:0,0,255', hsbk(240.0, 1.0, 1.0)),
+    ('rgb:0,255,0 brightness:0.5', hsbk(120.0, 1.0, 0.5)),
+])
+def test_parse(color, expected):
+    assert colors.parse(color) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('color', [
+    '', '   ', 'teal', 'hue:abc', 'hue:400', 'saturation:1.5', 'brightness:-0.1', 'kelvin:1000', 'kelvin:3500.5',
+    'foo:1', '#00ff0', '#gg0000', 'rgb:0,255', 'rgb:0,256,0', 'rgb:a,b,c', 'red teal',
+])
+def test_parse_rejects(color):
+    assert colors.parse(color) is None
+
+
+def test_resolve_fetches_only_what_it_cant_parse():
+    fetched = []
+
+    def fetch(color):
+        fetched.append(color)
+        return hsbk(180.0, 0.5, 1.0, 3500)
+
+    assert colors.resolve('hue:90 saturation:1', fetch) == hsbk(90.0, 1.0)
+    assert colors.resolve('teal', fetch) == hsbk(180.0, 0.5, 1.0, 3500)
+    assert colors.resolve('teal', fetch) == hsbk(180.0, 0.5, 1.0, 3500)
+    assert fetched == ['teal']
+
+
+def test_hsbk_is_immutable():
+    color = HSBK({'hue': 120, 'saturation': 1.0, 'brightness': None})
+    with pytest.raises(AttributeError):
+        color.brightness = 1.0
+    brighter = color.with_brightness(1.0)
+    assert color.brightness is None and brighter.brightness == 1.0
+    assert {color: 'dim'}.get(HSBK({'hue': 120, 'saturation': 1.0, 'brightness': None})) == 'dim'
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from luminary import daemon
+
+
+@pytest.fixture
+def methods(monkeypatch):
+    def fail():
+        raise KeyError('brightness')
+
+    monkeypatch.setattr(daemon, 'methods', {'add': lambda a, b: a + b, 'fail': fail})
+
+
+def respond(request):
+    return daemon.Handler.respond(json.dumps(request).encode())
+
+
+def test_result(methods):
+    assert respond({'jsonrpc': '2.0', 'id': 1, 'method': 'add', 'params': [1, 2]}) == \
+        {'jsonrpc': '2.0', 'id': 1, 'result': 3}
+
+
+@pytest.mark.parametrize('request_, code', [
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'nope'}, -32601),
+    ({'jsonrpc': '2.0', 'id': 1}, -32600),
+    ([1, 2], -32600),
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'fail'}, -32000),
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'add', 'params': {'c': 1}}, -32000),
+])
+def test_errors(methods, request_, code):
+    assert respond(request_)['error']['code'] == code
+
+
+def test_method_key_error_is_logged(methods, caplog):
+    response = respond({'jsonrpc': '2.0', 'id': 1, 'method': 'fail'})
+    assert response['error']['message'] == "KeyError: 'brightness'"
+    assert 'Request failed' in caplog.text
+
+
+def test_parse_error():
+    assert daemon.Handler.respond(b'{')['error']['code'] == -32700
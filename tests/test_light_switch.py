@@ -0,0 +1,28 @@
+import concurrent.futures
+import threading
+
+from luminary import light_switch
+from luminary.util import gestures
+
+
+def test_gestures_dont_pile_up_behind_a_slow_action(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    done = []
+
+    def action(gesture):
+        def run():
+            started.set()
+            release.wait(5)
+            done.append(gesture)
+        return run
+
+    monkeypatch.setattr(light_switch, 'actions', {gesture: action(gesture) for gesture in light_switch.actions})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pending = light_switch.PendingActions(executor)
+        pending.submit(gestures.HOVER)
+        assert started.wait(5)
+        for gesture in (gestures.APPROACH, gestures.HOVER, gestures.APPROACH, gestures.HOVER, gestures.DOUBLE_WAVE):
+            pending.submit(gesture)
+        release.set()
+    # the toggles waiting behind the first cancelled out and the repeated approach ran once
+    assert done == [gestures.HOVER, gestures.APPROACH, gestures.DOUBLE_WAVE]
@@ -0,0 +1,29 @@
+import pytest
+
+from benchmarks.scenes import drift, lights_written, statuses
+from luminary.api import scenes
+
+
+@pytest.fixture
+def saved(lifx_calls):
+    server, _ = lifx_calls
+    saved = statuses(10)
+    server.body = saved
+    scenes.snapshot('test', [f"id:{status['id']}" for status in saved])
+    return saved
+
+
+def test_activating_an_unchanged_scene_writes_nothing(lifx_calls, saved):
+    server, _ = lifx_calls
+    del server.calls[:]
+    scenes.activate_snapshot('test')
+    assert not any(method == 'PUT' for method, _, _ in server.calls)
+
+
+def test_activation_writes_only_the_lights_that_differ(lifx_calls, saved):
+    server, _ = lifx_calls
+    server.body = drift(saved, 2)
+    del server.calls[:]
+    scenes.activate_snapshot('test')
+    assert sum(method == 'PUT' for method, _, _ in server.calls) == 1
+    assert lights_written(server.calls) == 2
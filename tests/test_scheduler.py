@@ -0,0 +1,10 @@
+from luminary.util import scheduler
+
+
+def test_stop_right_after_start():
+    schedule = scheduler.Scheduler(max_sleep=60)
+    thread = schedule.start()
+    assert schedule.running
+    schedule.stop()
+    thread.join(5)
+    assert not thread.is_alive()
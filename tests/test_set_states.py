@@ -0,0 +1,26 @@
+from benchmarks.multi_light import DIM, OFF, WARM
+from luminary.api import lifx
+
+
+def test_same_state_for_every_light_is_one_request(lifx_calls):
+    server, rooms = lifx_calls
+    everything = [name for names in rooms.values() for name in names]
+    assert len(everything) == 10
+    lifx.set_states({name: WARM for name in everything})
+    assert [(method, path) for method, path, _ in server.calls] == [('PUT', '/lights/location:Home/state')]
+
+
+def test_one_light_per_room_is_one_request(lifx_calls):
+    server, rooms = lifx_calls
+    lifx.set_states({names[0]: WARM for names in rooms.values()})
+    assert len(server.calls) == 1
+    assert server.calls[0][0] == 'PUT'
+
+
+def test_different_states_are_batched(lifx_calls):
+    server, rooms = lifx_calls
+    lifx.set_states({**{name: WARM for name in rooms['Living']}, **{name: OFF for name in rooms['Office']},
+                     **{name: DIM for name in rooms['Bedroom']}})
+    assert [(method, path) for method, path, _ in server.calls] == [('PUT', '/lights/states')]
+    states = server.calls[0][2]['states']
+    assert sorted(state['selector'] for state in states) == ['group:Bedroom', 'group:Living', 'group:Office']
@@ -0,0 +1,100 @@
+import pytest
+
+from luminary.api import command_queue
+from luminary.api.state import LightMirror, MirroredTransport
+
+
+class FakeTransport:
+    """
+    Lights a and b, answering like the cloud API and recording every write.
+    """
+    def __init__(self):
+        self.lights = {'a': {'id': 'a', 'power': 'on', 'brightness': 1.0},
+                       'b': {'id': 'b', 'power': 'on', 'brightness': 1.0}}
+        self.writes = []
+
+    def ids(self, selector):
+        return [part.partition(':')[2] for part in selector.split(',')]
+
+    def set_state(self, selector, payload):
+        self.writes.append((selector, payload))
+        for light_id in self.ids(selector):
+            self.lights[light_id].update(payload)
+
+    def toggle_power(self, selector):
+        self.writes.append((selector, 'toggle'))
+        power = 'off' if any(self.lights[light_id]['power'] == 'on' for light_id in self.ids(selector)) else 'on'
+        for light_id in self.ids(selector):
+            self.lights[light_id]['power'] = power
+
+    def get_statuses(self, selector):
+        return [dict(self.lights[light_id]) for light_id in self.ids(selector)]
+
+
+def mirrored():
+    transport = FakeTransport()
+    return transport, MirroredTransport(transport, LightMirror())
+
+
+def test_write_to_one_light_is_seen_through_a_combined_selector():
+    transport, mirrored_transport = mirrored()
+    mirrored_transport.get_status('id:a,id:b')
+    mirrored_transport.set_state('id:a', {'brightness': 0.2})
+    mirrored_transport.set_state('id:a,id:b', {'brightness': 1.0})
+    assert transport.writes[-1] == ('id:a,id:b', {'brightness': 1.0})
+    assert transport.lights['a']['brightness'] == 1.0
+
+
+def test_write_is_redundant_only_when_every_light_matches():
+    transport, mirrored_transport = mirrored()
+    mirrored_transport.get_status('id:a')
+    mirrored_transport.set_state('id:a,id:b', {'brightness': 1.0})  # b isn't known
+    assert len(transport.writes) == 1
+    mirrored_transport.get_status('id:b')
+    mirrored_transport.set_state('id:a,id:b', {'brightness': 1.0})
+    assert len(transport.writes) == 1
+
+
+def test_status_of_a_combined_selector_is_its_first_light():
+    transport, mirrored_transport = mirrored()
+    transport.lights['a']['brightness'] = 0.5
+    assert mirrored_transport.get_status('id:a,id:b')['brightness'] == 0.5
+    assert mirrored_transport.get_status('id:b')['brightness'] == 1.0
+
+
+def test_toggle_turns_all_off_if_any_is_on():
+    transport, mirrored_transport = mirrored()
+    transport.lights['b']['power'] = 'off'
+    mirrored_transport.get_statuses('id:a,id:b')
+    mirrored_transport.toggle_power('id:a,id:b')
+    assert [status['power'] for status in mirrored_transport.get_statuses('id:a,id:b')] == ['off', 'off']
+    assert [status['power'] for status in transport.lights.values()] == ['off', 'off']
+
+
+def test_write_to_an_unknown_group_drops_every_entry():
+    transport, mirrored_transport = mirrored()
+    mirrored_transport.get_statuses('id:a,id:b')
+    transport.ids = lambda selector: ['a']  # group:Bedroom, which the mirror can't expand
+    mirrored_transport.set_state('group:Bedroom', {'brightness': 0.3})
+    assert mirrored_transport.get_status('id:a')['brightness'] == 0.3
+
+
+class FailingTransport(FakeTransport):
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def set_state(self, selector, payload):
+        raise self.error
+
+
+@pytest.mark.parametrize('error', [ValueError('bad payload'), OSError('unreachable')])
+def test_queued_write_that_never_lands_drops_its_entry(error):
+    transport = FailingTransport(error)
+    queued = command_queue.QueuedTransport(transport, expiry=0.05, backoff=10, drain_timeout=0)
+    mirrored_transport = MirroredTransport(queued, LightMirror())
+    queued.on_error = mirrored_transport.invalidate
+    mirrored_transport.get_status('id:a')
+    mirrored_transport.set_state('id:a', {'brightness': 0.2})
+    assert queued.drain(5)
+    assert mirrored_transport.get_status('id:a')['brightness'] == 1.0